@@ -0,0 +1,298 @@
+# broker.py
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from common import BROKER_HOST, BROKER_PORT, PROTOCOL
+from protocol import PicoLink, PROTOCOL_TEXT, encode_text
+
+# 포트를 처음 열었을 때 피코가 준비될 때까지 기다리는 시간 (broker 에서 1회만)
+OPEN_SETTLE_DELAY = 0.3
+
+# broker 연결 시도 제한 시간 (broker 가 없으면 바로 직접 연결로 넘어감)
+CONNECT_TIMEOUT = 0.2
+
+
+# ======================================================================
+# broker 서버 (직렬 포트를 계속 열어 두고 여러 프로세스의 이벤트를 중계)
+# ======================================================================
+#
+# 라인 기반 로컬 TCP 프로토콜:
+#   클라이언트 → broker
+#     HELLO <PORT> <BAUD>   : 사용할 피코 포트 지정 (처음이면 broker 가 포트를 연다)
+#     EV <type> <KEY>       : 키 이벤트. 한 번에 받은 묶음은 write 1회로 피코에 전송
+#     STOP                  : 즉시 피코에 STOP 전송 + 같은 포트의 다른 클라이언트에 STOP 통지
+#   broker → 클라이언트
+#     OK <protocol> / ERR <사유>   : HELLO 응답
+#     STOP                         : 다른 클라이언트가 STOP 을 보냈음
+
+
+class PortChannel:
+    """broker 가 소유한 피코 포트 하나. 여러 클라이언트가 lock 으로 나눠 쓴다."""
+
+    def __init__(self, link: PicoLink):
+        self.link = link
+        self.lock = threading.Lock()
+        self.clients = set()
+
+
+class BrokerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    # Windows 의 SO_REUSEADDR 은 같은 포트 중복 bind 를 허용하므로 꺼 둔다 (broker 는 1개만)
+    allow_reuse_address = os.name != "nt"
+
+    def __init__(self, address, protocol=PROTOCOL):
+        super().__init__(address, BrokerHandler)
+        self.protocol = protocol
+        self.channels = {}
+        self.channels_lock = threading.Lock()
+
+    def get_channel(self, port: str, baud: int) -> PortChannel:
+        with self.channels_lock:
+            channel = self.channels.get(port)
+            if channel is None or not channel.link.is_open:
+                link = PicoLink.open(port, baud, timeout=1, protocol=self.protocol)
+                time.sleep(OPEN_SETTLE_DELAY)
+                channel = PortChannel(link)
+                self.channels[port] = channel
+                print(f"🔌 {port} 열기 완료 (프로토콜: {link.protocol})")
+            return channel
+
+    def close_channels(self):
+        with self.channels_lock:
+            for channel in self.channels.values():
+                channel.link.close()
+            self.channels.clear()
+
+
+class BrokerHandler(socketserver.StreamRequestHandler):
+    # HELLO 한 줄만 rfile 로 읽고 나머지는 recv 로 직접 읽으므로 버퍼링하지 않는다
+    rbufsize = 0
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.channel = None
+        self.pressed = set()
+
+    def reply(self, line: str):
+        try:
+            self.wfile.write(line.encode("utf-8") + b"\n")
+        except OSError:
+            pass
+
+    def handle(self):
+        hello = self.rfile.readline().decode("utf-8", "replace").split()
+        if len(hello) != 3 or hello[0] != "HELLO":
+            self.reply("ERR bad hello")
+            return
+
+        try:
+            self.channel = self.server.get_channel(hello[1], int(hello[2]))
+        except Exception as e:
+            self.reply(f"ERR {e}")
+            return
+
+        with self.channel.lock:
+            self.channel.clients.add(self)
+        self.reply(f"OK {self.channel.link.protocol}")
+
+        while True:
+            # 한 번에 도착한 라인들은 write 1회로 묶어서 내보낸다
+            chunk = self.request.recv(4096)
+            if not chunk:
+                break
+            data = chunk
+            while not data.endswith(b"\n"):
+                more = self.request.recv(4096)
+                if not more:
+                    break
+                data += more
+            self.process(data.decode("utf-8", "replace").splitlines())
+
+    def process(self, lines):
+        channel = self.channel
+        with channel.lock:
+            for line in lines:
+                parts = line.split()
+                if not parts:
+                    continue
+                if parts[0] == "STOP":
+                    channel.link.send_stop()
+                    for client in channel.clients:
+                        client.pressed.clear()
+                        if client is not self:
+                            client.reply("STOP")
+                    continue
+                if parts[0] == "EV" and len(parts) == 3:
+                    ev_type, key = parts[1], parts[2]
+                    if ev_type == "down":
+                        self.pressed.add(key)
+                    elif ev_type == "up":
+                        self.pressed.discard(key)
+                    channel.link.queue(ev_type, key)
+            try:
+                channel.link.flush()
+            except Exception as e:
+                print(f"❌ 피코 전송 오류: {e}")
+
+    def finish(self):
+        channel = self.channel
+        if channel is not None:
+            with channel.lock:
+                channel.clients.discard(self)
+                # 클라이언트가 키를 누른 채로 끊기면 (강제 종료 등) 대신 떼어 준다
+                try:
+                    for key in sorted(self.pressed):
+                        channel.link.queue("up", key)
+                    channel.link.flush()
+                except Exception:
+                    pass
+                self.pressed.clear()
+        super().finish()
+
+
+def run_broker(host=BROKER_HOST, port=BROKER_PORT):
+    """broker 프로세스 본체. Ctrl+C 또는 프로세스 종료까지 계속 실행."""
+    try:
+        server = BrokerServer((host, port))
+    except OSError as e:
+        print(f"⚠ broker 시작 실패 (이미 실행 중일 수 있음): {e}")
+        return
+
+    print(f"🔌 피코 broker 실행 중: {host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹ broker 종료 (Ctrl+C)")
+    finally:
+        server.server_close()
+        server.close_channels()
+
+
+# ======================================================================
+# broker 클라이언트 (PicoLink 와 같은 인터페이스)
+# ======================================================================
+class BrokerClient:
+    def __init__(self, sock, protocol: str):
+        self.sock = sock
+        self.protocol = protocol
+        self._pending = bytearray()
+        self._stop_event = threading.Event()
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def connect(cls, port, baud, host=BROKER_HOST, broker_port=BROKER_PORT):
+        sock = socket.create_connection((host, broker_port), timeout=CONNECT_TIMEOUT)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(f"HELLO {port} {baud}\n".encode("utf-8"))
+            # 포트를 처음 여는 경우 broker 쪽 대기 시간만큼 기다려 준다
+            sock.settimeout(5.0)
+            reply = b""
+            while not reply.endswith(b"\n"):
+                more = sock.recv(256)
+                if not more:
+                    break
+                reply += more
+            parts = reply.decode("utf-8", "replace").split(None, 1)
+            if not parts or parts[0] != "OK":
+                raise ConnectionError(reply.decode("utf-8", "replace").strip())
+            sock.settimeout(None)
+        except Exception:
+            sock.close()
+            raise
+        protocol = parts[1].strip() if len(parts) > 1 else PROTOCOL_TEXT
+        return cls(sock, protocol)
+
+    def _read_loop(self):
+        buf = b""
+        while True:
+            try:
+                chunk = self.sock.recv(256)
+            except OSError:
+                break
+            if not chunk:
+                break
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                if line.strip() == b"STOP":
+                    self._stop_event.set()
+        self._closed = True
+
+    @property
+    def is_open(self) -> bool:
+        return not self._closed
+
+    @property
+    def is_binary(self) -> bool:
+        # 인코딩은 broker 가 담당하므로 클라이언트는 항상 텍스트 라인을 보낸다
+        return False
+
+    def encode(self, ev_type: str, key: str) -> bytes:
+        return encode_text(ev_type, key)
+
+    def stop_requested(self) -> bool:
+        return self._stop_event.is_set()
+
+    def queue(self, ev_type: str, key: str):
+        self._pending += encode_text(ev_type, key)
+
+    def flush(self):
+        if not self._pending:
+            return
+        data = bytes(self._pending)
+        self._pending.clear()
+        self.sock.sendall(data)
+
+    def send(self, ev_type: str, key: str):
+        self.queue(ev_type, key)
+        self.flush()
+
+    def write(self, data: bytes, next_seq=None):
+        # is_binary 가 항상 False 라 next_seq 는 None (SEQ 는 broker 의 PicoLink 가 매김)
+        self.sock.sendall(data)
+
+    def send_stop(self):
+        self._pending.clear()
+        self.sock.sendall(b"STOP\n")
+
+    def close(self):
+        self._closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def broker_available(host=BROKER_HOST, port=BROKER_PORT) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=CONNECT_TIMEOUT):
+            return True
+    except OSError:
+        return False
+
+
+def open_pico(port, baud, timeout=1, protocol=PROTOCOL, settle=0.0):
+    """
+    broker 가 떠 있으면 broker 를 통해, 없으면 직접 포트를 열어서 피코 링크를 반환.
+    settle: 직접 연결일 때만 적용되는 포트 안정화 대기 시간(초).
+    """
+    try:
+        return BrokerClient.connect(port, baud)
+    except Exception:
+        pass
+
+    link = PicoLink.open(port, baud, timeout=timeout, protocol=protocol)
+    if settle > 0:
+        time.sleep(settle)
+    return link
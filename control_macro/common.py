@@ -22,6 +22,16 @@ BASE_DIR = get_base_dir()
 PORT = "COM4"
 BAUD = 115200
 
+# 피코 전송 프로토콜: "auto"(협상 후 바이너리/텍스트 결정), "text", "binary"
+PROTOCOL = "auto"
+
+# 이 간격(초) 안에 떨어지는 이벤트들은 write 1회로 묶어서 전송
+BATCH_TICK = 0.001
+
+# ───────── 피코 broker (직렬 포트를 계속 열어 두는 로컬 중계 프로세스) ─────────
+BROKER_HOST = "127.0.0.1"
+BROKER_PORT = 50504
+
 # ───────── 파일 경로 ─────────
 # 세트 매크로 녹화 데이터
 MACRO_SETS_FILE = os.path.join(BASE_DIR, "macro_sets.json")
@@ -29,6 +39,9 @@ MACRO_SETS_FILE = os.path.join(BASE_DIR, "macro_sets.json")
 # 세트 매크로 진행 상태 (GUI에서 폴링해서 읽음)
 SET_STATUS_FILE = os.path.join(BASE_DIR, "set_macro_status.json")
 
+# 세트 매크로 진행 상태 공유 메모리 블록 (macro가 제자리 갱신, GUI가 잠금 없이 읽음)
+SET_STATUS_SHM_FILE = os.path.join(BASE_DIR, "set_macro_status.shm")
+
 # ───────── 세트간 텀 (사람 손처럼 약간 랜덤) ─────────
 MIN_SET_DELAY = -0.1  # 살짝 당길 수 있게 음수도 허용
 MAX_SET_DELAY = 0.1  # 0~약간 정도로 쓰고 싶으면 조절
@@ -5,6 +5,7 @@ from control_gui import control_gui
 from record import record_set
 from macro import macro_run
 from stop import send_stop_signal
+from broker import run_broker
 
 
 if __name__ == "__main__":
@@ -14,6 +15,7 @@ if __name__ == "__main__":
     #   main.exe record N     → 세트 N 녹화
     #   main.exe macro ...    → 세트 매크로 실행
     #   main.exe stop         → Pico STOP 신호 전송
+    #   main.exe broker       → 피코 포트를 잡고 있는 broker 실행
     mode = "gui"
 
     if len(sys.argv) >= 2:
@@ -72,6 +74,10 @@ if __name__ == "__main__":
     elif mode == "stop":
         send_stop_signal()
 
+    # 피코 broker
+    elif mode == "broker":
+        run_broker()
+
     else:
         print("알 수 없는 모드입니다:", mode)
         print("사용법:")
@@ -80,4 +86,5 @@ if __name__ == "__main__":
         print("  main.exe record N     → 세트 N 녹화")
         print("  main.exe macro ...    → 세트 매크로 실행")
         print("  main.exe stop         → Pico STOP 신호 전송")
+        print("  main.exe broker       → 피코 broker 실행")
         sys.exit(1)
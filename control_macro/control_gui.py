@@ -8,9 +8,12 @@ from common import (
     BASE_DIR,
     MACRO_SETS_FILE,
     SET_STATUS_FILE,
+    SET_STATUS_SHM_FILE,
     format_time,
 )
-from stop import send_stop_signal
+from stop import clear_set_status, send_stop_signal
+from broker import broker_available
+from status import StatusBlock
 
 try:
     import tkinter as tk
@@ -32,6 +35,8 @@ progress_bar = None
 set_repeat_var = None
 
 set_macro_proc = None  # main.exe macro ... 프로세스 핸들
+broker_proc = None  # main.exe broker 프로세스 핸들 (GUI가 직접 띄운 경우만)
+status_block = None  # 세트 매크로 상태 공유 메모리 (macro가 처음 만든 뒤에 열림)
 
 
 def gui_safe_call(fn, *args, **kwargs):
@@ -84,10 +89,30 @@ def update_progress(percent: float):
     gui_safe_call(_)
 
 
+def read_set_status():
+    """
+    세트 매크로 상태 dict를 읽는다.
+    공유 메모리 블록을 먼저 보고, 아직 없으면 호환용 JSON 스냅샷을 읽는다.
+    """
+    global status_block
+
+    if status_block is None:
+        status_block = StatusBlock.open(SET_STATUS_SHM_FILE)
+    if status_block is not None:
+        st = status_block.read()
+        if st is not None:
+            return st
+
+    if os.path.exists(SET_STATUS_FILE):
+        with open(SET_STATUS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
 def poll_set_status():
     """
-    macro.py에서 주기적으로 쓰는 set_macro_status.json을 읽어서
-    세트 매크로 진행 상황을 실시간으로 표시한다.
+    macro.py에서 주기적으로 갱신하는 세트 매크로 상태를 읽어서
+    진행 상황을 실시간으로 표시한다.
     """
     global label_set_status
 
@@ -97,10 +122,8 @@ def poll_set_status():
     text = "세트 매크로: 정지됨"
 
     try:
-        if os.path.exists(SET_STATUS_FILE):
-            with open(SET_STATUS_FILE, "r", encoding="utf-8") as f:
-                st = json.load(f)
-
+        st = read_set_status()
+        if st is not None:
             running = bool(st.get("running", False))
             if running:
                 loop_idx = int(st.get("loop_index", 0) or 0)
@@ -173,6 +196,38 @@ def get_main_invocation_args(mode: str, *extra_args: str):
         return [exe_path, main_path, mode, *extra_args]
 
 
+def start_broker():
+    """
+    피코 포트를 계속 잡고 있는 broker 프로세스를 띄운다.
+    이미 다른 곳에서 실행 중이면 그대로 사용한다.
+    """
+    global broker_proc
+
+    if broker_available():
+        gui_log("🔌 실행 중인 피코 broker를 사용합니다.")
+        return
+
+    args = get_main_invocation_args("broker")
+    try:
+        broker_proc = subprocess.Popen(args, cwd=BASE_DIR)
+        gui_log("🔌 피코 broker를 시작했습니다.")
+    except Exception as e:
+        gui_log(f"⚠ 피코 broker 실행 실패 (직접 연결로 동작): {e}")
+        broker_proc = None
+
+
+def stop_broker():
+    global broker_proc
+
+    if broker_proc is not None and broker_proc.poll() is None:
+        try:
+            broker_proc.terminate()
+            broker_proc.wait(timeout=1.0)
+        except Exception:
+            pass
+    broker_proc = None
+
+
 def gui_start_record_set():
     global root
 
@@ -487,6 +542,14 @@ def gui_on_click_stop():
 
     gui_log("🛑 STOP 요청")
 
+    # broker 경유면 매크로가 전송 중이어도 STOP이 바로 나가므로 먼저 보낸다 (키 떼기).
+    # (직접 연결이면 매크로 프로세스가 포트를 놓아야 열 수 있으므로 종료 후 전송)
+    # 상태 초기화는 어느 쪽이든 프로세스가 끝난 뒤에 한다
+    # (살아 있는 매크로가 초기화 뒤에 running 상태를 다시 쓰지 않도록)
+    stop_via_broker = broker_available()
+    if stop_via_broker:
+        send_stop_signal(clear_status=False)
+
     if set_macro_proc is not None and set_macro_proc.poll() is None:
         gui_log("🛑 세트 매크로 프로세스를 종료합니다...")
         try:
@@ -502,12 +565,16 @@ def gui_on_click_stop():
             gui_log(f"❌ 세트 매크로 종료 중 오류: {e}")
     set_macro_proc = None
 
-    send_stop_signal()
+    if stop_via_broker:
+        clear_set_status()
+    else:
+        send_stop_signal()
     gui_log("✅ STOP 명령 전송 완료")
 
 
 def gui_on_click_quit():
     gui_on_click_stop()
+    stop_broker()
     if root is not None:
         root.destroy()
 
@@ -595,5 +662,7 @@ def control_gui():
     gui_log("3) [🛑 STOP 전송 (전체)] → 세트 매크로 프로세스 종료 + Pico에 STOP 전송")
     gui_log("⚠ 이 exe는 '관리자 권한으로 실행'하는 것을 권장합니다.")
 
+    start_broker()
+
     root.after(500, poll_set_status)
     root.mainloop()
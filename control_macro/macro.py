@@ -3,25 +3,85 @@ import os
 import time
 import json
 import random
-import serial
+import itertools
 
 from common import (
     PORT,
     BAUD,
+    PROTOCOL,
     MACRO_SETS_FILE,
     SET_STATUS_FILE,
+    SET_STATUS_SHM_FILE,
     MIN_SET_DELAY,
     MAX_SET_DELAY,
 )
+from protocol import StopRequested
+from broker import open_pico
+from playback import EventPlan, PlaybackObserver, SerialSink, play
+from status import StatusPublisher
+from scheduler import (
+    DeadlineScheduler,
+    begin_high_resolution_timer,
+    end_high_resolution_timer,
+)
 
+_status_publisher = None
 
-def write_status(state: dict):
-    """세트 매크로 상태를 JSON으로 저장 (GUI에서 poll_set_status로 읽음)."""
-    try:
-        with open(SET_STATUS_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False)
-    except Exception:
-        pass
+
+def write_status(state: dict, snapshot: bool = True):
+    """
+    세트 매크로 상태를 기록한다 (GUI에서 poll_set_status로 읽음).
+    실제 쓰기는 StatusPublisher 스레드가 하므로 호출 즉시 돌아온다.
+    snapshot=True 면 호환용 JSON 파일도 같이 저장한다 (재생 루프 안에서는 False).
+    """
+    global _status_publisher
+    if _status_publisher is None:
+        _status_publisher = StatusPublisher(SET_STATUS_SHM_FILE, SET_STATUS_FILE)
+    _status_publisher.post(state, snapshot=snapshot)
+
+
+class StatusObserver(PlaybackObserver):
+    """재생 중 진행 상황을 50ms 간격으로 상태 우편함에 넣는다 (파일 I/O 없음)."""
+
+    def __init__(self, selected_sets, loop_total: int, global_start: float):
+        self.selected_sets = selected_sets
+        self.loop_total = loop_total
+        self.global_start = global_start
+        self.loop_index = 0
+        self.set_no = None
+        self.duration = 0.0
+        self.last_write = 0.0
+
+    def begin_loop(self, loop_index: int, set_no: int, duration: float):
+        self.loop_index = loop_index
+        self.set_no = set_no
+        self.duration = duration
+
+    def on_progress(self, plan, events_sent: int, elapsed: float):
+        now = time.time()
+        if now - self.last_write < 0.05:
+            return
+        self.last_write = now
+
+        if self.duration > 0:
+            progress = min(100.0, (elapsed / self.duration) * 100.0)
+        else:
+            progress = 0.0
+
+        write_status(
+            {
+                "running": True,
+                "selected_sets": self.selected_sets,
+                "loop_index": self.loop_index,
+                "loop_total": self.loop_total,
+                "set_no": self.set_no,
+                "set_duration": self.duration,
+                "last_loop_elapsed": elapsed,
+                "total_elapsed": now - self.global_start,
+                "progress": progress,
+            },
+            snapshot=False,
+        )
 
 
 def compute_set_duration(events):
@@ -159,6 +219,8 @@ def macro_run(selected_sets, repeat_count: int, force_rules=None):
 
     # 세트별 예상 길이 계산
     set_durations = {no: compute_set_duration(sets[no]) for no in selected_sets_sorted}
+    # 세트별 재생 계획을 미리 컴파일 (같은 틱 이벤트 묶음 포함)
+    set_plans = {no: EventPlan.compile(sets[no]) for no in selected_sets_sorted}
     avg_duration = (
         sum(set_durations.values()) / len(set_durations) if set_durations else 0.0
     )
@@ -194,7 +256,7 @@ def macro_run(selected_sets, repeat_count: int, force_rules=None):
 
     # 포트 열기
     try:
-        ser = serial.Serial(PORT, BAUD, timeout=1)
+        link = open_pico(PORT, BAUD, timeout=1, protocol=PROTOCOL)
     except Exception as e:
         print(f"❌ 포트 열기 실패: {e}")
         write_status(
@@ -212,185 +274,94 @@ def macro_run(selected_sets, repeat_count: int, force_rules=None):
         )
         return
 
+    print(f"▶ 피코 전송 프로토콜: {link.protocol}")
+
+    # 재생 루프에서 인코딩하지 않도록 전송 바이트를 미리 만들어 둔다
+    for plan in set_plans.values():
+        plan.wire_for(link)
+
     global_start = time.time()
     loops_done = 0
-    last_status_write = 0.0
+    sched = DeadlineScheduler()
+    sink = SerialSink(link)
+    status = StatusObserver(selected_sets_sorted, repeat_count or 0, global_start)
+    begin_high_resolution_timer()
 
-    try:
-        if repeat_count > 0:
-            total_loops = repeat_count
-            for i in range(1, total_loops + 1):
-                set_no = pick_set(i, selected_sets_sorted, force_rules)
-                events = sets[set_no]
-                duration = set_durations.get(set_no, 0.0)
-                loops_done += 1
-
-                loop_start = time.time()
-                print(
-                    f"\n[{i}/{total_loops}] 세트 {set_no} 실행 (예상 {duration:.3f}초)"
-                )
+    # 유한 반복이면 1..N, 무한 반복이면 1,2,3,... 으로 같은 루프를 돈다
+    if repeat_count > 0:
+        loop_indices = range(1, repeat_count + 1)
+    else:
+        print("무한 반복 모드입니다. Ctrl+C 또는 GUI STOP으로 종료하세요.")
+        loop_indices = itertools.count(1)
 
-                prev_t = 0.0
-                for ev in events:
-                    t = float(ev.get("time", 0.0))
-                    ev_type = ev.get("type", "down")
-                    key = (ev.get("key") or "").upper()
-
-                    delay = t - prev_t
-                    if delay > 0:
-                        time.sleep(delay)
-                    prev_t = t
-
-                    line = f"EV {ev_type} {key}\n"
-                    ser.write(line.encode("utf-8"))
-                    ser.flush()
-
-                    now = time.time()
-                    elapsed_set = now - loop_start
-                    elapsed_global = now - global_start
-                    if duration > 0:
-                        progress = min(100.0, (elapsed_set / duration) * 100.0)
-                    else:
-                        progress = 0.0
-
-                    if now - last_status_write >= 0.05:
-                        last_status_write = now
-                        write_status(
-                            {
-                                "running": True,
-                                "selected_sets": selected_sets_sorted,
-                                "loop_index": i,
-                                "loop_total": total_loops,
-                                "set_no": set_no,
-                                "set_duration": duration,
-                                "last_loop_elapsed": elapsed_set,
-                                "total_elapsed": elapsed_global,
-                                "progress": progress,
-                            }
-                        )
-
-                loop_elapsed = time.time() - loop_start
-                elapsed = time.time() - global_start
-                progress_all = (i / total_loops) * 100.0
+    try:
+        for i in loop_indices:
+            set_no = pick_set(i, selected_sets_sorted, force_rules)
+            plan = set_plans[set_no]
+            duration = set_durations.get(set_no, 0.0)
+            loops_done += 1
 
+            if repeat_count > 0:
                 print(
-                    f"  → 이번 세트 실제 소요: {loop_elapsed:.3f}초 "
-                    f"(예상 {duration:.3f}초)"
+                    f"\n[{i}/{repeat_count}] 세트 {set_no} 실행 (예상 {duration:.3f}초)"
                 )
+            else:
+                print(f"\n[{i}] 세트 {set_no} 실행 (예상 {duration:.3f}초, 무한 루프)")
+
+            status.begin_loop(i, set_no, duration)
+            result = play(plan, sink, observers=(status,), scheduler=sched)
+            if result.stopped:
+                raise StopRequested()
+
+            loop_elapsed = result.elapsed
+            elapsed = time.time() - global_start
+
+            print(
+                f"  → 이번 세트 실제 소요: {loop_elapsed:.3f}초 "
+                f"(예상 {duration:.3f}초)"
+            )
+            if repeat_count > 0:
+                progress_all = (i / repeat_count) * 100.0
                 print(
                     f"  → 누적 실행 시간: {elapsed:.1f}초, "
                     f"진행률: {progress_all:.1f}% (세트 {loops_done}회 완료)"
                 )
-
-                write_status(
-                    {
-                        "running": True,
-                        "selected_sets": selected_sets_sorted,
-                        "loop_index": i,
-                        "loop_total": total_loops,
-                        "set_no": set_no,
-                        "set_duration": duration,
-                        "last_loop_elapsed": loop_elapsed,
-                        "total_elapsed": elapsed,
-                        "progress": progress_all,
-                    }
-                )
-
-                delay_between = random.uniform(MIN_SET_DELAY, MAX_SET_DELAY)
-                if delay_between > 0:
-                    time.sleep(delay_between)
-
-            print("\n✅ 설정한 반복 횟수를 모두 완료했습니다.")
-        else:
-            print("무한 반복 모드입니다. Ctrl+C 또는 GUI STOP으로 종료하세요.")
-            while True:
-                loops_done += 1
-                set_no = pick_set(loops_done, selected_sets_sorted, force_rules)
-                events = sets[set_no]
-                duration = set_durations.get(set_no, 0.0)
-
-                loop_start = time.time()
-                print(
-                    f"\n[{loops_done}] 세트 {set_no} 실행 (예상 {duration:.3f}초, 무한 루프)"
-                )
-
-                prev_t = 0.0
-                for ev in events:
-                    t = float(ev.get("time", 0.0))
-                    ev_type = ev.get("type", "down")
-                    key = (ev.get("key") or "").upper()
-
-                    delay = t - prev_t
-                    if delay > 0:
-                        time.sleep(delay)
-                    prev_t = t
-
-                    line = f"EV {ev_type} {key}\n"
-                    ser.write(line.encode("utf-8"))
-                    ser.flush()
-
-                    now = time.time()
-                    elapsed_set = now - loop_start
-                    elapsed_global = now - global_start
-                    if duration > 0:
-                        progress = min(100.0, (elapsed_set / duration) * 100.0)
-                    else:
-                        progress = 0.0
-
-                    if now - last_status_write >= 0.05:
-                        last_status_write = now
-                        write_status(
-                            {
-                                "running": True,
-                                "selected_sets": selected_sets_sorted,
-                                "loop_index": loops_done,
-                                "loop_total": 0,
-                                "set_no": set_no,
-                                "set_duration": duration,
-                                "last_loop_elapsed": elapsed_set,
-                                "total_elapsed": elapsed_global,
-                                "progress": progress,
-                            }
-                        )
-
-                loop_elapsed = time.time() - loop_start
-                elapsed = time.time() - global_start
-
-                print(
-                    f"  → 이번 세트 실제 소요: {loop_elapsed:.3f}초 "
-                    f"(예상 {duration:.3f}초)"
-                )
+            else:
+                progress_all = 0.0
                 print(
                     f"  → 누적 실행 시간: {elapsed:.1f}초 "
                     f"(총 세트 {loops_done}회 실행됨)"
                 )
-
-                write_status(
-                    {
-                        "running": True,
-                        "selected_sets": selected_sets_sorted,
-                        "loop_index": loops_done,
-                        "loop_total": 0,
-                        "set_no": set_no,
-                        "set_duration": duration,
-                        "last_loop_elapsed": loop_elapsed,
-                        "total_elapsed": elapsed,
-                        "progress": 0.0,
-                    }
-                )
-
-                delay_between = random.uniform(MIN_SET_DELAY, MAX_SET_DELAY)
-                if delay_between > 0:
-                    time.sleep(delay_between)
+            print(f"  → 이벤트 지연: {result.lateness.format()}")
+
+            write_status(
+                {
+                    "running": True,
+                    "selected_sets": selected_sets_sorted,
+                    "loop_index": i,
+                    "loop_total": repeat_count or 0,
+                    "set_no": set_no,
+                    "set_duration": duration,
+                    "last_loop_elapsed": loop_elapsed,
+                    "total_elapsed": elapsed,
+                    "progress": progress_all,
+                }
+            )
+
+            delay_between = random.uniform(MIN_SET_DELAY, MAX_SET_DELAY)
+            if delay_between > 0:
+                time.sleep(delay_between)
+
+        print("\n✅ 설정한 반복 횟수를 모두 완료했습니다.")
 
     except KeyboardInterrupt:
         print("\n⏹ 사용자 종료 (Ctrl+C)")
+    except StopRequested:
+        print("\n🛑 STOP 신호 수신 → 매크로 종료")
     finally:
+        end_high_resolution_timer()
         total_elapsed = time.time() - global_start
-        try:
-            ser.close()
-        except Exception:
-            pass
+        link.close()
 
         print(
             f"포트 닫기 완료. 총 실행 시간 {total_elapsed:.1f}초, "
@@ -0,0 +1,332 @@
+# playback.py
+import time
+from array import array
+
+from common import BATCH_TICK
+from protocol import (
+    EVENT_OPCODES,
+    KEY_CODES,
+    PROTOCOL_BINARY,
+    PROTOCOL_TEXT,
+    StopRequested,
+    checksum,
+    coalesce_events,
+    encode_frame,
+    encode_text,
+)
+from scheduler import DeadlineScheduler, NS_PER_SEC
+
+# 재생 중 정지 요청을 확인하는 간격 (긴 공백 구간에서도 STOP 이 바로 먹히도록)
+STOP_POLL_NS = 20_000_000
+
+
+# ======================================================================
+# 1. 컴파일된 이벤트 재생 계획
+# ======================================================================
+class EventPlan:
+    """
+    녹화 이벤트 리스트를 재생 직전에 한 번만 파싱해 둔 것.
+    재생 루프에서는 dict 조회/문자열 처리/인코딩을 전혀 하지 않는다.
+
+    전송 묶음(같은 틱 이벤트) 단위:
+    - offsets_ns[i] : i번째 묶음의 목표 시각 (재생 시작 기준 ns, array 'q')
+    - batch_ends[i] : i번째 묶음까지의 누적 이벤트 수 (array 'I')
+    이벤트 단위:
+    - type_codes / key_codes : 프로토콜 opcode / 키 코드 (array 'B', 테이블에 없으면 0)
+    - types / keys           : 원래 이름 (텍스트 인코딩, 눌린 키 계산용)
+    """
+
+    def __init__(self, offsets_ns, batch_ends, types, keys, duration: float):
+        self.offsets_ns = offsets_ns
+        self.batch_ends = batch_ends
+        self.types = types
+        self.keys = keys
+        self.type_codes = array("B", (EVENT_OPCODES.get(t, 0) for t in types))
+        self.key_codes = array("B", (KEY_CODES.get(k, 0) for k in keys))
+        self.duration = duration
+        self._wire = {}
+
+    @classmethod
+    def compile(cls, events, tick=BATCH_TICK, key_map=None, rebase=False):
+        """
+        events: [{"type": "down", "key": "RIGHT", "time": 1.23}, ...]
+        key_map: 녹화 키 이름 → 피코 키 이름 변환 (없으면 그대로)
+        rebase: True 면 첫 이벤트 시각을 0으로 당긴다 (복합 동작 JSON 용)
+        """
+        groups = coalesce_events(events or [], tick)
+        base = groups[0][0] if (rebase and groups) else 0.0
+
+        offsets_ns = array("q")
+        batch_ends = array("I")
+        types = []
+        keys = []
+        for t, batch in groups:
+            for ev_type, key in batch:
+                types.append(ev_type)
+                keys.append(key_map.get(key, key) if key_map else key)
+            offsets_ns.append(max(0, int((t - base) * NS_PER_SEC)))
+            batch_ends.append(len(keys))
+
+        duration = offsets_ns[-1] / NS_PER_SEC if offsets_ns else 0.0
+        return cls(offsets_ns, batch_ends, types, keys, duration)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def batch_count(self) -> int:
+        return len(self.offsets_ns)
+
+    def batch_events(self, i: int):
+        """i번째 묶음의 [(type, KEY), ...] (재생 루프 밖에서만 사용)"""
+        begin = self.batch_ends[i - 1] if i > 0 else 0
+        end = self.batch_ends[i]
+        return list(zip(self.types[begin:end], self.keys[begin:end]))
+
+    def wire_for(self, link):
+        """
+        link 의 프로토콜에 맞춰 묶음별 전송 바이트를 미리 인코딩 (프로토콜별 1회 캐시).
+        바이너리 프레임의 SEQ / 체크섬은 0으로 비워 두고, 재생 직전에 stamp() 가
+        링크의 연속 번호로 채운 복사본을 만든다 (프레임 위치는 frame_offsets).
+        """
+        return self._encode(link)[0]
+
+    def stamp(self, link):
+        """
+        wire_for 의 바이너리 프레임에 link.seq 부터 이어지는 SEQ / 체크섬을 채운 묶음 리스트와
+        묶음별 "보낸 뒤의 다음 SEQ" (array 'B'). 텍스트 모드면 (wire_for, None).
+        재생 1회에 한 번 (SerialSink.prepare) 부르고, 재생 루프에서는 그대로 보내기만 한다.
+        """
+        wire, offsets = self._encode(link)
+        if not link.is_binary:
+            return wire, None
+        seq = link.seq
+        stamped = []
+        next_seqs = array("B")
+        for chunk, frames in zip(wire, offsets):
+            if frames:
+                buf = bytearray(chunk)
+                for pos in frames:
+                    buf[pos + 2] = seq
+                    buf[pos + 4] = checksum(buf[pos + 1], seq, buf[pos + 3])
+                    seq = (seq + 1) & 0xFF
+                chunk = bytes(buf)
+            stamped.append(chunk)
+            next_seqs.append(seq)
+        return stamped, next_seqs
+
+    def frame_offsets(self, link):
+        """묶음별 바이너리 프레임 시작 위치 튜플 (텍스트 모드면 전부 빈 튜플)."""
+        return self._encode(link)[1]
+
+    def _encode(self, link):
+        mode = PROTOCOL_BINARY if link.is_binary else PROTOCOL_TEXT
+        cached = self._wire.get(mode)
+        if cached is not None:
+            return cached
+
+        wire = []
+        offsets = []
+        begin = 0
+        for end in self.batch_ends:
+            chunk = bytearray()
+            frames = []
+            for idx in range(begin, end):
+                opcode = self.type_codes[idx]
+                key_code = self.key_codes[idx]
+                if mode == PROTOCOL_BINARY and opcode and key_code:
+                    frames.append(len(chunk))
+                    chunk += encode_frame(opcode, 0, key_code)
+                else:
+                    chunk += encode_text(self.types[idx], self.keys[idx])
+            wire.append(bytes(chunk))
+            offsets.append(tuple(frames))
+            begin = end
+
+        cached = self._wire[mode] = (wire, offsets)
+        return cached
+
+    def pressed_after(self, events_sent: int):
+        """앞에서부터 events_sent 개를 보냈을 때 눌린 채로 남은 키."""
+        pressed = set()
+        for idx in range(events_sent):
+            if self.types[idx] == "down":
+                pressed.add(self.keys[idx])
+            elif self.types[idx] == "up":
+                pressed.discard(self.keys[idx])
+        return pressed
+
+
+class PlaybackResult:
+    def __init__(self):
+        self.elapsed = 0.0
+        self.events_sent = 0
+        self.stopped = False
+        self.pressed = set()  # 재생이 끝난 시점에 눌려 있는 키
+        self.lateness = None  # LatenessStats
+
+
+# ======================================================================
+# 2. 출력 대상 (sink)
+# ======================================================================
+# prepare(plan) 은 재생 전에 1회, send(i) 는 i번째 묶음마다 호출된다.
+class SerialSink:
+    """PicoLink / BrokerClient 로 미리 인코딩된 묶음을 write 1회로 전송."""
+
+    def __init__(self, link):
+        self.link = link
+        self.wire = ()
+        self.next_seqs = None
+
+    def prepare(self, plan):
+        # 바이너리면 링크의 현재 SEQ 부터 번호를 매긴 복사본 (재생 중에는 다른 전송이 없어야 함)
+        self.wire, self.next_seqs = plan.stamp(self.link)
+
+    def send(self, i: int):
+        if self.next_seqs is None:
+            self.link.write(self.wire[i])
+        else:
+            self.link.write(self.wire[i], self.next_seqs[i])
+
+    def stop_requested(self) -> bool:
+        return self.link.stop_requested()
+
+
+class NullSink:
+    """아무 데도 보내지 않음 (스케줄러 타이밍 측정용)."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def prepare(self, plan):
+        pass
+
+    def send(self, i: int):
+        self.sent += 1
+
+    def stop_requested(self) -> bool:
+        return False
+
+
+class RecorderSink:
+    """보낸 이벤트를 (재생 시작 기준 ns, type, KEY)로 기록 (벤치마크/비교용)."""
+
+    def __init__(self):
+        self.records = []
+        self.plan = None
+        self.start_ns = time.perf_counter_ns()
+
+    def prepare(self, plan):
+        self.plan = plan
+        self.records = []
+        self.start_ns = time.perf_counter_ns()
+
+    def send(self, i: int):
+        now = time.perf_counter_ns() - self.start_ns
+        for ev_type, key in self.plan.batch_events(i):
+            self.records.append((now, ev_type, key))
+
+    def stop_requested(self) -> bool:
+        return False
+
+
+# ======================================================================
+# 3. 진행 상황 관찰자 (observer)
+# ======================================================================
+class PlaybackObserver:
+    """필요한 메서드만 오버라이드해서 사용."""
+
+    def on_start(self, plan):
+        pass
+
+    def on_progress(self, plan, events_sent: int, elapsed: float):
+        pass
+
+    def on_finish(self, plan, result):
+        pass
+
+
+# ======================================================================
+# 4. 재생 엔진
+# ======================================================================
+def play(plan, sink, observers=(), scheduler=None, should_stop=None):
+    """
+    plan 을 sink 로 재생한다.
+    - scheduler: DeadlineScheduler (없으면 새로 만든다). 재생 시작 시 start() 된다.
+    - should_stop: 호출 시 True 를 반환하면 재생을 중단 (예: GUI STOP 플래그)
+    중단되면 result.stopped = True, 눌린 채로 남은 키는 result.pressed 에 담긴다.
+    """
+    sched = scheduler or DeadlineScheduler()
+    result = PlaybackResult()
+
+    def stop_now():
+        return sink.stop_requested() or (should_stop is not None and should_stop())
+
+    sink.prepare(plan)
+    for ob in observers:
+        ob.on_start(plan)
+
+    send = sink.send
+    wait_until = sched.wait_until
+    remaining_ns = sched.remaining_ns
+    batch_ends = plan.batch_ends
+    poll_ns = 2 * STOP_POLL_NS
+    events_sent = 0
+
+    sched.start()
+    try:
+        for i, offset_ns in enumerate(plan.offsets_ns):
+            # 긴 공백은 잘게 나눠 기다리면서 정지 요청을 확인
+            while remaining_ns(offset_ns) > poll_ns:
+                if stop_now():
+                    raise StopRequested()
+                time.sleep(STOP_POLL_NS / NS_PER_SEC)
+            if stop_now():
+                raise StopRequested()
+
+            wait_until(offset_ns)
+            send(i)
+            events_sent = batch_ends[i]
+
+            if observers:
+                elapsed = sched.elapsed()
+                for ob in observers:
+                    ob.on_progress(plan, events_sent, elapsed)
+    except StopRequested:
+        result.stopped = True
+
+    result.elapsed = sched.elapsed()
+    result.lateness = sched.lateness
+    result.events_sent = events_sent
+    result.pressed = plan.pressed_after(events_sent)
+
+    for ob in observers:
+        ob.on_finish(plan, result)
+
+    return result
+
+
+def benchmark(events, repeat: int = 1):
+    """실제 포트 없이 NullSink 로 재생해서 스케줄러 지연 통계를 출력."""
+    plan = EventPlan.compile(events)
+    for i in range(1, repeat + 1):
+        result = play(plan, NullSink())
+        print(
+            f"[{i}/{repeat}] 이벤트 {len(plan)}개, 소요 {result.elapsed:.3f}초 "
+            f"(예상 {plan.duration:.3f}초), 지연: {result.lateness.format()}"
+        )
+
+
+if __name__ == "__main__":
+    # 사용법: python playback.py [macro_sets.json] [세트번호]
+    import sys
+    import json
+
+    from common import MACRO_SETS_FILE
+
+    path = sys.argv[1] if len(sys.argv) >= 2 else MACRO_SETS_FILE
+    with open(path, "r", encoding="utf-8") as f:
+        sets = json.load(f).get("sets", {})
+    set_key = sys.argv[2] if len(sys.argv) >= 3 else sorted(sets, key=int)[0]
+    print(f"세트 {set_key} 벤치마크 ({path})")
+    benchmark(sets[set_key])
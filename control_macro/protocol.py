@@ -0,0 +1,278 @@
+# protocol.py
+import serial
+
+# ───────── 키 코드 테이블 (USB HID Usage ID 기준) ─────────
+# record.py 에서 녹화 가능한 키 전체를 1바이트 코드로 매핑한다.
+KEY_CODES = {}
+for _i, _c in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
+    KEY_CODES[_c] = 0x04 + _i
+for _i, _c in enumerate("1234567890"):
+    KEY_CODES[_c] = 0x1E + _i
+for _i in range(1, 13):
+    KEY_CODES[f"F{_i}"] = 0x3A + (_i - 1)
+KEY_CODES.update(
+    {
+        "ENTER": 0x28,
+        "ESC": 0x29,
+        "TAB": 0x2B,
+        "SPACE": 0x2C,
+        "RIGHT": 0x4F,
+        "LEFT": 0x50,
+        "DOWN": 0x51,
+        "UP": 0x52,
+        "CTRL": 0xE0,
+        "SHIFT": 0xE1,
+        "ALT": 0xE2,
+    }
+)
+
+# ───────── 바이너리 프레임 ─────────
+# [SYNC][OPCODE][SEQ][KEY][CHECKSUM]  (5바이트)
+# - SYNC 는 ASCII 범위 밖(0xA5)이라 피코 쪽에서 텍스트 라인과 구분할 수 있다.
+# - SEQ 는 링크(직렬 포트 1개)에서 보내는 모든 프레임의 연속 번호 (0~255, 255 다음은 0).
+#   EV / STOP 프레임 모두 1씩 늘고, 텍스트 라인은 SEQ 를 쓰지 않는다.
+#   스트림은 "PROTO BIN" 협상 때 시작하며 양쪽 모두 0부터 센다.
+#   미리 인코딩된 재생 계획(EventPlan.wire_for)의 프레임은 재생 직전에 EventPlan.stamp 가
+#   링크의 현재 SEQ 부터 번호를 매기고, 묶음을 보낼 때마다 link.seq 를 이어 받으므로
+#   같은 스트림에 이어진다 (중간에 STOP 해도 다음 SEQ 는 실제로 보낸 프레임 뒤부터).
+# - CHECKSUM 은 OPCODE + SEQ + KEY 의 하위 8비트.
+#
+# 수신 규칙 (피코 펌웨어, 파이썬 참조 구현은 FrameDecoder):
+# - SYNC 가 아닌 바이트는 텍스트 라인으로 모아 '\n' 에서 처리한다.
+# - SYNC / 체크섬이 맞지 않으면 SYNC 1바이트만 버리고 다음 SYNC 부터 다시 맞춘다.
+# - SEQ 가 기대값과 같으면 정상. 다르면 그 사이 프레임이 유실된 것으로 보고
+#   불연속 횟수만 세고, 받은 프레임은 그대로 실행한 뒤 기대값을 SEQ + 1 로 다시 맞춘다.
+#   (재전송 요청은 없다)
+# - STOP 프레임은 SEQ 와 상관없이 항상 실행한다 (모든 키 떼기).
+FRAME_SYNC = 0xA5
+FRAME_SIZE = 5
+
+OP_DOWN = 0x01
+OP_UP = 0x02
+OP_STOP = 0x0F
+
+EVENT_OPCODES = {"down": OP_DOWN, "up": OP_UP}
+
+# ───────── 협상 ─────────
+# 바이너리 프레임을 이해하는 펌웨어는 "PROTO BIN" 에 "PROTO BIN OK" 로 응답한다.
+# 응답이 없거나 다르면 기존 텍스트 프로토콜("EV down RIGHT\n")을 그대로 쓴다.
+NEGOTIATE_REQUEST = b"PROTO BIN\n"
+NEGOTIATE_REPLY = b"PROTO BIN OK"
+NEGOTIATE_TIMEOUT = 0.2
+
+PROTOCOL_TEXT = "text"
+PROTOCOL_BINARY = "binary"
+PROTOCOL_AUTO = "auto"
+
+
+def checksum(opcode: int, seq: int, key_code: int) -> int:
+    return (opcode + seq + key_code) & 0xFF
+
+
+def encode_text(ev_type: str, key: str) -> bytes:
+    """기존 텍스트 프로토콜 한 줄. 예: b"EV down RIGHT\\n" """
+    return f"EV {ev_type} {key}\n".encode("utf-8")
+
+
+def encode_frame(opcode: int, seq: int, key_code: int = 0) -> bytes:
+    seq &= 0xFF
+    return bytes((FRAME_SYNC, opcode, seq, key_code, checksum(opcode, seq, key_code)))
+
+
+def decode_frame(frame: bytes):
+    """
+    5바이트 프레임을 (opcode, seq, key_code)로 되돌린다.
+    SYNC / 체크섬이 맞지 않으면 None.
+    """
+    if len(frame) != FRAME_SIZE or frame[0] != FRAME_SYNC:
+        return None
+    _, opcode, seq, key_code, chk = frame
+    if checksum(opcode, seq, key_code) != chk:
+        return None
+    return opcode, seq, key_code
+
+
+def coalesce_events(events, tick: float):
+    """
+    녹화 이벤트 리스트를 같은 스케줄링 틱(tick 초) 안에 떨어지는 것끼리 묶는다.
+    return: [(묶음 시작 시각, [(type, KEY), ...]), ...]
+    """
+    groups = []
+    group_t = None
+    batch = None
+
+    for ev in events:
+        t = float(ev.get("time", 0.0))
+        ev_type = ev.get("type", "down")
+        key = (ev.get("key") or "").upper()
+
+        if batch is None or t - group_t >= tick:
+            group_t = t
+            batch = []
+            groups.append((group_t, batch))
+        batch.append((ev_type, key))
+
+    return groups
+
+
+class FrameDecoder:
+    """
+    피코 쪽 수신 규칙(위 "수신 규칙")의 참조 구현. 펌웨어와 같은 순서로 바이트를 해석한다.
+    feed() 반환: [("frame", opcode, seq, key_code) 또는 ("text", 라인), ...]
+    """
+
+    def __init__(self):
+        self.expected = 0
+        self.gaps = 0  # SEQ 불연속 횟수 (그 사이 프레임 유실)
+        self.bad = 0  # SYNC / 체크섬 오류로 버린 프레임 수
+        self._buf = bytearray()
+        self._line = bytearray()
+
+    def reset(self):
+        """협상("PROTO BIN")을 받았을 때: 새 스트림."""
+        self.expected = 0
+
+    def feed(self, data: bytes):
+        out = []
+        buf = self._buf
+        buf += data
+        i = 0
+        while i < len(buf):
+            if buf[i] != FRAME_SYNC:
+                if buf[i] == 0x0A:
+                    out.append(("text", self._line.decode("utf-8", "replace")))
+                    self._line.clear()
+                else:
+                    self._line.append(buf[i])
+                i += 1
+                continue
+            if len(buf) - i < FRAME_SIZE:
+                break  # 나머지는 다음 feed 에서
+            decoded = decode_frame(bytes(buf[i : i + FRAME_SIZE]))
+            if decoded is None:
+                self.bad += 1
+                i += 1
+                continue
+            opcode, seq, key_code = decoded
+            if seq != self.expected:
+                self.gaps += 1
+            self.expected = (seq + 1) & 0xFF
+            out.append(("frame", opcode, seq, key_code))
+            i += FRAME_SIZE
+        del buf[:i]
+        return out
+
+
+class StopRequested(Exception):
+    """재생 도중 다른 프로세스에서 STOP 이 들어왔을 때 재생 루프를 빠져나가기 위한 예외."""
+
+
+class PicoLink:
+    """
+    피코 직렬 포트 래퍼.
+    - queue() 로 쌓아 둔 이벤트를 flush() 한 번(write + flush 1회)으로 내보낸다.
+    - 협상에 성공하면 바이너리 프레임, 아니면 텍스트 라인으로 인코딩한다.
+      (키 테이블에 없는 키는 바이너리 모드에서도 텍스트 라인으로 보낸다)
+    """
+
+    def __init__(self, ser, protocol: str = PROTOCOL_TEXT):
+        self.ser = ser
+        self.protocol = protocol
+        self.seq = 0
+        self._pending = bytearray()
+
+    @classmethod
+    def open(cls, port, baud, timeout=1, protocol=PROTOCOL_AUTO):
+        ser = serial.Serial(port, baud, timeout=timeout)
+        link = cls(ser)
+        if protocol == PROTOCOL_AUTO:
+            link.negotiate()
+        else:
+            link.protocol = protocol
+        return link
+
+    @property
+    def is_open(self) -> bool:
+        return self.ser is not None and self.ser.is_open
+
+    @property
+    def is_binary(self) -> bool:
+        return self.protocol == PROTOCOL_BINARY
+
+    def negotiate(self, timeout: float = NEGOTIATE_TIMEOUT) -> str:
+        """바이너리 프레임 지원 여부를 물어보고, 결과 프로토콜 이름을 반환."""
+        self.protocol = PROTOCOL_TEXT
+        self.seq = 0  # 새 스트림 (피코도 "PROTO BIN" 을 받으면 0부터 기대)
+        old_timeout = self.ser.timeout
+        try:
+            self.ser.reset_input_buffer()
+            self.ser.write(NEGOTIATE_REQUEST)
+            self.ser.flush()
+            self.ser.timeout = timeout
+            reply = self.ser.readline().strip()
+            if reply == NEGOTIATE_REPLY:
+                self.protocol = PROTOCOL_BINARY
+        except Exception:
+            self.protocol = PROTOCOL_TEXT
+        finally:
+            self.ser.timeout = old_timeout
+        return self.protocol
+
+    def encode(self, ev_type: str, key: str) -> bytes:
+        if self.is_binary:
+            opcode = EVENT_OPCODES.get(ev_type)
+            key_code = KEY_CODES.get(key)
+            if opcode is not None and key_code is not None:
+                frame = encode_frame(opcode, self.seq, key_code)
+                self.seq = (self.seq + 1) & 0xFF
+                return frame
+        return encode_text(ev_type, key)
+
+    def encode_stop(self) -> bytes:
+        if self.is_binary:
+            frame = encode_frame(OP_STOP, self.seq)
+            self.seq = (self.seq + 1) & 0xFF
+            return frame
+        return b"STOP\n"
+
+    def stop_requested(self) -> bool:
+        # 직접 연결은 다른 프로세스의 STOP 을 알 방법이 없다 (broker 연결에서만 True 가능)
+        return False
+
+    def queue(self, ev_type: str, key: str):
+        self._pending += self.encode(ev_type, key)
+
+    def flush(self):
+        """쌓인 이벤트를 write 1회로 전송."""
+        if not self._pending:
+            return
+        data = bytes(self._pending)
+        self._pending.clear()
+        self.ser.write(data)
+        self.ser.flush()
+
+    def send(self, ev_type: str, key: str):
+        self.queue(ev_type, key)
+        self.flush()
+
+    def write(self, data: bytes, next_seq=None):
+        """
+        미리 인코딩된 바이트(EventPlan.stamp)를 그대로 전송.
+        next_seq 는 data 안 프레임 다음의 SEQ (프레임이 있으면 link.seq 를 이어 받는다).
+        """
+        self.ser.write(data)
+        self.ser.flush()
+        if next_seq is not None:
+            self.seq = next_seq
+
+    def send_stop(self):
+        # STOP 은 대기 중인 이벤트보다 먼저 나가야 하므로 큐를 버리고 바로 보낸다.
+        self._pending.clear()
+        self.ser.write(self.encode_stop())
+        self.ser.flush()
+
+    def close(self):
+        try:
+            self.ser.close()
+        except Exception:
+            pass
@@ -0,0 +1,122 @@
+# scheduler.py
+import os
+import time
+import ctypes
+
+# 마감 시각까지 이만큼(ns) 남으면 sleep 대신 busy-wait 로 정확히 맞춘다
+SPIN_THRESHOLD_NS = 1_000_000
+
+# sleep 이 예정보다 늦게 깨어나는 정도(ns)를 추정하는 EWMA 가중치
+OVERSHOOT_ALPHA = 0.2
+
+NS_PER_SEC = 1_000_000_000
+
+
+def begin_high_resolution_timer() -> bool:
+    """
+    Windows 기본 타이머 해상도(약 15.6ms)를 1ms로 올려서 time.sleep 오차를 줄인다.
+    다른 OS에서는 아무것도 하지 않는다. 성공하면 True (끝나면 end_... 호출).
+    """
+    if os.name != "nt":
+        return False
+    try:
+        ctypes.windll.winmm.timeBeginPeriod(1)
+        return True
+    except Exception:
+        return False
+
+
+def end_high_resolution_timer():
+    if os.name != "nt":
+        return
+    try:
+        ctypes.windll.winmm.timeEndPeriod(1)
+    except Exception:
+        pass
+
+
+class LatenessStats:
+    """이벤트별 지연(실제 전송 시각 - 목표 시각, ns) 통계."""
+
+    def __init__(self):
+        self.samples = []
+
+    def reset(self):
+        self.samples = []
+
+    def add(self, late_ns: int):
+        self.samples.append(late_ns)
+
+    def summary(self) -> dict:
+        """단위: ms"""
+        n = len(self.samples)
+        if n == 0:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(self.samples)
+        return {
+            "count": n,
+            "mean": sum(ordered) / n / 1e6,
+            "p50": ordered[(n - 1) // 2] / 1e6,
+            "p95": ordered[min(n - 1, int(n * 0.95))] / 1e6,
+            "max": ordered[-1] / 1e6,
+        }
+
+    def format(self) -> str:
+        st = self.summary()
+        return (
+            f"평균 {st['mean']:.2f}ms, p50 {st['p50']:.2f}ms, "
+            f"p95 {st['p95']:.2f}ms, 최대 {st['max']:.2f}ms (이벤트 {st['count']}개)"
+        )
+
+
+class DeadlineScheduler:
+    """
+    세트 시작 시각 기준 절대 마감 시각(perf_counter_ns)에 맞춰 대기한다.
+    - 이전 이벤트의 전송/상태 기록 지연이 다음 이벤트로 누적되지 않는다.
+    - 마감 직전 SPIN_THRESHOLD_NS 구간은 busy-wait 로 맞춘다.
+    - sleep 이 늦게 깨는 정도를 추정해서 그만큼 일찍 깨어난다 (드리프트 보정).
+    """
+
+    def __init__(self, spin_ns: int = SPIN_THRESHOLD_NS):
+        self.spin_ns = spin_ns
+        self.overshoot_ns = 0.0
+        self.start_ns = time.perf_counter_ns()
+        self.lateness = LatenessStats()
+
+    def start(self):
+        """세트(루프) 하나의 기준 시각을 지금으로 잡고 지연 통계를 초기화."""
+        self.start_ns = time.perf_counter_ns()
+        self.lateness.reset()
+
+    def elapsed(self) -> float:
+        """기준 시각부터 지난 시간(초)."""
+        return (time.perf_counter_ns() - self.start_ns) / NS_PER_SEC
+
+    def remaining_ns(self, offset_ns: int) -> int:
+        """기준 시각 + offset_ns 까지 남은 시간(ns). 지났으면 음수."""
+        return self.start_ns + offset_ns - time.perf_counter_ns()
+
+    def wait_until(self, offset_ns: int) -> int:
+        """
+        기준 시각 + offset_ns 까지 대기하고, 실제 지연(ns)을 기록해서 반환.
+        이미 지났으면 바로 반환한다.
+        """
+        deadline = self.start_ns + offset_ns
+        perf_ns = time.perf_counter_ns
+
+        now = perf_ns()
+        sleep_ns = deadline - now - self.spin_ns - int(self.overshoot_ns)
+        if sleep_ns > 0:
+            time.sleep(sleep_ns / NS_PER_SEC)
+            woke = perf_ns()
+            over = woke - (now + sleep_ns)
+            self.overshoot_ns += OVERSHOOT_ALPHA * (over - self.overshoot_ns)
+            self.overshoot_ns = max(0.0, self.overshoot_ns)
+            now = woke
+
+        while now < deadline:
+            now = perf_ns()
+
+        late = now - deadline
+        self.lateness.add(late)
+        return late
@@ -0,0 +1,224 @@
+# status.py
+import os
+import json
+import mmap
+import atexit
+import struct
+import threading
+
+# ───────── 세트 매크로 상태 공유 메모리 ─────────
+# macro 프로세스가 제자리에서 덮어쓰고, GUI 는 잠금 없이 읽는다 (seqlock).
+#
+#   [0:4]   seq (uint32)  : 쓰는 중이면 홀수, 다 쓰면 짝수
+#   [4:8]   magic "PMST"
+#   [8:]    payload (STATUS_STRUCT)
+#
+# 읽는 쪽은 seq 가 짝수이고 payload 복사 전후로 seq 가 같을 때만 값을 믿는다.
+# 그래서 반쯤 쓰인 상태를 읽는 일이 없다.
+
+MAGIC = b"PMST"
+MAX_SETS = 32
+
+SEQ_STRUCT = struct.Struct("<I")
+HEADER_SIZE = 8
+
+# running, loop_index, loop_total, set_no(-1=None),
+# set_duration, last_loop_elapsed, total_elapsed, progress,
+# selected_sets 개수, selected_sets[MAX_SETS]
+STATUS_STRUCT = struct.Struct(f"<?IIidddd B{MAX_SETS}B")
+BLOCK_SIZE = HEADER_SIZE + STATUS_STRUCT.size
+
+READ_RETRIES = 100
+
+
+def pack_status(state: dict) -> bytes:
+    sets = [int(n) for n in (state.get("selected_sets") or [])][:MAX_SETS]
+    set_no = state.get("set_no")
+    return STATUS_STRUCT.pack(
+        bool(state.get("running", False)),
+        int(state.get("loop_index", 0) or 0),
+        int(state.get("loop_total", 0) or 0),
+        -1 if set_no is None else int(set_no),
+        float(state.get("set_duration", 0.0) or 0.0),
+        float(state.get("last_loop_elapsed", 0.0) or 0.0),
+        float(state.get("total_elapsed", 0.0) or 0.0),
+        float(state.get("progress", 0.0) or 0.0),
+        len(sets),
+        *(sets + [0] * (MAX_SETS - len(sets))),
+    )
+
+
+def unpack_status(payload: bytes) -> dict:
+    values = STATUS_STRUCT.unpack(payload)
+    n_sets = values[8]
+    return {
+        "running": values[0],
+        "selected_sets": list(values[9 : 9 + n_sets]),
+        "loop_index": values[1],
+        "loop_total": values[2],
+        "set_no": None if values[3] < 0 else values[3],
+        "set_duration": values[4],
+        "last_loop_elapsed": values[5],
+        "total_elapsed": values[6],
+        "progress": values[7],
+    }
+
+
+class StatusBlock:
+    """파일에 매핑한 고정 크기 상태 블록. 쓰는 프로세스는 하나만 있어야 한다."""
+
+    def __init__(self, f, mm):
+        self._f = f
+        self._mm = mm
+
+    @classmethod
+    def create(cls, path):
+        """쓰기용으로 열기 (없으면 만들고, 크기가 다르면 맞춘다)."""
+        f = open(path, "r+b" if os.path.exists(path) else "w+b")
+        f.seek(0, os.SEEK_END)
+        if f.tell() != BLOCK_SIZE:
+            f.truncate(BLOCK_SIZE)
+        f.flush()
+        mm = mmap.mmap(f.fileno(), BLOCK_SIZE)
+        if mm[4:8] != MAGIC:
+            mm[0:HEADER_SIZE] = SEQ_STRUCT.pack(0) + MAGIC
+        return cls(f, mm)
+
+    @classmethod
+    def open(cls, path):
+        """읽기용으로 열기. 아직 블록이 없으면 None."""
+        try:
+            if os.path.getsize(path) != BLOCK_SIZE:
+                return None
+            f = open(path, "r+b")
+        except OSError:
+            return None
+        mm = mmap.mmap(f.fileno(), BLOCK_SIZE)
+        if mm[4:8] != MAGIC:
+            mm.close()
+            f.close()
+            return None
+        return cls(f, mm)
+
+    def write(self, state: dict):
+        mm = self._mm
+        payload = pack_status(state)
+        seq = SEQ_STRUCT.unpack_from(mm, 0)[0]
+        if seq & 1:
+            seq += 1  # 이전 writer 가 쓰는 도중 죽은 경우
+        SEQ_STRUCT.pack_into(mm, 0, (seq + 1) & 0xFFFFFFFF)
+        mm[HEADER_SIZE:BLOCK_SIZE] = payload
+        SEQ_STRUCT.pack_into(mm, 0, (seq + 2) & 0xFFFFFFFF)
+
+    def read(self):
+        """일관된 상태 dict. 계속 쓰는 중이라 못 읽었으면 None."""
+        mm = self._mm
+        for _ in range(READ_RETRIES):
+            seq1 = SEQ_STRUCT.unpack_from(mm, 0)[0]
+            if seq1 & 1:
+                continue
+            payload = mm[HEADER_SIZE:BLOCK_SIZE]
+            seq2 = SEQ_STRUCT.unpack_from(mm, 0)[0]
+            if seq1 == seq2:
+                return unpack_status(payload)
+        return None
+
+    def close(self):
+        try:
+            self._mm.close()
+        finally:
+            self._f.close()
+
+
+def reset_status(path):
+    """상태 블록을 '정지됨'으로 덮어쓴다 (macro 프로세스가 강제 종료된 경우용)."""
+    if not os.path.exists(path):
+        return
+    try:
+        block = StatusBlock.create(path)
+    except OSError:
+        return
+    try:
+        block.write({"running": False})
+    finally:
+        block.close()
+
+
+class StatusPublisher:
+    """
+    상태 기록(공유 메모리 + JSON 스냅샷)을 백그라운드 스레드에서 처리한다.
+    재생 스레드는 post() 로 최신 상태를 1칸짜리 우편함에 넣기만 하고 바로 돌아간다.
+    밀린 상태는 최신 것 하나만 남고 버려진다 (디스크가 느려도 키 입력이 밀리지 않음).
+    """
+
+    def __init__(self, shm_path, json_path):
+        self.shm_path = shm_path
+        self.json_path = json_path
+        self._block = None
+        self._latest = None  # 우편함: 가장 최근 상태 dict
+        self._version = 0  # post 할 때마다 1 증가 (재생 스레드만 씀)
+        self._published = 0  # 마지막으로 기록한 version (기록 스레드만 씀)
+        self._snapshot_pending = False
+        self._wake = threading.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def post(self, state: dict, snapshot: bool = False):
+        """
+        최신 상태를 우편함에 넣는다 (이전 값은 덮어씀).
+        snapshot=True 면 다음 기록 때 JSON 파일도 같이 저장한다.
+        """
+        # 순서 중요: 상태 → 스냅샷 플래그 → version (읽는 쪽은 반대 순서로 읽음)
+        self._latest = state
+        if snapshot:
+            self._snapshot_pending = True
+        self._version += 1
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            self._publish()
+
+    def _publish(self):
+        # 잠금 없이 읽기: 플래그를 먼저 가져가고 나서 version/상태를 읽으면
+        # 플래그를 세운 post 의 상태(또는 그보다 최신)를 항상 보게 된다.
+        snapshot = self._snapshot_pending
+        if snapshot:
+            self._snapshot_pending = False
+        version = self._version
+        state = self._latest
+        if state is None or (version == self._published and not snapshot):
+            return
+        self._published = version
+
+        try:
+            if self._block is None:
+                self._block = StatusBlock.create(self.shm_path)
+            self._block.write(state)
+        except Exception:
+            pass
+
+        if not snapshot:
+            return
+        try:
+            with open(self.json_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+        except Exception:
+            pass
+
+    def close(self):
+        """스레드를 멈추고, 남아 있는 마지막 상태를 기록한다."""
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        self._thread.join(timeout=1.0)
+        self._publish()
+        if self._block is not None:
+            self._block.close()
+            self._block = None
@@ -1,34 +1,46 @@
 # stop.py
 import time
-import serial
 import os
-from common import PORT, BAUD, SET_STATUS_FILE
+from common import PORT, BAUD, SET_STATUS_FILE, SET_STATUS_SHM_FILE
+from status import reset_status
+from protocol import PicoLink, PROTOCOL_TEXT
+from broker import open_pico
 
 
-def send_stop_signal():
+def send_stop_signal(clear_status=True):
     """
     Pico로 STOP 신호를 보내고,
     세트 매크로 상태 파일도 제거한다.
+    clear_status=False 면 STOP 만 보낸다 (매크로 프로세스가 아직 살아 있어서
+    종료한 뒤에 clear_set_status() 를 따로 부르는 경우).
     """
 
     print("🛑 STOP 요청 시작")
 
     try:
-        ser = serial.Serial(PORT, BAUD, timeout=1)
-        time.sleep(0.3)
+        # broker 가 있으면 이미 열린 포트로 즉시 전송, 없으면 직접 열고 안정화 대기.
+        # STOP 한 줄만 보내므로 협상 없이 텍스트로 보낸다 (바이너리 펌웨어도 텍스트 수신 가능)
+        link = open_pico(PORT, BAUD, timeout=1, protocol=PROTOCOL_TEXT, settle=0.3)
 
         # Pico 측에서 모든 키를 up 처리하도록 명시적으로 STOP 전송
-        ser.write(b"STOP\n")
-        ser.flush()
-        time.sleep(0.2)
+        link.send_stop()
+        if isinstance(link, PicoLink):
+            time.sleep(0.2)
 
-        ser.close()
+        link.close()
         print("✅ STOP 전송 완료 (Pico)")
 
     except Exception as e:
         print(f"⚠ STOP 전송 실패: {e}")
 
-    # 상태파일 삭제 (세트 매크로 GUI 상태 리셋용)
+    if clear_status:
+        clear_set_status()
+
+    print("🛑 STOP 처리 종료")
+
+
+def clear_set_status():
+    """세트 매크로 상태 파일 삭제 + 공유 메모리 상태를 '정지됨'으로 (GUI 상태 리셋용)."""
     try:
         if os.path.exists(SET_STATUS_FILE):
             os.remove(SET_STATUS_FILE)
@@ -36,4 +48,6 @@ def send_stop_signal():
     except:
         pass
 
-    print("🛑 STOP 처리 종료")
+    # 공유 메모리 상태는 파일을 지우지 않고 '정지됨'으로 덮어쓴다
+    # (GUI가 매핑해 두고 읽는 중이라 Windows에서는 삭제할 수 없음)
+    reset_status(SET_STATUS_SHM_FILE)
@@ -11,6 +11,11 @@ import string
 
 import serial
 
+# 상위 폴더(control_macro)의 공용 재생 엔진 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from protocol import PicoLink
+from playback import EventPlan, PlaybackObserver, SerialSink, play
+
 # GUI 관련 모듈은 gui 모드일 때만 import (콘솔 모드에서도 문제 안 나게)
 try:
     import tkinter as tk
@@ -354,52 +359,43 @@ def mode_set_macro(selected_cli=None, repeat_count=None):
         세트 하나를 재생하면서, 이벤트마다 상태 파일을 주기적으로 갱신.
         loop_index / loop_total / set_no 기준으로 GUI에 실시간 진행 상황 전달.
         """
-        nonlocal last_status_write
-
         print(f"\n▶ 세트 {set_no} 실행 (이벤트 {len(events)}개)")
-        start_set = time.time()
-        prev_t = 0.0
-
-        for ev in events:
-            t = float(ev.get("time", 0.0))
-            ev_type = ev.get("type", "down")
-            key = (ev.get("key") or "").upper()
-
-            delay = t - prev_t
-            if delay > 0:
-                time.sleep(delay)
-            prev_t = t
-
-            line = f"EV {ev_type} {key}\n"
-            ser.write(line.encode("utf-8"))
-            ser.flush()
-
-            # ── 실시간 상태 갱신 ──
-            now = time.time()
-            elapsed_set = now - start_set
-            elapsed_global = now - global_start
-
-            if set_duration > 0:
-                progress = min(100.0, (elapsed_set / set_duration) * 100.0)
-            else:
-                progress = 0.0
 
-            # 50ms 이상 간격으로만 상태 파일 갱신
-            if now - last_status_write >= 0.05:
-                last_status_write = now
-                write_status(
-                    {
-                        "running": True,
-                        "selected_sets": selected_sets,
-                        "loop_index": loop_index,
-                        "loop_total": loop_total,
-                        "set_no": set_no,
-                        "set_duration": set_duration,
-                        "last_loop_elapsed": elapsed_set,
-                        "total_elapsed": elapsed_global,
-                        "progress": progress,
-                    }
-                )
+        class SetStatusObserver(PlaybackObserver):
+            def on_progress(self, plan, events_sent, elapsed_set):
+                nonlocal last_status_write
+
+                # ── 실시간 상태 갱신 ──
+                now = time.time()
+                elapsed_global = now - global_start
+
+                if set_duration > 0:
+                    progress = min(100.0, (elapsed_set / set_duration) * 100.0)
+                else:
+                    progress = 0.0
+
+                # 50ms 이상 간격으로만 상태 파일 갱신
+                if now - last_status_write >= 0.05:
+                    last_status_write = now
+                    write_status(
+                        {
+                            "running": True,
+                            "selected_sets": selected_sets,
+                            "loop_index": loop_index,
+                            "loop_total": loop_total,
+                            "set_no": set_no,
+                            "set_duration": set_duration,
+                            "last_loop_elapsed": elapsed_set,
+                            "total_elapsed": elapsed_global,
+                            "progress": progress,
+                        }
+                    )
+
+        play(
+            EventPlan.compile(events),
+            SerialSink(PicoLink(ser)),
+            observers=(SetStatusObserver(),),
+        )
 
         # 세트 사이 랜덤 텀
         delay = random.uniform(MIN_SET_DELAY, MAX_SET_DELAY)
@@ -1161,6 +1157,7 @@ def gui_play_macro_stream():
     stream_stop_request = False
     stopped_by_user = False
     pressed_keys = set()
+    sink = SerialSink(PicoLink(ser))
 
     def send_all_key_up_and_stop():
         nonlocal stopped_by_user, pressed_keys
@@ -1171,16 +1168,13 @@ def gui_play_macro_stream():
                 )
             for k in list(pressed_keys):
                 try:
-                    line_up = f"EV up {k}\n"
-                    ser.write(line_up.encode("utf-8"))
-                    ser.flush()
+                    sink.link.send("up", k)
                 except Exception as e2:
                     gui_log(f"❌ 키 UP 전송 실패({k}): {e2}")
             pressed_keys.clear()
 
             try:
-                ser.write(b"STOP\n")
-                ser.flush()
+                sink.link.send_stop()
             except Exception as e3:
                 gui_log(f"❌ STOP 전송 오류: {e3}")
 
@@ -1189,6 +1183,15 @@ def gui_play_macro_stream():
             gui_log(f"❌ STOP 처리 중 예외: {e}")
         stopped_by_user = True
 
+    class StreamObserver(PlaybackObserver):
+        def __init__(self, total_time):
+            self.total_time = total_time
+
+        def on_progress(self, plan, events_sent, elapsed):
+            if self.total_time > 0:
+                update_play_time_label(elapsed, self.total_time)
+                update_progress(min(100.0, (elapsed / self.total_time) * 100.0))
+
     for rep in range(1, rc + 1):
         if stream_stop_request:
             send_all_key_up_and_stop()
@@ -1201,64 +1204,30 @@ def gui_play_macro_stream():
         update_repeat_label(rep, rc)
         gui_log(f"{rep}회차: 인간화된 길이 ≈ {total_time:.3f}초")
 
-        start_segment = time.time()
-
-        for ev in events:
-            if stream_stop_request:
-                send_all_key_up_and_stop()
-                break
-
-            t = float(ev.get("time", 0.0))
-            ev_type = ev.get("type", "down")
-            key = (ev.get("key") or "").upper()
-
-            target = start_segment + t
-
-            while True:
-                if stream_stop_request:
-                    send_all_key_up_and_stop()
-                    break
-
-                now = time.time()
-                remain = target - now
-                elapsed = now - start_segment
-
-                if total_time > 0:
-                    update_play_time_label(elapsed, total_time)
-                    update_progress(min(100.0, (elapsed / total_time) * 100.0))
-
-                if remain <= 0 or stopped_by_user:
-                    break
-
-                time.sleep(min(remain, 0.02))
-
-            if stopped_by_user:
-                break
-
-            et_lower = (ev_type or "").lower()
-            if et_lower == "down":
-                pressed_keys.add(key)
-            elif et_lower == "up":
-                pressed_keys.discard(key)
-
-            line = f"EV {ev_type} {key}\n"
-            try:
-                ser.write(line.encode("utf-8"))
-                ser.flush()
-            except Exception as e:
-                gui_log(f"❌ 전송 중 오류: {e}")
-                send_all_key_up_and_stop()
-                break
+        try:
+            result = play(
+                EventPlan.compile(events),
+                sink,
+                observers=(StreamObserver(total_time),),
+                should_stop=lambda: stream_stop_request,
+            )
+        except Exception as e:
+            gui_log(f"❌ 전송 중 오류: {e}")
+            send_all_key_up_and_stop()
+            break
 
-        if stopped_by_user:
+        # 매 회차 같은 녹화본이라 마지막 회차 재생이 끝난 시점에 눌린 키만 남긴다
+        # (이전 회차에서 이미 뗀 키에 UP 을 또 보내지 않도록)
+        pressed_keys = set(result.pressed)
+        if result.stopped:
+            send_all_key_up_and_stop()
             break
 
     if pressed_keys and not stopped_by_user:
         gui_log("마무리: 남은 눌린 키들 UP 전송")
         for k in list(pressed_keys):
             try:
-                ser.write(f"EV up {k}\n".encode("utf-8"))
-                ser.flush()
+                sink.link.send("up", k)
             except Exception as e:
                 gui_log(f"❌ 마무리 키 UP 전송 실패({k}): {e}")
         pressed_keys.clear()
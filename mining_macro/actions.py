@@ -0,0 +1,114 @@
+# actions.py (키 입력 예약 실행기: 대기 시간 동안에도 캡처 / 감지 / 제어 루프가 계속 돌도록)
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class ActionExecutor(threading.Thread):
+    """
+    키 입력 시퀀스를 타이머에 맞춰 보내는 전용 스레드.
+
+    제어 루프는 submit() 으로 "언제 무엇을 보낼지" 예약만 하고 바로 돌아오므로
+    공격 후 대기 / 점프 재생 중에도 감지 결과를 계속 보고 반응할 수 있다.
+    - 예약된 단계는 (실행 시각, 순번) 힙에 쌓이고 이 스레드가 시각 순서대로 실행한다.
+      같은 시각이면 예약한 순서대로. 시리얼 전송은 전부 이 스레드에서만 일어난다.
+    - busy_until : 마지막 예약 단계 + 뒤따르는 대기(hold) 가 끝나는 perf_counter 시각.
+      busy() 인 동안 제어 루프는 새 동작을 시작하지 않는다.
+    - clear_hold() : 보낼 키는 그대로 두고 뒤따르는 대기만 없앤다 (대기 중 반응용)
+    - stop() 하면 남은 예약을 버린다. 재생 중인 plan 은 stopping() 을 보고 멈춰야 한다.
+    - timings 를 주면 예약 시각보다 늦게 실행된 시간을 "action_late" 로 기록
+    """
+
+    def __init__(self, timings=None):
+        super().__init__(daemon=True, name="actions")
+        self.timings = timings
+        self.busy_until = 0.0
+        self._heap = []  # (실행 시각, 순번, fn)
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._active = False  # 지금 단계 하나를 실행 중
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self.busy_until = 0.0
+            self._cond.notify_all()
+
+    def stopping(self) -> bool:
+        return not self._running
+
+    # ───────── 예약 ─────────
+    def submit(self, steps, hold=0.0):
+        """
+        steps=[(지금부터 초, fn), ...] 를 예약하고, 마지막 단계 뒤 hold 초까지 busy 로 둔다.
+        반환: 새 busy_until
+        """
+        now = time.perf_counter()
+        end = now
+        with self._cond:
+            if not self._running:
+                return self.busy_until
+            for offset, fn in steps:
+                due = now + offset
+                heapq.heappush(self._heap, (due, next(self._order), fn))
+                end = max(end, due)
+            self.busy_until = max(self.busy_until, end + hold)
+            self._cond.notify_all()
+            return self.busy_until
+
+    def hold(self, seconds):
+        """키 입력 없이 seconds 동안 busy (이미 더 늦게까지 busy 면 그대로)."""
+        return self.submit((), hold=seconds)
+
+    def clear_hold(self):
+        """남은 대기만 없앤다. 예약된 단계 / 실행 중인 단계가 끝날 때까지는 계속 busy."""
+        with self._cond:
+            if self._active:
+                return
+            last = max((due for due, _, _ in self._heap), default=0.0)
+            self.busy_until = min(self.busy_until, max(last, time.perf_counter()))
+
+    # ───────── 상태 ─────────
+    def busy(self) -> bool:
+        with self._cond:
+            return (
+                self._active
+                or bool(self._heap)
+                or time.perf_counter() < self.busy_until
+            )
+
+    def remaining(self) -> float:
+        """busy 가 풀리기까지 남은 초 (실행 중인 단계가 길어지면 그보다 늘 수 있음)."""
+        return max(0.0, self.busy_until - time.perf_counter())
+
+    # ───────── 실행 스레드 ─────────
+    def run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._heap:
+                        wait = self._heap[0][0] - time.perf_counter()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if not self._running:
+                    return
+                due, _, fn = heapq.heappop(self._heap)
+                self._active = True
+
+            late = time.perf_counter() - due
+            try:
+                fn()
+            except Exception as e:
+                print(f"❌ 키 입력 실행 오류: {e}")
+            finally:
+                with self._cond:
+                    self._active = False
+            if self.timings is not None:
+                self.timings.add("action_late", late, due)
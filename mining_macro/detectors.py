@@ -0,0 +1,351 @@
+# detectors.py (감지 백엔드: 템플릿 매칭 / YOLO ONNX 모델)
+
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from matching import ImagePyramid, PyramidMatcher, nms_boxes
+from template_bank import TemplateBank
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# yolo_juniper_dataset 학습 설정 / 학습한 모델 (ultralytics 등에서 ONNX 로 내보낸 것)
+DATASET_YAML = "./yolo_juniper_dataset/data.yaml"
+YOLO_MODEL_PATH = "./yolo_juniper_dataset/model.onnx"
+SAMPLE_FRAME_DIR = "./yolo_juniper_dataset/images/screen_captures"
+TEMPLATE_DIR = "./templates"
+
+YOLO_INPUT_SIZE = 640  # 모델 입력 한 변 (px, 정사각형 letterbox)
+YOLO_CONF_THRESHOLD = 0.35
+YOLO_IOU_THRESHOLD = 0.45
+
+# 감지 결과 1개. (x, y) 는 좌상단, 좌표는 입력 이미지 기준 px
+Detection = namedtuple("Detection", "cls x y w h score")
+
+
+def load_class_names(yaml_path=DATASET_YAML):
+    """
+    data.yaml 의 names 항목 → 클래스 이름 리스트 (인덱스 순).
+    'names:' 아래 '0: rope' 형식과 '- rope' 형식, 한 줄짜리 '[rope, player]' 를 지원한다.
+    """
+    names = {}
+    with open(yaml_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    in_names = False
+    for line in lines:
+        stripped = line.split("#", 1)[0].strip()
+        if stripped.startswith("names:"):
+            rest = stripped[len("names:") :].strip()
+            if rest.startswith("["):
+                items = rest.strip("[]").split(",")
+                return [s.strip().strip("'\"") for s in items if s.strip()]
+            in_names = True
+            continue
+        if not in_names or not stripped:
+            continue
+        if not line[:1].isspace() and not stripped.startswith("-"):
+            break  # 다음 최상위 키
+        if stripped.startswith("-"):
+            names[len(names)] = stripped[1:].strip().strip("'\"")
+        elif ":" in stripped:
+            key, value = stripped.split(":", 1)
+            names[int(key)] = value.strip().strip("'\"")
+    return [names[i] for i in sorted(names)]
+
+
+class ObjectDetector(ABC):
+    """
+    감지 백엔드 공통 인터페이스 (직접 만들 수 없고 detect 를 구현한 백엔드만 쓴다).
+    detect(image) → {클래스 이름: [Detection, ...]} (클래스별 점수 내림차순)
+    """
+
+    name = "base"
+    classes = ()
+
+    @abstractmethod
+    def detect(self, image):
+        """{클래스 이름: [Detection, ...]}"""
+
+
+# ======================================================================
+# 1. 템플릿 매칭 백엔드
+# ======================================================================
+class TemplateDetector(ObjectDetector):
+    """
+    클래스별 템플릿 묶음으로 감지한다 (PyramidMatcher 사용).
+    single 에 든 클래스(캐릭터)는 가장 점수 높은 1개만, 나머지는 겹침을 NMS 로 정리한 전부.
+    템플릿 수만큼 매칭을 돌리는 것이 YOLO 백엔드와의 차이.
+    """
+
+    name = "template"
+
+    def __init__(self, class_templates, single=("player",), matcher=None):
+        self.class_templates = {c: list(t) for c, t in class_templates.items() if t}
+        self.classes = tuple(self.class_templates)
+        self.single = set(single)
+        self.matcher = matcher or PyramidMatcher()
+
+    def detect(self, image):
+        pyramid = ImagePyramid(image)
+        self.matcher.prepare(
+            pyramid, [t for tmpls in self.class_templates.values() for t in tmpls]
+        )
+        out = {}
+        for cls, tmpls in self.class_templates.items():
+            if cls in self.single:
+                found = []
+                for tmpl in tmpls:
+                    score, loc = self.matcher.best(pyramid, tmpl)
+                    if loc is not None and score >= tmpl.threshold:
+                        found.append(Detection(cls, *loc, tmpl.w, tmpl.h, score))
+                out[cls] = sorted(found, key=lambda d: -d.score)[:1]
+                continue
+
+            xs, ys, ws, hs, scores = [], [], [], [], []
+            for tmpl in tmpls:
+                x, y, s = self.matcher.find_all(pyramid, tmpl, peaks_only=True)
+                xs.append(x)
+                ys.append(y)
+                ws.append(np.full(x.size, tmpl.w))
+                hs.append(np.full(x.size, tmpl.h))
+                scores.append(s)
+            xs, ys, ws, hs, scores = map(np.concatenate, (xs, ys, ws, hs, scores))
+            keep = nms_boxes(xs, ys, scores, ws, hs)
+            out[cls] = [
+                Detection(
+                    cls,
+                    int(xs[i]),
+                    int(ys[i]),
+                    int(ws[i]),
+                    int(hs[i]),
+                    float(scores[i]),
+                )
+                for i in keep.tolist()
+            ]
+        return out
+
+
+def template_detector_from_dir(
+    template_dir=TEMPLATE_DIR, classes=("player", "target", "rope"), bank=None
+):
+    """templates/<클래스>/*.png 로 TemplateDetector 를 만든다 (TemplateBank 캐시 사용)."""
+    bank = bank or TemplateBank(sample_dir=SAMPLE_FRAME_DIR)
+    return TemplateDetector(
+        {c: bank.load_dir(os.path.join(template_dir, c)) for c in classes}
+    )
+
+
+# ======================================================================
+# 2. YOLO (ONNX) 백엔드 — 한 번의 추론으로 모든 클래스
+# ======================================================================
+class YoloDetector(ObjectDetector):
+    """
+    yolo_juniper_dataset 으로 학습해 ONNX 로 내보낸 YOLO 모델을 CPU 에서 돌린다.
+    onnxruntime 이 설치되어 있으면 그것을, 없으면 cv2.dnn 을 쓴다.
+
+    출력은 YOLOv8 형식 (1, 4+클래스수, N) 과 YOLOv5 형식 (1, N, 5+클래스수) 을 모두 받는다.
+    letterbox 로 입력 크기에 맞추고, 결과 좌표는 원본 이미지 기준으로 되돌린다.
+    """
+
+    name = "yolo"
+
+    def __init__(
+        self,
+        model_path=YOLO_MODEL_PATH,
+        class_names=None,
+        input_size=YOLO_INPUT_SIZE,
+        conf_threshold=YOLO_CONF_THRESHOLD,
+        iou_threshold=YOLO_IOU_THRESHOLD,
+    ):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YOLO 모델 파일이 없습니다: {model_path}")
+        self.classes = tuple(class_names or load_class_names())
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+        if ort is not None:
+            self.runtime = "onnxruntime"
+            self._session = ort.InferenceSession(
+                model_path, providers=["CPUExecutionProvider"]
+            )
+            self._input_name = self._session.get_inputs()[0].name
+        else:
+            self.runtime = "cv2.dnn"
+            self._net = cv2.dnn.readNetFromONNX(model_path)
+        # letterbox 캔버스는 재사용 (프레임마다 할당하지 않음)
+        self._canvas = np.full((input_size, input_size, 3), 114, dtype=np.uint8)
+
+    def _letterbox(self, image):
+        h, w = image.shape[:2]
+        scale = min(self.input_size / h, self.input_size / w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        pad_x = (self.input_size - new_w) // 2
+        pad_y = (self.input_size - new_h) // 2
+        canvas = self._canvas
+        canvas[:] = 114
+        canvas[pad_y : pad_y + new_h, pad_x : pad_x + new_w] = cv2.resize(
+            image, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+        )
+        blob = cv2.dnn.blobFromImage(canvas, 1.0 / 255.0, swapRB=True)
+        return blob, scale, pad_x, pad_y
+
+    def _infer(self, blob):
+        if self.runtime == "onnxruntime":
+            return self._session.run(None, {self._input_name: blob})[0]
+        self._net.setInput(blob)
+        return self._net.forward()
+
+    def _parse(self, output):
+        """모델 출력 → (cx, cy, w, h, 점수, 클래스) 배열 (입력 크기 기준)"""
+        pred = np.squeeze(output, axis=0)
+        n_cls = len(self.classes)
+        attrs = (4 + n_cls, 5 + n_cls)
+        if pred.shape[1] not in attrs or (
+            pred.shape[0] in attrs and pred.shape[1] > pred.shape[0]
+        ):
+            pred = pred.T  # (속성, N) → (N, 속성)
+        if pred.shape[1] == 5 + n_cls:
+            # YOLOv5: 물체 점수 x 클래스 점수
+            cls_scores = pred[:, 5:] * pred[:, 4:5]
+        else:
+            cls_scores = pred[:, 4 : 4 + n_cls]
+        if pred.shape[0] == 0:
+            return pred[:, :4], np.empty(0, np.float32), np.empty(0, np.intp)
+        cls_ids = cls_scores.argmax(axis=1)
+        scores = cls_scores[np.arange(len(cls_ids)), cls_ids]
+        ok = scores >= self.conf_threshold
+        return pred[ok, :4], scores[ok], cls_ids[ok]
+
+    def detect(self, image):
+        blob, scale, pad_x, pad_y = self._letterbox(image)
+        boxes, scores, cls_ids = self._parse(self._infer(blob))
+
+        img_h, img_w = image.shape[:2]
+        w = np.maximum(np.rint(boxes[:, 2] / scale), 1).astype(np.int64)
+        h = np.maximum(np.rint(boxes[:, 3] / scale), 1).astype(np.int64)
+        x = np.rint((boxes[:, 0] - pad_x) / scale - w / 2).astype(np.int64)
+        y = np.rint((boxes[:, 1] - pad_y) / scale - h / 2).astype(np.int64)
+        np.clip(x, 0, img_w - 1, out=x)
+        np.clip(y, 0, img_h - 1, out=y)
+
+        out = {cls: [] for cls in self.classes}
+        for cls_id in np.unique(cls_ids).tolist():
+            idx = np.nonzero(cls_ids == cls_id)[0]
+            keep = idx[
+                nms_boxes(
+                    x[idx], y[idx], scores[idx], w[idx], h[idx], self.iou_threshold
+                )
+            ]
+            cls = self.classes[cls_id]
+            out[cls] = [
+                Detection(
+                    cls, int(x[i]), int(y[i]), int(w[i]), int(h[i]), float(scores[i])
+                )
+                for i in keep.tolist()
+            ]
+        return out
+
+
+def create_detector(backend="template", **options):
+    """backend 이름으로 감지기 생성 ("template" / "yolo")."""
+    if backend == "yolo":
+        return YoloDetector(**options)
+    if backend == "template":
+        return template_detector_from_dir(**options)
+    raise ValueError(f"알 수 없는 감지 백엔드: {backend}")
+
+
+# ======================================================================
+# 3. 백엔드 비교 벤치마크 (저장된 캡처 프레임)
+# ======================================================================
+# 두 백엔드의 감지를 같은 물체로 볼 중심 거리 (px)
+AGREEMENT_DISTANCE = 20
+
+
+def _agreement(a, b):
+    """a 의 감지 중 b 에 가까운 감지가 있는 비율 (클래스별)."""
+    ratio = {}
+    for cls, dets in a.items():
+        if not dets or cls not in b:
+            continue
+        others = np.array([(d.x + d.w / 2, d.y + d.h / 2) for d in b[cls]])
+        hit = 0
+        for d in dets:
+            if others.size and (
+                np.hypot(*(others - (d.x + d.w / 2, d.y + d.h / 2)).T).min()
+                <= AGREEMENT_DISTANCE
+            ):
+                hit += 1
+        ratio[cls] = hit / len(dets)
+    return ratio
+
+
+def benchmark(detectors, frame_dir=SAMPLE_FRAME_DIR, repeat=3):
+    """저장된 프레임마다 각 백엔드의 감지 시간 / 클래스별 개수 / 백엔드 간 일치율 출력."""
+    frames = [
+        cv2.imread(os.path.join(frame_dir, f))
+        for f in sorted(os.listdir(frame_dir))
+        if f.lower().endswith((".png", ".jpg", ".jpeg"))
+    ]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        print(f"❌ 프레임이 없습니다: {frame_dir}")
+        return
+
+    results = {}
+    for det in detectors:
+        det.detect(frames[0])  # 워밍업 (스펙트럼 캐시 / 세션 초기화)
+        times, outs = [], []
+        for frame in frames:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                out = det.detect(frame)
+                times.append(time.perf_counter() - t0)
+            outs.append(out)
+        results[det.name] = outs
+        ms = np.array(times) * 1000.0
+        counts = {c: sum(len(o.get(c, [])) for o in outs) for c in det.classes}
+        print(
+            f"▶ {det.name:8s} 평균 {ms.mean():7.1f}ms  p50 {np.percentile(ms, 50):7.1f}ms"
+            f"  p95 {np.percentile(ms, 95):7.1f}ms  ({len(frames)}장 x {repeat}회)"
+            f"  감지 수 {counts}"
+        )
+
+    names = list(results)
+    for i, a in enumerate(names):
+        for b in names[i + 1 :]:
+            ratios = {}
+            for out_a, out_b in zip(results[a], results[b]):
+                for cls, r in _agreement(out_a, out_b).items():
+                    ratios.setdefault(cls, []).append(r)
+            summary = {c: f"{np.mean(r):.0%}" for c, r in ratios.items()}
+            print(
+                f"🔁 {a} 감지 중 {b} 와 일치 (중심 {AGREEMENT_DISTANCE}px 이내): {summary}"
+            )
+
+
+if __name__ == "__main__":
+    # 사용법: python detectors.py [model.onnx] [프레임 폴더]
+    import sys
+
+    model_path = sys.argv[1] if len(sys.argv) >= 2 else YOLO_MODEL_PATH
+    frame_dir = sys.argv[2] if len(sys.argv) >= 3 else SAMPLE_FRAME_DIR
+
+    backends = [create_detector("template")]
+    try:
+        yolo = create_detector("yolo", model_path=model_path)
+        print(
+            f"✅ YOLO 모델 로드: {model_path} ({yolo.runtime}, 클래스 {yolo.classes})"
+        )
+        backends.append(yolo)
+    except Exception as e:
+        print(f"⚠ YOLO 백엔드 제외: {e}")
+    benchmark(backends, frame_dir)
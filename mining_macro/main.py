@@ -1,16 +1,43 @@
 # main.py (Final Version: 화살표 마스킹 및 노란색 점 표시 기능 통합)
 
 import time
-import mss
 import numpy as np
 import cv2
 import keyboard
 import os
 import threading
-import math
-import serial
+import sys
 import random
-import json
+import functools
+
+# control_macro 의 공용 모듈(피코 프로토콜 등)을 같이 사용
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "control_macro")
+)
+from protocol import PROTOCOL_AUTO
+from broker import open_pico
+from playback import SerialSink, play
+
+from pipeline import (
+    DetectionExecutor,
+    DetectionWorker,
+    FrameGrabber,
+    FrameRing,
+    TileChangeDetector,
+)
+from matching import (
+    ImagePyramid,
+    PyramidMatcher,
+    RoiTracker,
+    TileMatchCache,
+    nms_boxes,
+)
+from template_bank import TemplateBank
+from detectors import YOLO_MODEL_PATH, create_detector
+from metrics import TRACE_MAX, LatencyOverlay, LatencyStats
+from actions import ActionExecutor
+from moves import MOVE_DIR, MoveLibrary, MovePlans
+from navigation import Navigator
 
 # ====================================================================
 # I. 전역 변수 및 상수 설정
@@ -48,6 +75,11 @@ PRECISE_MOVE_DURATION = 0.05
 # 🚨🚨🚨 공격 및 스킬 대기 시간 (요청 반영) 🚨🚨🚨
 DEFAULT_ATTACK_COOLDOWN = 2.0  # ⬅️ 스페이스바 공격 후 기본 대기 시간 (2.0초)
 ARROW_DETECT_DELAY = 0.5  # ⬅️ 화살표 감지 시 입력 전 대기 시간 (0.5초)
+ATTACK_PRESS_DURATION = 0.05  # ⬅️ 스페이스바를 누르고 있는 시간
+ARROW_COMBO_HOLD = 0.1  # ⬅️ 복합 스킬(화살표 + 스페이스바) 키 눌림 유지 시간
+awaiting_arrow = (
+    False  # 화살표 없이 공격한 뒤 대기 중 (이때 화살표가 뜨면 바로 복합 스킬)
+)
 
 
 last_target_time = time.time()
@@ -58,12 +90,15 @@ pressed_key = None
 ATTACK_KEY_NAME = "SPACE"
 LEFT_KEY_NAME = "LEFT"
 RIGHT_KEY_NAME = "RIGHT"
+UP_KEY_NAME = "UP"  # 밧줄 오르기
+DOWN_KEY_NAME = "DOWN"  # 밧줄 내려가기
 
 
 # 🌟🌟🌟 피코 보드 시리얼 통신 설정 🌟🌟🌟
 SERIAL_PORT = "COM5"
 BAUD_RATE = 115200
-ser = None
+SERIAL_PROTOCOL = PROTOCOL_AUTO
+pico = None
 
 
 # 이미지 파일 경로 및 캐싱
@@ -75,6 +110,65 @@ IMAGE_PATHS = {
 target_images = {}
 player_images = {}
 
+# 밧줄 위쪽 고정대 템플릿 (경로 계획용, 템플릿 백엔드)
+# rope_full.png(3px 폭 줄)는 샘플 캡처에서 점수가 0.6 도 안 나와서 매칭에는 쓰지 않고,
+# 고정대 아래로 줄이 어디까지 이어지는지 잴 때 줄 색 견본으로만 쓴다
+ROPE_IMAGE_PATHS = {"rope_top": "./templates/rope/rope_top.png"}
+ROPE_BODY_PATH = "./templates/rope/rope_full.png"
+ROPE_COLOR_TOLERANCE = 30  # 줄 색 견본과 이 이하로 차이 나면 줄 색 (BGR 차이 합)
+ROPE_SIDE_OFFSET = 8  # 줄은 가늘어서 이만큼(px) 옆 배경과 색이 달라야 줄로 본다
+ROPE_GAP = 12  # 줄로 안 보이는 행이 이만큼(px) 넘게 이어지면 거기서 줄이 끝난 것
+ROPE_MIN_LENGTH = (
+    150  # 잰 길이가 이보다 짧으면 (캐릭터에 가려짐 등) ROPE_LENGTH 를 쓴다
+)
+ROPE_MAX_LENGTH = 600  # 고정대 아래로 이만큼(px)까지만 잰다
+rope_images = {}
+rope_palette = None  # 줄 색 견본 (N, 3) BGR, load_images 에서 생성
+
+# 템플릿 판정 임계값 (TM_CCOEFF_NORMED)
+MATCH_THRESHOLD = 0.70
+ARROW_MATCH_THRESHOLD = 0.75
+
+# 피라미드 매칭 보정용 샘플 캡처 폴더 (없으면 템플릿 자체로만 보정)
+CALIBRATION_SAMPLE_DIR = "./yolo_juniper_dataset/images/screen_captures"
+matcher = PyramidMatcher()
+
+# 방향키 마스크: 이 밝기보다 밝은 (화살표) 픽셀만 매칭에 사용
+ARROW_MASK_THRESHOLD = 100
+
+# 템플릿 사전 계산 결과 (./template_cache 에 캐시, 다음 실행부터 바로 로드)
+template_bank = TemplateBank(sample_dir=CALIBRATION_SAMPLE_DIR)
+
+# 캐릭터 / 타겟 감지 백엔드
+#   "template" : 템플릿 매칭 (템플릿마다 한 번씩 매칭)
+#   "yolo"     : YOLO_MODEL_PATH 의 ONNX 모델 (한 번의 추론으로 모든 클래스)
+# 방향키는 모델 클래스에 없으므로 어느 쪽이든 템플릿 매칭을 쓴다
+DETECTOR_BACKEND = "template"
+object_detector = None  # "yolo" 일 때 load_images 에서 생성
+
+# 캐릭터 추적기: 직전 위치 주변만 검색 (load_images 에서 생성)
+# 검색은 감지 스레드 풀에서, 추적 상태 반영은 detect_frame 에서만 한다
+player_tracker = None
+
+# 화면이 그대로인 타일은 직전 프레임의 매칭 결과를 재사용 (공격 대기 중 등)
+# 감지기들이 동시에 돌기 때문에 매칭 엔진(FFT 스펙트럼 캐시)은 감지기마다 따로 둔다
+# (위의 matcher 는 캐릭터 추적 전용)
+change_detector = TileChangeDetector()
+target_cache = TileMatchCache(PyramidMatcher())
+arrow_cache = TileMatchCache(PyramidMatcher())
+rope_cache = TileMatchCache(PyramidMatcher())
+match_caches = (target_cache, arrow_cache, rope_cache)
+detect_rect = None  # 추적기 / 변화 감지가 기준으로 삼는 선택 영역 (바뀌면 초기화)
+
+# 단계별 소요 시간 (캡처 / 변환 / 감지기별 / 판단 / 시리얼 전송)
+# 최근 샘플의 p50/p95/p99 를 "Selected Area" 창에 표시하고, 종료 시 기록을 저장
+timings = LatencyStats(trace_max=TRACE_MAX)
+SHOW_LATENCY_OVERLAY = True
+LATENCY_TRACE_PATH = "./latency_trace.csv"  # .json 도 가능, None 이면 저장 안 함
+
+# 키 입력은 이 스레드가 예약 시각에 맞춰 보낸다 (제어 루프는 예약만 하고 바로 돌아옴)
+actions = ActionExecutor(timings=timings)
+
 
 # 🚨🚨🚨 방향키 이미지 템플릿 경로 추가 🚨🚨🚨
 ARROW_IMAGE_PATHS = {
@@ -83,7 +177,7 @@ ARROW_IMAGE_PATHS = {
     "RIGHT": "./templates/arrows/right.png",
     "UP": "./templates/arrows/up.png",
 }
-# arrow_images에는 {"UP": {"template": img, "mask": mask}, ...} 형태로 저장됩니다.
+# 모든 템플릿은 MatchTemplate 로 저장됩니다. (방향키는 회색조 + 마스크)
 arrow_images = {}
 REQUIRED_ARROW_KEY = None
 arrow_center_x, arrow_center_y = -1, -1  # ⬅️ 화살표 좌표 추가
@@ -93,20 +187,19 @@ arrow_center_x, arrow_center_y = -1, -1  # ⬅️ 화살표 좌표 추가
 TERRAIN_LAYERS = [150, 350, 550, 750, 950]
 MAX_LAYER_INDEX = len(TERRAIN_LAYERS) - 1
 
+# 고정대 위쪽부터 밧줄 아래 끝까지 (px). 줄 끝을 화면에서 못 잴 때만 쓰는 맵별 값
+ROPE_LENGTH = 300
+
 current_layer_index = 0
 IS_ASCENDING = True
 
-# 🚨🚨🚨 복합 동작 JSON 파일 추가 (수정)
-ALT_DOUBLE_TAP_ACTION = "alt_double_tap"
-
-JUMP_KEYS_MAP = {
-    "jump_1": "./move/jump/jump_1.json",
-    "jump_2": "./move/jump/jump_2.json",
-    "jump_3": "./move/jump/jump_3.json",
-    "jump_4": "./move/jump/jump_4.json",
-    "jump_5": "./move/jump/jump_5.json",
-    ALT_DOUBLE_TAP_ACTION: "./move/jump/alt_double_tap.json",
-}
+# 🚨🚨🚨 복합 동작: move/ 아래 (종류, 방향) 폴더에서 녹화본 하나를 무작위로 골라 재생
+#   move/jump/              : 위층으로 점프
+#   move/double/left|right/ : Alt 더블 탭 (좌/우로 빠르게 이동, 하강 모드 좌측 끝에서 낙하)
+#   move/down/              : 아래 점프 (한 층 내려가기)
+JUMP_ACTION = ("jump", None)
+ALT_DOUBLE_TAP_ACTION = ("double", "left")
+DOWN_JUMP_ACTION = ("down", None)
 
 # JSON 파일에 사용된 키 이름과 Pico 키맵 이름 매핑 (Alt, 방향키 추가)
 JUMP_PICO_KEY_MAP = {
@@ -116,6 +209,15 @@ JUMP_PICO_KEY_MAP = {
     "LEFT": "LEFT",
     "RIGHT": "RIGHT",
 }
+
+# move/ 아래 복합 동작 JSON 은 시작할 때 한 번 컴파일해 두고 재사용 (파일이 바뀌면 자동 재로드)
+move_plans = MovePlans(MOVE_DIR, key_map=JUMP_PICO_KEY_MAP)
+move_library = MoveLibrary(move_plans)
+
+# 다른 발판의 타겟까지 가는 최단 시간 경로 (층 / 밧줄 / 발판 끝 그래프)
+# 밧줄은 감지 결과(템플릿 고정대 / YOLO)로, 발판은 YOLO 지형이 있으면 그것으로,
+# 없으면 TERRAIN_LAYERS (선택 영역 기준 y px) 를 전체 폭 층으로 쓴다
+navigator = Navigator(TERRAIN_LAYERS, move_library)
 # ====================================================================
 # II. 유틸리티 함수
 # ====================================================================
@@ -129,49 +231,79 @@ def set_random_attack_threshold():
 
 def initialize_serial():
     """피코 보드와의 시리얼 통신을 초기화합니다."""
-    global ser
+    global pico
     try:
-        if ser and ser.is_open:
+        if pico and pico.is_open:
             return
 
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.1)
-        time.sleep(2)
-        print(f"✅ 시리얼 통신 연결 성공: {SERIAL_PORT} @ {BAUD_RATE}bps")
-    except serial.SerialException as e:
+        # broker 가 떠 있으면 이미 열린 포트를 공유하므로 안정화 대기가 필요 없다
+        pico = open_pico(
+            SERIAL_PORT, BAUD_RATE, timeout=0.1, protocol=SERIAL_PROTOCOL, settle=2
+        )
+        print(
+            f"✅ 시리얼 통신 연결 성공: {SERIAL_PORT} @ {BAUD_RATE}bps ({pico.protocol})"
+        )
+    except Exception as e:
         print(f"❌ 시리얼 통신 연결 실패: {e}")
         print(
             "포트 설정(SERIAL_PORT)을 확인하거나, 피코 보드가 연결되어 있는지 확인하세요."
         )
-        ser = None
+        pico = None
 
 
 def close_serial():
     """시리얼 통신을 닫습니다."""
-    global ser
-    if ser and ser.is_open:
-        ser.close()
+    global pico
+    if pico and pico.is_open:
+        pico.close()
         print("✅ 시리얼 통신 종료.")
 
 
-def send_event_to_pico(event_type, key_name):
+def send_event_to_pico(event_type, key_name, flush=True):
     """
-    피코 보드에 EV 프로토콜 명령을 전송합니다. (예: "EV down RIGHT\n")
+    피코 보드에 EV 이벤트를 전송합니다. (텍스트 모드 예: "EV down RIGHT\n")
+    flush=False 로 호출하면 다음 flush 때까지 모아 두었다가 write 1회로 보냅니다.
+    동작 실행 스레드(actions)에서만 호출합니다. 제어 루프에서는 queue_keys 로 예약하세요.
     """
-    global ser
-    if ser and ser.is_open:
-        message = f"EV {event_type} {key_name}\n"
+    if pico and pico.is_open:
         try:
-            ser.write(message.encode("utf-8"))
-        except serial.SerialException as e:
+            pico.queue(event_type, key_name)
+            if flush:
+                with timings.measure("serial"):
+                    pico.flush()
+        except Exception as e:
             print(f"❌ 시리얼 전송 오류: {e}")
 
 
+def send_events(events):
+    """[(down/up, 피코 키 이름), ...] 을 write 1회로 묶어서 전송합니다."""
+    for i, (event_type, key_name) in enumerate(events):
+        send_event_to_pico(event_type, key_name, flush=i == len(events) - 1)
+
+
+def queue_keys(steps, hold=0.0):
+    """
+    키 이벤트를 동작 실행 스레드에 예약합니다 (기다리지 않고 바로 반환).
+    steps=[(지금부터 초, [(down/up, 피코 키 이름), ...]), ...]
+    한 단계의 이벤트는 write 1회로 나가고, 마지막 단계 뒤 hold 초 동안 actions 가 busy.
+    """
+    return actions.submit(
+        [
+            (offset, functools.partial(send_events, tuple(events)))
+            for offset, events in steps
+        ],
+        hold,
+    )
+
+
 def get_pico_key_name(key):
     """별칭 키 이름('left', 'right', 'space')을 피코 키맵 이름으로 변환합니다."""
     key_name_map = {
         "left": LEFT_KEY_NAME,
         "right": RIGHT_KEY_NAME,
         "space": ATTACK_KEY_NAME,
+        "up": UP_KEY_NAME,
+        "down": DOWN_KEY_NAME,
     }
     return key_name_map.get(key)
 
@@ -189,7 +321,7 @@ def press_key(key):
         if pressed_key is not None:
             release_key(pressed_key)
 
-        send_event_to_pico("down", pico_key_name)
+        queue_keys([(0, [("down", pico_key_name)])])
         pressed_key = pico_key_name
 
 
@@ -198,24 +330,54 @@ def release_key(key_to_release):
     global pressed_key
 
     if pressed_key == key_to_release:
-        send_event_to_pico("up", key_to_release)
+        queue_keys([(0, [("up", key_to_release)])])
         pressed_key = None
 
 
-def move_character(key, duration=0.1):
-    """공격 키(Space)처럼 짧게 눌렀다 떼는 동작에 사용합니다."""
+def move_character(key, duration=0.1, hold=0.0):
+    """
+    공격 키(Space)처럼 짧게 눌렀다 떼는 동작에 사용합니다.
+    떼는 입력까지 예약만 하고 바로 반환하며, 뗀 뒤 hold 초 동안 actions 가 busy.
+    """
 
     pico_key_name = get_pico_key_name(key)
 
     if pico_key_name:
-        send_event_to_pico("down", pico_key_name)
-        time.sleep(duration)
-        send_event_to_pico("up", pico_key_name)
+        queue_keys(
+            [(0, [("down", pico_key_name)]), (duration, [("up", pico_key_name)])],
+            hold,
+        )
+
+
+def queue_arrow_combo(arrow_key, delay=ARROW_DETECT_DELAY):
+    """
+    delay 초 뒤 복합 스킬(화살표 + 스페이스바)을 입력하고, 이어서 공격 대기를 예약합니다.
+    동시에 누르는 키는 write 1회로 묶어서 전송합니다.
+    """
+    arrow_pico_key = JUMP_PICO_KEY_MAP.get(arrow_key, arrow_key)
+    queue_keys(
+        [
+            (delay, [("down", arrow_pico_key), ("down", ATTACK_KEY_NAME)]),
+            (
+                delay + ARROW_COMBO_HOLD,
+                [("up", ATTACK_KEY_NAME), ("up", arrow_pico_key)],
+            ),
+        ],
+        hold=DEFAULT_ATTACK_COOLDOWN,
+    )
+
+
+def stop_actions():
+    """예약된 키 입력을 버리고 동작 실행 스레드를 멈춥니다 (재생 중인 복합 동작도 중단)."""
+    actions.stop()
+    if actions.is_alive():
+        actions.join(timeout=1.0)
 
 
 def load_images():
     """타겟, 캐릭터, 방향키 이미지를 모두 로드하고, 방향키 템플릿의 마스크를 생성합니다."""
-    global target_images, player_images, arrow_images
+    global target_images, player_images, arrow_images, player_tracker
+    global object_detector, detection_executor, rope_palette
 
     print("-" * 20 + " 이미지 로드 시작 " + "-" * 20)
 
@@ -223,23 +385,25 @@ def load_images():
         if os.path.exists(path):
             if is_arrow:
                 # 🚨 방향키는 회색조로 로드
-                img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+                # 💡 마스크: 파란색 배경을 제외하고 화살표만 남김
+                # 화살표(밝은 색) 부분이 배경(파란색->어두운 회색)보다 밝다는 가정 하에 임계값 처리
+                # 템플릿 이미지와 환경에 따라 100~150 사이의 임계값이 적절할 수 있습니다.
+                tmpl = template_bank.load(
+                    name,
+                    path,
+                    ARROW_MATCH_THRESHOLD,
+                    gray=True,
+                    mask_threshold=ARROW_MASK_THRESHOLD,
+                )
             else:
-                img = cv2.imread(path, cv2.IMREAD_COLOR)
-
-            if img is not None:
+                tmpl = template_bank.load(name, path, MATCH_THRESHOLD)
 
-                if is_arrow:
-                    # 💡 마스크 생성 로직: 파란색 배경을 제외하고 화살표만 남김
-                    # 화살표(밝은 색) 부분이 배경(파란색->어두운 회색)보다 밝다는 가정 하에 임계값 처리
-                    # 템플릿 이미지와 환경에 따라 100~150 사이의 임계값이 적절할 수 있습니다.
-                    _, mask = cv2.threshold(img, 100, 255, cv2.THRESH_BINARY)
-                    img_dict[name] = {"template": img, "mask": mask}
-                else:
-                    img_dict[name] = img
+            if tmpl is not None:
+                img_dict[name] = tmpl
 
                 print(
-                    f"✅ 이미지 '{name}' 로드 완료. 크기: {img.shape} ({'회색조+마스크' if is_arrow else '컬러'})"
+                    f"✅ 이미지 '{name}' 로드 완료. 크기: {tmpl.shape} ({'회색조+마스크' if is_arrow else '컬러'})"
+                    f", 피라미드 {tmpl.level}단계 (후보 임계값 {tmpl.coarse_threshold:.2f})"
                 )
             else:
                 print(f"❌ 경고: 이미지 로드 실패: {path}")
@@ -259,63 +423,108 @@ def load_images():
     for name, path in ARROW_IMAGE_PATHS.items():
         load_template(name, path, arrow_images, is_arrow=True)
 
+    # 밧줄 고정대 이미지 로드 (컬러)
+    for name, path in ROPE_IMAGE_PATHS.items():
+        load_template(name, path, rope_images)
+
+    # 밧줄 줄 색 견본 (견본에 섞인 파란 하늘 배경은 빼고 갈색 계열(B < R)만)
+    body = cv2.imread(ROPE_BODY_PATH) if rope_images else None
+    if body is not None:
+        colors = np.unique(body.reshape(-1, 3), axis=0).astype(np.int16)
+        rope_palette = colors[colors[:, 0] < colors[:, 2]]
+        print(f"✅ 밧줄 줄 색 견본 {len(rope_palette)}색 로드 완료")
+    elif rope_images:
+        print(f"❌ 경고: 밧줄 줄 색 견본이 없어 길이를 {ROPE_LENGTH}px 로 봅니다")
+
+    # 캐릭터는 매 프레임 전체를 뒤지지 않고 직전 위치 주변 창에서 추적
+    if player_images:
+        player_tracker = RoiTracker(
+            lambda area: find_player_coords(area, player_images, threshold=0.70),
+            (
+                max(t.h for t in player_images.values()),
+                max(t.w for t in player_images.values()),
+            ),
+        )
+
+    if DETECTOR_BACKEND == "yolo":
+        try:
+            object_detector = create_detector("yolo", model_path=YOLO_MODEL_PATH)
+            print(
+                f"✅ YOLO 모델 로드 완료: {YOLO_MODEL_PATH} ({object_detector.runtime})"
+            )
+        except Exception as e:
+            object_detector = None
+            print(f"❌ YOLO 모델 로드 실패, 템플릿 매칭으로 감지합니다: {e}")
+        detection_executor.shutdown()
+        detection_executor = make_detection_executor()
+
+    print(
+        f"📦 템플릿 캐시: {template_bank.cache_hits}개 재사용, "
+        f"{template_bank.cache_misses}개 새로 계산 ({template_bank.cache_dir})"
+    )
+    print(f"📦 복합 동작: {move_library.scan()}개 컴파일 ({move_plans.root})")
+    for category, direction in move_library.categories():
+        found = move_library.actions(category, direction)
+        label = f"{category}/{direction}" if direction else category
+        print(
+            f"   - {label}: {len(found)}개, "
+            f"{found[0].duration:.2f}~{found[-1].duration:.2f}초"
+        )
     print("-" * 45)
 
 
-def load_composite_action(action_name):
-    """지정된 복합 동작(JSON) 파일을 로드합니다."""
-    file_path = JUMP_KEYS_MAP.get(action_name)
-    if not file_path or not os.path.exists(file_path):
-        if action_name == ALT_DOUBLE_TAP_ACTION:
-            print(f"❌ 경고: 하강을 위한 '{file_path}' 파일이 필요합니다!")
-        else:
-            print(f"❌ 복합 동작 파일 '{file_path}'를 찾을 수 없습니다.")
-        return None
+class TimedSerialSink(SerialSink):
+    """복합 동작 재생 중 write 1회마다 "serial" 소요 시간을 기록."""
 
-    try:
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        return data.get("events", [])
-    except Exception as e:
-        print(f"❌ 복합 동작 파일 로드 중 오류 발생: {e}")
-        return None
+    def send(self, i: int):
+        with timings.measure("serial"):
+            super().send(i)
 
 
-def execute_composite_action(action_events):
+def load_composite_action(action):
     """
-    로드된 복합 동작 이벤트를 시차를 두고 순차적으로 피코 보드에 전송합니다.
+    action=(종류, 방향) 녹화본 중 하나를 골라 컴파일된 재생 계획(EventPlan)을 반환합니다.
+    move_library 색인에서 가져오므로 여기서는 디스크를 읽거나 JSON 을 파싱하지 않습니다.
     """
-    global pressed_key
-
-    if not ser or not ser.is_open or not action_events:
-        print("❌ 시리얼 연결이 없거나 이벤트가 없습니다.")
-        return
-
-    start_time = action_events[0].get("time", 0)
-    last_time = start_time
+    category, direction = action
+    found = move_library.choose(category, direction)
+    plan = move_library.plan(found) if found is not None else None
+    if plan is None:
+        folder = os.path.join(MOVE_DIR, category, direction or "")
+        if action == ALT_DOUBLE_TAP_ACTION:
+            print(f"❌ 경고: 하강을 위한 '{folder}' 복합 동작 파일이 필요합니다!")
+        else:
+            print(f"❌ 복합 동작 파일을 찾을 수 없습니다: '{folder}'")
+    return plan
 
-    for event in action_events:
-        event_type = event.get("type")
-        key_name_alias = event.get("key")
-        event_time = event.get("time")
 
-        delay = event_time - last_time
-        if delay > 0:
-            time.sleep(delay)
+def play_plan(plan):
+    """동작 실행 스레드에서 복합 동작을 재생합니다 (stop_actions 하면 중단)."""
+    if pico and pico.is_open:
+        play(plan, TimedSerialSink(pico), should_stop=actions.stopping)
 
-        pico_key_name = JUMP_PICO_KEY_MAP.get(key_name_alias, key_name_alias)
-        send_event_to_pico(event_type, pico_key_name)
 
-        last_time = event_time
+def execute_composite_action(plan, keep_pressed=False):
+    """
+    load_composite_action 으로 가져온 복합 동작을 동작 실행 스레드에 예약합니다.
+    재생이 끝나고 0.1초 뒤까지 actions 가 busy 입니다.
+    keep_pressed=True 면 누르고 있는 방향키를 떼지 않고 그 위에 재생합니다 (더블 탭 방향 유지).
+    """
+    if not pico or not pico.is_open or plan is None or len(plan) == 0:
+        print("❌ 시리얼 연결이 없거나 이벤트가 없습니다.")
+        return
 
-    if pressed_key:
+    if pressed_key and not keep_pressed:
         release_key(pressed_key)
 
-    time.sleep(0.1)
+    actions.submit([(0, functools.partial(play_plan, plan))], hold=plan.duration + 0.1)
 
 
 def find_player_coords(selected_area, player_imgs, threshold=0.70):
-    """선택된 영역에서 가장 잘 매칭되는 캐릭터 이미지를 찾고 그 중심 좌표를 반환합니다."""
+    """
+    선택된 영역에서 가장 잘 매칭되는 캐릭터 이미지를 찾고 그 중심 좌표를 반환합니다.
+    selected_area 는 이미지 또는 ImagePyramid (여러 템플릿이 축소 결과를 공유).
+    """
     best_match = None
     max_score = threshold
 
@@ -323,11 +532,10 @@ def find_player_coords(selected_area, player_imgs, threshold=0.70):
         if img is None:
             continue
 
-        h, w, _ = img.shape
-        result = cv2.matchTemplate(selected_area, img, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        h, w = img.h, img.w
+        max_val, max_loc = matcher.best(selected_area, img)
 
-        if max_val > max_score:
+        if max_loc is not None and max_val > max_score:
             max_score = max_val
             best_match = {
                 "score": max_val,
@@ -341,47 +549,53 @@ def find_player_coords(selected_area, player_imgs, threshold=0.70):
     return None
 
 
-def find_closest_object_coords(
-    selected_area, object_img, threshold=0.70, player_x=player_x, player_y=player_y
-):
+def find_object_centers(selected_area, object_img, threshold=0.70, cache=None):
     """
-    주어진 오브젝트 이미지를 찾아 캐릭터로부터 가장 가까운 오브젝트의 좌표와 거리를 반환합니다.
+    주어진 오브젝트 이미지를 모두 찾아 물체별 중심 좌표 배열 (center_x, center_y) 를 반환합니다.
+    (캐릭터 위치와 무관해서 캐릭터 감지와 동시에 돌릴 수 있습니다)
+    cache 는 호출한 감지기의 TileMatchCache (없으면 타겟용).
     """
     if object_img is None:
-        return None, float("inf")
+        return None
 
-    h, w, _ = object_img.shape
-    result = cv2.matchTemplate(selected_area, object_img, cv2.TM_CCOEFF_NORMED)
-    loc = np.where(result >= threshold)
+    h, w = object_img.h, object_img.w
+    xs, ys, scores = (cache or target_cache).find_all(
+        selected_area, object_img, threshold, peaks_only=True
+    )
+    if xs.size == 0:
+        return None
 
-    min_priority_distance = float("inf")
-    min_euclidean_distance = float("inf")
-    closest_coords = None
+    # 한 물체 주변에 몰린 히트는 가장 점수 높은 위치 하나로 합친다
+    keep = nms_boxes(xs, ys, scores, w, h)
+    return xs[keep] + w // 2, ys[keep] + h // 2
 
-    if loc[0].size > 0:
-        for pt_x, pt_y in zip(loc[1], loc[0]):
 
-            center_x = pt_x + w // 2
-            center_y = pt_y + h // 2
+def closest_object(centers, player_x, player_y):
+    """find_object_centers 결과 중 캐릭터로부터 가장 가까운 좌표와 거리."""
+    if centers is None:
+        return None, float("inf")
+    center_x, center_y = centers
 
-            dist_x = abs(center_x - player_x)
-            dist_y = abs(center_y - player_y)
+    dist_x = np.abs(center_x - player_x)
+    dist_y = np.abs(center_y - player_y)
 
-            priority_distance = dist_x * 2 + dist_y * 0.1
-            euclidean_distance = math.sqrt(dist_x**2 + dist_y**2)
+    # X축 거리를 우선, 같으면 직선 거리가 짧은 쪽
+    priority_distance = dist_x * 2 + dist_y * 0.1
+    euclidean_distance = np.hypot(dist_x, dist_y)
+    best = np.lexsort((euclidean_distance, priority_distance))[0]
+
+    closest_coords = (int(center_x[best]), int(center_y[best]))
+    return closest_coords, float(euclidean_distance[best])
 
-            if priority_distance < min_priority_distance:
-                min_priority_distance = priority_distance
-                min_euclidean_distance = euclidean_distance
-                closest_coords = (center_x, center_y)
-            elif (
-                priority_distance == min_priority_distance
-                and euclidean_distance < min_euclidean_distance
-            ):
-                min_euclidean_distance = euclidean_distance
-                closest_coords = (center_x, center_y)
 
-    return closest_coords, min_euclidean_distance
+def find_closest_object_coords(
+    selected_area, object_img, threshold=0.70, player_x=player_x, player_y=player_y
+):
+    """
+    주어진 오브젝트 이미지를 찾아 캐릭터로부터 가장 가까운 오브젝트의 좌표와 거리를 반환합니다.
+    """
+    centers = find_object_centers(selected_area, object_img, threshold)
+    return closest_object(centers, player_x, player_y)
 
 
 def select_area(event, x, y, flags, param):
@@ -433,307 +647,594 @@ def draw_selection(frame_resized):
     return frame_resized
 
 
-# ====================================================================
-# III. 메인 실행 함수
-# ====================================================================
+def get_selection_rect():
+    """현재 선택 영역 (x_min, y_min, x_max, y_max). 선택 전이거나 비어 있으면 None."""
+    if not selection_done:
+        return None
+    x_min = min(x1_orig, x2_orig)
+    x_max = max(x1_orig, x2_orig)
+    y_min = min(y1_orig, y2_orig)
+    y_max = max(y1_orig, y2_orig)
+    if x_max > x_min and y_max > y_min:
+        return (x_min, y_min, x_max, y_max)
+    return None
 
 
-def main():
-    """메인 실행 함수"""
-    global selection_done, drawing, player_x, player_y, target_center_x, target_center_y
-    global last_target_time, current_move_direction, pressed_key, current_attack_threshold
-    global IS_ASCENDING, current_layer_index, REQUIRED_ARROW_KEY, arrow_center_x, arrow_center_y
+# ───────── 감지기 (감지 스레드 풀에서 동시에 실행) ─────────
+# 모두 fn(frame, area_pyramid, gray_pyramid, changes) 형태. 서로의 결과를 쓰지 않는다.
 
-    set_random_attack_threshold()
 
-    sct = mss.mss()
-    monitor_info = sct.monitors[0]
-    cv2.namedWindow(WINDOW_NAME)
-    cv2.setMouseCallback(WINDOW_NAME, select_area)
+def detect_player(frame, area_pyramid, gray_pyramid, changes):
+    """
+    (캐릭터 중심 좌표 (보정 전, 못 찾으면 None), 전체 검색 여부).
+    추적을 생략했으면 전체 검색 여부는 None. 추적 상태는 여기서 바꾸지 않는다 (track_player).
+    """
+    if player_tracker is None:
+        return None
+    last = player_tracker.last
+    h, w = player_tracker.template_h, player_tracker.template_w
+    if not changes.any or (
+        last is not None
+        and changes.boxes_clean([last[0] - w // 2], [last[1] - h // 2], w, h)[0]
+    ):
+        return last, None  # 캐릭터 주변이 그대로면 추적 생략
+    return player_tracker.search(area_pyramid)
 
-    print("-" * 40)
-    print("📢 공격 로직 변경 적용")
-    print(f"✅ 일반 공격 후 대기: {DEFAULT_ATTACK_COOLDOWN} 초")
-    print(f"✅ 복합 스킬 감지 후 대기: {ARROW_DETECT_DELAY} 초")
-    print("1. 화면 캡처 영역을 마우스로 드래그하여 선택하세요.")
-    print("2. 종료하려면 F10을 누르세요.")
-    print("-" * 40)
 
-    while True:
-        if keyboard.is_pressed("f10"):
-            print("F10 눌림 → 종료")
-            if ser and ser.is_open:
-                ser.write("STOP\n".encode("utf-8"))
-                time.sleep(0.1)
-            break
+def track_player(result, stale):
+    """
+    detect_player 결과를 추적 상태에 반영하고 캐릭터 중심 좌표를 반환 (감지 스레드에서만).
+    이번 프레임 결과가 아니면(stale) 상태는 그대로 두고 마지막 위치를 쓴다.
+    """
+    if player_tracker is None or result is None:
+        return None
+    if stale:
+        return player_tracker.last
+    found, full = result
+    if full is not None:
+        player_tracker.commit(found, full)
+    return found
+
+
+def detect_targets(frame, area_pyramid, gray_pyramid, changes):
+    """{타겟 이름: 물체별 중심 좌표 배열} (가장 가까운 것은 캐릭터 위치가 나온 뒤 고른다)"""
+    # 타겟 템플릿 전체의 점수 맵을 한 번에 계산
+    target_cache.prepare(area_pyramid, target_images.values())
+    return {
+        name: find_object_centers(area_pyramid, target_img, threshold=0.70)
+        for name, target_img in target_images.items()
+        if target_img is not None
+    }
+
+
+def detect_arrow(frame, area_pyramid, gray_pyramid, changes):
+    """(방향키 이름, 화살표 중심). 없으면 (None, (-1, -1))."""
+    max_arrow_score = 0.75
+    arrow_cache.prepare(gray_pyramid, arrow_images.values())
+
+    for key_name, arrow_img in arrow_images.items():
+
+        if arrow_img is None or arrow_img.mask is None:
+            continue
+
+        h, w = arrow_img.h, arrow_img.w
+
+        # 💡 마스크를 사용하여 템플릿 매칭 (배경 제외)
+        max_val, max_loc = arrow_cache.best(gray_pyramid, arrow_img)
 
-        sct_img = sct.grab(monitor_info)
-        frame_orig = np.array(sct_img)
-        frame_orig = cv2.cvtColor(frame_orig, cv2.COLOR_BGRA2BGR)
-        frame_resized = cv2.resize(
-            frame_orig, (0, 0), fx=RESIZE_FACTOR, fy=RESIZE_FACTOR
+        if max_loc is not None and max_val > max_arrow_score:
+            # 감지된 화살표의 중심 좌표
+            return key_name, (max_loc[0] + w // 2, max_loc[1] + h // 2)
+
+    return None, (-1, -1)
+
+
+def measure_rope_bottom(image, x, y0):
+    """
+    고정대 아래 (x, y0) 부터 줄 색이 이어지는 마지막 y. 줄이 안 보이면 None.
+    줄 가운데 5px 중 하나라도 줄 색이고 양옆 배경과 색이 다르면 그 행은 줄로 본다.
+    """
+    if rope_palette is None or len(rope_palette) == 0:
+        return None
+    h, w = image.shape[:2]
+    y1 = min(h, y0 + ROPE_MAX_LENGTH)
+    if y1 <= y0:
+        return None
+    column = image[y0:y1].astype(np.int16)
+    strip = column[:, max(0, x - 2) : x + 3]
+    left = column[:, max(0, x - ROPE_SIDE_OFFSET)][:, None]
+    right = column[:, min(w - 1, x + ROPE_SIDE_OFFSET)][:, None]
+
+    color = np.abs(strip[:, :, None] - rope_palette).sum(-1).min(-1)
+    thin = (np.abs(strip - left).sum(-1) > ROPE_COLOR_TOLERANCE) & (
+        np.abs(strip - right).sum(-1) > ROPE_COLOR_TOLERANCE
+    )
+    rows = np.flatnonzero(((color <= ROPE_COLOR_TOLERANCE) & thin).any(axis=1))
+    if rows.size == 0:
+        return None
+
+    # 첫 줄 행부터 ROPE_GAP 보다 긴 빈틈 직전까지
+    breaks = np.flatnonzero(np.diff(rows) > ROPE_GAP + 1)
+    last = rows[breaks[0]] if breaks.size else rows[-1]
+    return y0 + int(last)
+
+
+def detect_ropes(frame, area_pyramid, gray_pyramid, changes):
+    """
+    밧줄 [(x, 위 y, 아래 y), ...]. 아래 끝은 고정대 아래로 줄 색이 이어지는 곳까지 재고,
+    못 재면 ROPE_LENGTH 만큼 늘어져 있다고 본다.
+    경로 계획이 밧줄을 필요로 하지 않거나 화면이 그대로면 돌리지 않고 None (navigator 는 기억한 값을 쓴다).
+    """
+    if not rope_images:
+        return []
+    if not changes.any or not navigator.needs_ropes():
+        return None
+    rope_cache.prepare(area_pyramid, rope_images.values())
+    ropes = []
+    for rope_img in rope_images.values():
+        centers = find_object_centers(
+            area_pyramid, rope_img, threshold=0.70, cache=rope_cache
+        )
+        if centers is None:
+            continue
+        for x, y in zip(*centers):
+            top = int(y) - rope_img.h // 2
+            bottom = measure_rope_bottom(frame.image, int(x), top + rope_img.h)
+            if bottom is None or bottom - top < ROPE_MIN_LENGTH:
+                bottom = top + ROPE_LENGTH
+            ropes.append((int(x), top, bottom))
+    return ropes
+
+
+def detect_objects(frame, area_pyramid, gray_pyramid, changes):
+    """YOLO 백엔드: 한 번의 추론으로 캐릭터와 타겟을 같이 찾는다."""
+    found = object_detector.detect(frame.image)
+
+    players = found.get("player") or []
+    player = None
+    if players:
+        d = players[0]  # 점수가 가장 높은 것
+        player = (d.x + d.w // 2, d.y + d.h // 2)
+
+    targets = found.get("target") or []
+    centers = None
+    if targets:
+        centers = (
+            np.array([d.x + d.w // 2 for d in targets]),
+            np.array([d.y + d.h // 2 for d in targets]),
         )
 
-        if drawing or not selection_done:
-            frame_with_selection = draw_selection(frame_resized.copy())
-            cv2.imshow(WINDOW_NAME, frame_with_selection)
+    # 경로 계획용: 밧줄 (중심 x, 위 y, 아래 y), 지형 발판 (왼쪽 x, 윗면 y, 오른쪽 x)
+    ropes = [(d.x + d.w // 2, d.y, d.y + d.h) for d in found.get("rope") or []]
+    terrain = [(d.x, d.y, d.x + d.w) for d in found.get("terrain") or []]
+    return {
+        "player": player,
+        "targets": {"target": centers},
+        "ropes": ropes,
+        "terrain": terrain,
+    }
 
-        if selection_done:
-            x_min = min(x1_orig, x2_orig)
-            x_max = max(x1_orig, x2_orig)
-            y_min = min(y1_orig, y2_orig)
-            y_max = max(y1_orig, y2_orig)
-
-            if x_max > x_min and y_max > y_min:
-                selected_area = frame_orig[y_min:y_max, x_min:x_max].copy()
-                boundary_margin = 50
-
-                # 1. 캐릭터 위치 업데이트
-                player_coords = find_player_coords(
-                    selected_area, player_images, threshold=0.70
-                )
-                if player_coords is not None:
-                    player_x, player_y = player_coords
-                    player_y += PLAYER_Y_OFFSET
 
-                # 2. 가장 가까운 타겟 찾기
-                target_result_coords = None
-                target_distance = float("inf")
-                best_target_name = None
+def make_detection_executor():
+    """
+    프레임마다 감지기들을 동시에 돌리고, DETECT_DEADLINE 안에 못 끝낸 감지기는
+    마지막으로 성공한 값을 쓴다. YOLO 백엔드면 캐릭터 + 타겟이 감지기 하나로 합쳐진다.
+    """
+    if object_detector is not None:
+        detectors = {"objects": detect_objects, "arrow": detect_arrow}
+    else:
+        detectors = {
+            "player": detect_player,
+            "targets": detect_targets,
+            "arrow": detect_arrow,
+            "ropes": detect_ropes,
+        }
+    return DetectionExecutor(detectors, timings=timings)
 
-                for name, target_img in target_images.items():
-                    if target_img is None:
-                        continue
 
-                    current_coords, current_distance = find_closest_object_coords(
-                        selected_area, target_img, threshold=0.70
-                    )
+detection_executor = make_detection_executor()
 
-                    if (
-                        current_coords is not None
-                        and current_distance < target_distance
-                    ):
-                        target_distance = current_distance
-                        target_result_coords = current_coords
-                        best_target_name = name
 
-                # 3. 🚨 방향키 템플릿 매칭 (스킬 발동 조건 확인)
-                REQUIRED_ARROW_KEY = None
-                arrow_center_x, arrow_center_y = -1, -1  # 매 루프 초기화
-                max_arrow_score = 0.75
+def detect_frame(frame):
+    """
+    감지 단계 (감지 스레드에서 실행). 선택 영역만 캡처한 프레임에서
+    캐릭터 / 가장 가까운 타겟 / 방향키를 찾아 dict 로 반환합니다.
+    전체 화면(미리보기) 프레임이거나 선택이 풀린 상태면 None.
+    """
+    global player_x, player_y, detect_rect
 
-                # 캡처 영역을 회색조로 변환
-                selected_area_gray = cv2.cvtColor(selected_area, cv2.COLOR_BGR2GRAY)
+    rect = frame.rect
+    if rect is None or not selection_done:
+        return None
+    selected_area = frame.image
+    if selected_area.size == 0:
+        return None
 
-                for key_name, arrow_data in arrow_images.items():
+    if rect != detect_rect:
+        detect_rect = rect
+        change_detector.reset()
+        for cache in match_caches:
+            cache.reset()
+        detection_executor.reset()
+        if player_tracker is not None:
+            player_tracker.reset()
+
+    # 0. 직전 프레임과 비교해 바뀐 타일만 골라낸다 (나머지는 이전 매칭 결과 재사용)
+    with timings.measure("change"):
+        changes = change_detector.update(frame.gray)
+    for cache in match_caches:
+        cache.begin(changes)
+
+    # 축소 단계는 템플릿들이 같이 쓰도록 프레임당 한 번만 만든다
+    # 회색조 영역은 캡처 스레드가 원본(BGRA)에서 바로 변환해 둔 것을 사용
+    area_pyramid = ImagePyramid(selected_area)
+    gray_pyramid = ImagePyramid(frame.gray)
+
+    # 1~3. 캐릭터 / 타겟 / 🚨 방향키 감지를 동시에 실행
+    results, stale = detection_executor.run(frame, area_pyramid, gray_pyramid, changes)
+
+    # YOLO 백엔드는 한 번의 추론으로 캐릭터와 타겟을 같이 돌려준다
+    if "objects" in results:
+        results.update(results.pop("objects") or {"player": None, "targets": None})
+    else:
+        # 템플릿 추적기 상태는 결과를 다 모은 뒤 여기서만 반영 (감지 스레드)
+        results["player"] = track_player(results["player"], "player" in stale)
+
+    # 캐릭터 위치 업데이트 (못 찾으면 마지막 위치 유지)
+    player_coords = results["player"]
+    if player_coords is not None:
+        player_x, player_y = player_coords
+        player_y += PLAYER_Y_OFFSET
+
+    # 가장 가까운 타겟 고르기
+    target_result_coords = None
+    target_distance = float("inf")
+    best_target_name = None
+
+    for name, centers in (results["targets"] or {}).items():
+        current_coords, current_distance = closest_object(centers, player_x, player_y)
+
+        if current_coords is not None and current_distance < target_distance:
+            target_distance = current_distance
+            target_result_coords = current_coords
+            best_target_name = name
+
+    arrow_key, arrow_center = results["arrow"] or (None, (-1, -1))
+
+    return {
+        "seq": frame.seq,
+        "t": frame.t,
+        "rect": rect,
+        "selected_area": selected_area,
+        "player": (player_x, player_y),
+        "player_found": player_coords is not None,  # False 면 player 는 마지막 위치
+        "target_coords": target_result_coords,
+        "target_name": best_target_name,
+        "arrow_key": arrow_key,
+        "arrow_center": arrow_center,
+        # 이번 프레임에 새로 감지한 밧줄만 (마지막 값을 다시 넘기면 navigator 가 본 것으로 센다)
+        "ropes": None if stale & {"ropes", "objects"} else results.get("ropes"),
+        "terrain": results.get("terrain"),  # YOLO 백엔드에서만 (그 외 None)
+        "stale": stale,  # 이번 프레임 값 대신 마지막 값을 쓴 감지기 이름
+    }
 
-                    arrow_img = arrow_data.get("template")  # 템플릿 이미지
-                    arrow_mask = arrow_data.get("mask")  # 마스크 이미지
 
-                    if arrow_img is None or arrow_mask is None:
-                        continue
+# ====================================================================
+# III. 메인 실행 함수
+# ====================================================================
 
-                    h, w = arrow_img.shape
 
-                    # 💡 마스크를 사용하여 템플릿 매칭 (배경 제외)
-                    result = cv2.matchTemplate(
-                        selected_area_gray,
-                        arrow_img,
-                        cv2.TM_CCOEFF_NORMED,
-                        mask=arrow_mask,
-                    )
-                    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+def navigate_to(player, goal):
+    """
+    navigator 로 goal 까지 예상 시간이 가장 짧은 경로를 계획하고 첫 단계만 실행합니다.
+    (다음 제어 단계에서 새 위치로 다시 계획) 계획할 수 없으면 False.
+    """
+    if navigator.graph is not None and navigator.graph.locate(*player) is None:
+        # 밧줄을 타는 중이면 누르고 있는 키를 유지
+        return pressed_key in (UP_KEY_NAME, DOWN_KEY_NAME)
+
+    path = navigator.plan(player, goal)
+    if not path:
+        return False
+
+    step = path[0]
+    if step.kind in ("walk", "drop", "climb"):
+        press_key(step.direction)
+        return True
+
+    if step.kind == "double":
+        # 더블 탭 녹화본에는 Alt 만 들어 있으므로 방향키를 누른 채로 재생
+        press_key(step.direction)
+        plan = load_composite_action(("double", step.direction))
+        if plan:
+            execute_composite_action(plan, keep_pressed=True)
+        return True
+
+    if step.kind == "grab":
+        # 점프(Alt + 위)로 매달린 밧줄을 잡은 뒤, 재생이 끝나면 위 방향키를 눌러 오른다
+        plan = load_composite_action(JUMP_ACTION)
+        if plan:
+            execute_composite_action(plan)
+        press_key(step.direction)
+        return True
+
+    if pressed_key is not None:
+        release_key(pressed_key)
+    action = JUMP_ACTION if step.kind == "jump" else DOWN_JUMP_ACTION
+    plan = load_composite_action(action)
+    if plan:
+        execute_composite_action(plan)
+    return True
 
-                    if max_val > max_arrow_score:
-                        REQUIRED_ARROW_KEY = key_name
-                        # 감지된 화살표의 중심 좌표 저장
-                        arrow_center_x = max_loc[0] + w // 2
-                        arrow_center_y = max_loc[1] + h // 2
-                        break
 
-                # 🌟🌟🌟 4. 자동 이동/탐색 로직 🌟🌟🌟
+def sweep_toward(direction, player, edge_x):
+    """탐색 모드 가로 이동: 끝까지 멀면 더블 탭, 가까우면 걷기 (계획 실패 시 걷기)."""
+    if not navigate_to(player, (edge_x, player[1])):
+        press_key(direction)
 
-                if target_result_coords is not None:
-                    # A. 타겟 추적 모드
-                    target_center_x, target_center_y = target_result_coords
-                    vertical_diff = abs(target_center_y - player_y)
-                    target_x_diff = abs(target_center_x - player_x)
-                    target_y_diff = target_center_y - player_y
-                    is_target_left = target_center_x < player_x
 
-                    if vertical_diff < VERTICAL_PLATFORM_THRESHOLD:
-                        # 4-1. 같은 플랫폼에 있는 타겟 추적 (공격/이동)
-                        last_target_time = time.time()
+def control_step(det):
+    """
+    제어 단계 (메인 루프에서 실행). 감지 결과 1개를 보고 이동 / 공격 / 탐색 키 입력을 보냅니다.
+    """
+    global target_center_x, target_center_y
+    global last_target_time, current_move_direction, pressed_key, current_attack_threshold
+    global IS_ASCENDING, current_layer_index, REQUIRED_ARROW_KEY, arrow_center_x, arrow_center_y
+    global awaiting_arrow
+
+    x_min, y_min, x_max, y_max = det["rect"]
+    player_x, player_y = det["player"]
+    target_result_coords = det["target_coords"]
+    best_target_name = det["target_name"]
+    REQUIRED_ARROW_KEY = det["arrow_key"]
+    arrow_center_x, arrow_center_y = det["arrow_center"]
+    boundary_margin = 50
+    width = x_max - x_min
+    navigator.observe(det["rect"], det.get("ropes"), det.get("terrain"))
+
+    # 키 입력 / 대기 중에는 새 동작을 시작하지 않는다 (감지는 계속 돈다)
+    if actions.busy():
+        # 화살표 없이 공격한 뒤 대기 중에 화살표가 뜨면 남은 대기를 끊고 바로 입력
+        if awaiting_arrow and REQUIRED_ARROW_KEY is not None:
+            awaiting_arrow = False
+            actions.clear_hold()
+            queue_arrow_combo(REQUIRED_ARROW_KEY)
+        return
+    awaiting_arrow = False
 
-                        if target_x_diff < current_attack_threshold:
-                            # 1. 공격 범위 내: 공격 로직 실행
+    # 🌟🌟🌟 4. 자동 이동/탐색 로직 🌟🌟🌟
 
-                            if pressed_key is not None:
-                                release_key(pressed_key)
+    if target_result_coords is not None:
+        # A. 타겟 추적 모드
+        target_center_x, target_center_y = target_result_coords
+        vertical_diff = abs(target_center_y - player_y)
+        target_x_diff = abs(target_center_x - player_x)
+        target_y_diff = target_center_y - player_y
+        is_target_left = target_center_x < player_x
 
-                            # 1단계: 스페이스바 공격 실행 (짧게 누르고 뗌)
-                            move_character("space", 0.05)
+        if vertical_diff < VERTICAL_PLATFORM_THRESHOLD:
+            # 4-1. 같은 플랫폼에 있는 타겟 추적 (공격/이동)
+            last_target_time = time.time()
 
-                            set_random_attack_threshold()
+            if target_x_diff < current_attack_threshold:
+                # 1. 공격 범위 내: 공격 로직 실행
 
-                            # 2단계: 스페이스바 공격 직후, 화살표 이미지 감지 확인
-                            if REQUIRED_ARROW_KEY is not None:
+                if pressed_key is not None:
+                    release_key(pressed_key)
 
-                                # 🚨 요청 사항 1: 화살표 감지되면 0.5초 대기
-                                time.sleep(ARROW_DETECT_DELAY)
+                # 1단계: 스페이스바 공격 실행 (짧게 누르고 뗌)
+                move_character("space", ATTACK_PRESS_DURATION)
 
-                                # 3단계: 복합 스킬 입력 (화살표 + 스페이스바)
-                                arrow_pico_key = JUMP_PICO_KEY_MAP.get(
-                                    REQUIRED_ARROW_KEY, REQUIRED_ARROW_KEY
-                                )
+                set_random_attack_threshold()
 
-                                send_event_to_pico("down", arrow_pico_key)
-                                send_event_to_pico("down", ATTACK_KEY_NAME)
+                # 2단계: 스페이스바 공격 직후, 화살표 이미지 감지 확인
+                if REQUIRED_ARROW_KEY is not None:
+                    # 🚨 요청 사항 1, 2: 스페이스바를 뗀 뒤 0.5초 대기 → 복합 스킬 입력
+                    # (화살표 + 스페이스바) → 2.0초 대기. 전부 예약만 하고 바로 반환
+                    queue_arrow_combo(
+                        REQUIRED_ARROW_KEY,
+                        delay=ATTACK_PRESS_DURATION + ARROW_DETECT_DELAY,
+                    )
 
-                                time.sleep(0.1)  # 키 눌림 유지 시간
+                else:
+                    # 2단계 (대안): 화살표 감지 안 되면 스페이스바 공격만 실행된 후 2.0초 대기
+                    # 대기 중에 화살표가 감지되면 그때 복합 스킬 입력 (위 busy 처리)
+                    actions.hold(ATTACK_PRESS_DURATION + DEFAULT_ATTACK_COOLDOWN)
+                    awaiting_arrow = True
 
-                                send_event_to_pico("up", ATTACK_KEY_NAME)
-                                send_event_to_pico("up", arrow_pico_key)
+            else:
+                # 2. 공격 범위 밖: 이동 로직 실행 (톡톡 이동 로직)
 
-                                # 🚨 요청 사항 2: 복합 스킬 입력 완료 후 2.0초 대기
-                                time.sleep(DEFAULT_ATTACK_COOLDOWN)
+                target_direction_key = "left" if is_target_left else "right"
 
-                            else:
-                                # 2단계 (대안): 화살표 감지 안 되면 스페이스바 공격만 실행된 후 2.0초 대기
-                                time.sleep(DEFAULT_ATTACK_COOLDOWN)
+                if target_x_diff > PRECISE_MOVE_THRESHOLD:
+                    # 2-1. 거리가 멀면: 꾸욱 눌러서 빠르게 이동
+                    press_key(target_direction_key)
+                else:
+                    # 2-2. 거리가 가까우면: 톡톡 눌러서 정밀하게 이동
 
-                        else:
-                            # 2. 공격 범위 밖: 이동 로직 실행 (톡톡 이동 로직)
+                    if pressed_key is not None:
+                        release_key(pressed_key)
 
-                            target_direction_key = "left" if is_target_left else "right"
+                    move_character(
+                        target_direction_key, PRECISE_MOVE_DURATION, hold=0.05
+                    )
 
-                            if target_x_diff > PRECISE_MOVE_THRESHOLD:
-                                # 2-1. 거리가 멀면: 꾸욱 눌러서 빠르게 이동
-                                press_key(target_direction_key)
-                            else:
-                                # 2-2. 거리가 가까우면: 톡톡 눌러서 정밀하게 이동
+        else:
+            # 4-2. 다른 플랫폼에 있는 타겟: 층 / 밧줄 그래프의 최단 시간 경로로 이동
+            # (걷기 / 더블 탭 / 점프 / 아래 점프 / 밧줄 / 끝에서 떨어지기 중 첫 단계)
+            if not navigate_to(
+                (player_x, player_y), (target_center_x, target_center_y)
+            ):
+                # 경로를 못 찾으면 (발판 밖 / 그래프와 안 맞음): 위면 랜덤 점프, 아래면 멈춤
+                if pressed_key is not None:
+                    release_key(pressed_key)
 
-                                if pressed_key is not None:
-                                    release_key(pressed_key)
+                if target_y_diff < 0:
+                    jump_plan = load_composite_action(JUMP_ACTION)
+                    if jump_plan:
+                        execute_composite_action(jump_plan)
 
-                                move_character(
-                                    target_direction_key, PRECISE_MOVE_DURATION
-                                )
+    else:
+        # B. 탐색 모드 (타겟 없음) -> 계층 순환 로직 통합
 
-                                time.sleep(0.05)
+        if time.time() - last_target_time > SEARCH_IDLE_TIME:
 
+            if IS_ASCENDING:
+                # B-1. ⬆️ 상승 모드 (우측 끝 포탈/점프)
+                if current_layer_index < MAX_LAYER_INDEX:
+                    if (
+                        current_move_direction == "right"
+                        and player_x < width - boundary_margin
+                    ):
+                        sweep_toward(
+                            "right", (player_x, player_y), width - boundary_margin
+                        )
                     else:
-                        # 4-2. 다른 플랫폼에 있는 타겟: 점프/복합 동작
+                        # 우측 끝 도달, 다음 층으로 점프 시도
+                        if pressed_key is not None:
+                            release_key(pressed_key)
+
+                        jump_plan = load_composite_action(JUMP_ACTION)
+                        if jump_plan:
+                            execute_composite_action(jump_plan)
 
-                        # 점프 파일이 jump_1.json ~ jump_5.json으로 변경되었으므로, 랜덤으로 하나 선택
-                        random_jump_key = random.choice(
-                            [f"jump_{i}" for i in range(1, 6)]
+                        current_layer_index += 1
+                        current_move_direction = "left"
+                        press_key(current_move_direction)
+
+                else:  # MAX_LAYER_INDEX 도달 (최상층)
+                    # 최상층 우측 끝에서 하강 모드로 전환 준비
+                    if (
+                        current_move_direction == "right"
+                        and player_x < width - boundary_margin
+                    ):
+                        sweep_toward(
+                            "right", (player_x, player_y), width - boundary_margin
                         )
+                    else:
+                        release_key(pressed_key)
+                        current_move_direction = "left"
+                        IS_ASCENDING = False
+                        current_layer_index = MAX_LAYER_INDEX
+                        print("➡️ 최상층 우측 끝 도달. 하강 모드 전환.")
+                        actions.hold(0.1)
 
-                        if target_y_diff < 0:
-                            if pressed_key is not None:
-                                release_key(pressed_key)
+            else:
+                # B-2. ⬇️ 하강 모드 (좌측 끝 Alt 더블 탭)
 
-                            action_to_execute = random_jump_key
+                if current_layer_index > 0:
+                    if current_move_direction == "left" and player_x > boundary_margin:
+                        sweep_toward("left", (player_x, player_y), boundary_margin)
+                    else:
+                        # 좌측 끝 도달, Alt 더블 탭 시도
+                        if pressed_key is not None:
+                            release_key(pressed_key)
+
+                        alt_plan = load_composite_action(ALT_DOUBLE_TAP_ACTION)
+                        if alt_plan:
+                            execute_composite_action(alt_plan)
+
+                        current_layer_index -= 1
+                        current_move_direction = "right"
+                        press_key(current_move_direction)
+
+                else:  # current_layer_index == 0 도달 (최하층)
+                    # 최하층 좌측 끝에서 상승 모드로 전환 준비
+                    if current_move_direction == "left" and player_x > boundary_margin:
+                        sweep_toward("left", (player_x, player_y), boundary_margin)
+                    else:
+                        release_key(pressed_key)
+                        current_move_direction = "right"
+                        IS_ASCENDING = True
+                        current_layer_index = 0
+                        print("⬅️ 최하층 좌측 끝 도달. 상승 모드 전환.")
+                        actions.hold(0.1)
 
-                            jump_events = load_composite_action(action_to_execute)
-                            if jump_events:
-                                execute_composite_action(jump_events)
-                        else:
-                            if pressed_key is not None:
-                                release_key(pressed_key)
+        else:
+            pass  # 타겟이 잠깐 사라졌을 때: 움직임 유지
 
-                else:
-                    # B. 탐색 모드 (타겟 없음) -> 계층 순환 로직 통합
-
-                    if time.time() - last_target_time > SEARCH_IDLE_TIME:
-
-                        if IS_ASCENDING:
-                            # B-1. ⬆️ 상승 모드 (우측 끝 포탈/점프)
-                            if current_layer_index < MAX_LAYER_INDEX:
-                                if (
-                                    current_move_direction == "right"
-                                    and player_x < (x_max - x_min) - boundary_margin
-                                ):
-                                    press_key("right")
-                                else:
-                                    # 우측 끝 도달, 다음 층으로 점프 시도
-                                    if pressed_key is not None:
-                                        release_key(pressed_key)
-
-                                    random_jump_key = random.choice(
-                                        [f"jump_{i}" for i in range(1, 6)]
-                                    )
-                                    action_to_execute = random_jump_key
-
-                                    jump_events = load_composite_action(
-                                        action_to_execute
-                                    )
-                                    if jump_events:
-                                        execute_composite_action(jump_events)
-
-                                    current_layer_index += 1
-                                    current_move_direction = "left"
-                                    press_key(current_move_direction)
-
-                            else:  # MAX_LAYER_INDEX 도달 (최상층)
-                                # 최상층 우측 끝에서 하강 모드로 전환 준비
-                                if (
-                                    current_move_direction == "right"
-                                    and player_x < (x_max - x_min) - boundary_margin
-                                ):
-                                    press_key("right")
-                                else:
-                                    release_key(pressed_key)
-                                    current_move_direction = "left"
-                                    IS_ASCENDING = False
-                                    current_layer_index = MAX_LAYER_INDEX
-                                    print("➡️ 최상층 우측 끝 도달. 하강 모드 전환.")
-                                    time.sleep(0.1)
-
-                        else:
-                            # B-2. ⬇️ 하강 모드 (좌측 끝 Alt 더블 탭)
-
-                            if current_layer_index > 0:
-                                if (
-                                    current_move_direction == "left"
-                                    and player_x > boundary_margin
-                                ):
-                                    press_key("left")
-                                else:
-                                    # 좌측 끝 도달, Alt 더블 탭 시도
-                                    if pressed_key is not None:
-                                        release_key(pressed_key)
-
-                                    alt_events = load_composite_action(
-                                        ALT_DOUBLE_TAP_ACTION
-                                    )
-                                    if alt_events:
-                                        execute_composite_action(alt_events)
-
-                                    current_layer_index -= 1
-                                    current_move_direction = "right"
-                                    press_key(current_move_direction)
-
-                            else:  # current_layer_index == 0 도달 (최하층)
-                                # 최하층 좌측 끝에서 상승 모드로 전환 준비
-                                if (
-                                    current_move_direction == "left"
-                                    and player_x > boundary_margin
-                                ):
-                                    press_key("left")
-                                else:
-                                    release_key(pressed_key)
-                                    current_move_direction = "right"
-                                    IS_ASCENDING = True
-                                    current_layer_index = 0
-                                    print("⬅️ 최하층 좌측 끝 도달. 상승 모드 전환.")
-                                    time.sleep(0.1)
 
-                    else:
-                        pass  # 타겟이 잠깐 사라졌을 때: 움직임 유지
+def main():
+    """메인 실행 함수"""
+    global selection_done, drawing, target_center_x, target_center_y
+
+    set_random_attack_threshold()
+
+    # 캡처 → 감지 → 제어 파이프라인: 캡처와 감지는 각자 스레드에서 계속 돌고,
+    # 이 루프(제어)는 항상 가장 최신 감지 결과만 가져다 쓴다.
+    ring = FrameRing()
+    grabber = FrameGrabber(ring, monitor_index=0, timings=timings)
+    detector = DetectionWorker(ring, detect_frame, timings=timings)
+    overlay = LatencyOverlay(timings) if SHOW_LATENCY_OVERLAY else None
+    grabber.start()
+    detector.start()
+    actions.start()
+    preview = None  # 선택 창 미리보기 버퍼 (재사용)
+    area_view = None  # "Selected Area" 창 버퍼 (재사용)
+
+    cv2.namedWindow(WINDOW_NAME)
+    cv2.setMouseCallback(WINDOW_NAME, select_area)
+
+    print("-" * 40)
+    print("📢 공격 로직 변경 적용")
+    print(f"✅ 일반 공격 후 대기: {DEFAULT_ATTACK_COOLDOWN} 초")
+    print(f"✅ 복합 스킬 감지 후 대기: {ARROW_DETECT_DELAY} 초")
+    print("1. 화면 캡처 영역을 마우스로 드래그하여 선택하세요.")
+    print("2. 종료하려면 F10을 누르세요.")
+    print("-" * 40)
+
+    while True:
+        if keyboard.is_pressed("f10"):
+            print("F10 눌림 → 종료")
+            stop_actions()
+            if pico and pico.is_open:
+                pico.send_stop()
+                time.sleep(0.1)
+            break
+
+        # 선택이 끝나면 선택 영역만, 선택 중에는 전체 화면을 캡처
+        rect = get_selection_rect()
+        if grabber.region != rect:
+            grabber.set_region(rect)
+
+        frame = ring.latest()
+        if frame is None:
+            cv2.waitKey(1)
+            continue
+
+        # 전체 화면 미리보기는 선택 창이 열려 있는 동안에만 만든다
+        if frame.rect is None and (drawing or not selection_done):
+            preview_size = (
+                int(frame.image.shape[1] * RESIZE_FACTOR),
+                int(frame.image.shape[0] * RESIZE_FACTOR),
+            )
+            if preview is None or preview.shape[1::-1] != preview_size:
+                preview = np.empty(
+                    (preview_size[1], preview_size[0], 3), dtype=np.uint8
+                )
+            cv2.resize(frame.image, preview_size, dst=preview)
+            cv2.imshow(WINDOW_NAME, draw_selection(preview))
+        frame.release()
+
+        if selection_done:
+            # 감지 스레드가 새 결과를 냈을 때만 제어 로직을 1회 실행
+            det = detector.results.take()
+            if det is not None:
+                with timings.measure("decision"):
+                    control_step(det)
+
+                player_x, player_y = det["player"]
+                target_result_coords = det["target_coords"]
 
                 # 5. 디버깅 및 출력
+                # 감지 프레임은 deadline 을 넘긴 감지기가 아직 읽고 있을 수 있으므로
+                # 점 / 오버레이는 복사본에 그린다
+                frame_image = det["selected_area"]
+                if area_view is None or area_view.shape != frame_image.shape:
+                    area_view = np.empty_like(frame_image)
+                np.copyto(area_view, frame_image)
+                selected_area = area_view
 
                 # 타겟 드로잉 (빨간색)
                 if target_result_coords is not None:
@@ -762,14 +1263,36 @@ def main():
                     selected_area, (int(player_x), int(player_y)), 5, (255, 0, 0), -1
                 )
 
+                if overlay is not None:
+                    overlay.draw(selected_area)
+
                 if selected_area.size > 0:
                     cv2.imshow("Selected Area", selected_area)
+                det["frame"].release()
 
         cv2.waitKey(1)
 
+    detector.stop()
+    grabber.stop()
+    detection_executor.shutdown()
     cv2.destroyAllWindows()
 
 
+def save_timings():
+    """단계별 소요 시간 요약을 출력하고 LATENCY_TRACE_PATH 에 기록을 저장합니다."""
+    if not timings.stages():
+        return
+    print("-" * 40)
+    print("⏱ 단계별 소요 시간")
+    print(timings.format())
+    if LATENCY_TRACE_PATH:
+        try:
+            timings.dump(LATENCY_TRACE_PATH)
+            print(f"✅ 소요 시간 기록 저장: {LATENCY_TRACE_PATH}")
+        except OSError as e:
+            print(f"❌ 소요 시간 기록 저장 실패: {e}")
+
+
 if __name__ == "__main__":
     load_images()
     initialize_serial()
@@ -779,6 +1302,9 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"❌ 메인 루프 실행 중 오류 발생: {e}")
     finally:
+        # 동작 실행 스레드를 멈춘 뒤라 눌린 키는 여기서 직접 뗀다
+        stop_actions()
         if pressed_key is not None:
-            release_key(pressed_key)
+            send_event_to_pico("up", pressed_key)
         close_serial()
+        save_timings()
@@ -0,0 +1,886 @@
+# matching.py (피라미드 coarse-to-fine 템플릿 매칭 엔진)
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# 축소 단계 수 (1단계마다 가로/세로 1/2)
+PYRAMID_MAX_LEVEL = 2
+
+# 축소했을 때 템플릿의 짧은 변이 이보다 작아지면 그 단계는 쓰지 않는다 (px)
+PYRAMID_MIN_SIZE = 6
+
+# 축소 단계에서 고른 후보 중 원본 해상도로 다시 확인할 최대 개수
+REFINE_TOP_K = 8
+
+# 후보 주변을 원본 해상도로 다시 볼 때 추가로 여유를 두는 폭 (px)
+REFINE_MARGIN = 2
+
+# 보정: 템플릿 자신을 축소 단계에서 찾았을 때 점수가 이 값 미만이면 그 단계는 버린다
+CALIBRATION_MIN_SELF_SCORE = 0.8
+
+# 보정: 축소 단계 임계값을 실제 측정값보다 이만큼 더 낮춰 둔다 (놓침 방지 여유)
+CALIBRATION_SAFETY = 0.05
+
+# 보정에 사용할 샘플 캡처 최대 장수
+CALIBRATION_MAX_SAMPLES = 5
+
+# 템플릿 스펙트럼을 캐시해 둘 DFT 크기 종류 수 (검색 이미지 크기 x 피라미드 단계)
+FFT_CACHE_SHAPES = 2 * (PYRAMID_MAX_LEVEL + 1)
+
+
+# ======================================================================
+# 1. 템플릿 / 이미지 피라미드
+# ======================================================================
+def pyramid_down(image, levels):
+    """image 를 levels 단계 축소한 리스트 [원본, 1/2, 1/4, ...]"""
+    out = [image]
+    for _ in range(levels):
+        out.append(cv2.pyrDown(out[-1]))
+    return out
+
+
+def mask_down(mask, levels):
+    """마스크 축소 (경계는 조금이라도 화살표가 걸치면 포함)"""
+    out = [mask]
+    for _ in range(levels):
+        small = cv2.pyrDown(out[-1])
+        _, small = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY)
+        out.append(small)
+    return out
+
+
+def template_stats(templ, mask=None):
+    """
+    TM_CCOEFF_NORMED 에 쓰는 템플릿 쪽 통계 (프레임마다 다시 계산하지 않도록 미리 계산).
+    반환: (planes, mask_plane, mask_sum, norm)
+    - planes     : 채널별 (T - 평균T) 평면 (마스크가 있으면 마스크 안 평균을 빼고 마스크를 곱함)
+    - mask_plane : 0/1 마스크 (float32), 마스크가 없으면 None
+    - mask_sum   : 평균을 낸 픽셀 수
+    - norm       : Σ(T - 평균T)² (채널 합) = 픽셀 수 × 분산
+    """
+    chans = [templ] if templ.ndim == 2 else cv2.split(templ)
+    chans = [c.astype(np.float64) for c in chans]
+    if mask is None:
+        m, m_sum = None, float(templ.shape[0] * templ.shape[1])
+        planes = [c - c.mean() for c in chans]
+    else:
+        m = (mask > 0).astype(np.float64)
+        m_sum = max(float(m.sum()), 1.0)
+        planes = [(c - (c * m).sum() / m_sum) * m for c in chans]
+    norm = float(sum((p**2).sum() for p in planes))
+    planes = [p.astype(np.float32) for p in planes]
+    mask_plane = m.astype(np.float32) if m is not None else None
+    return planes, mask_plane, m_sum, norm
+
+
+class MatchTemplate:
+    """
+    매칭용 템플릿 1개.
+    - image / mask : 원본 해상도 템플릿 (mask 는 방향키처럼 배경을 빼야 할 때만)
+    - gray         : image 의 회색조 버전 (image 가 회색조면 같은 배열)
+    - threshold    : 원본 해상도에서의 판정 임계값 (TM_CCOEFF_NORMED)
+    - level        : 먼저 훑어볼 축소 단계 (0 이면 원본에서 바로 매칭)
+    - coarse_threshold : 축소 단계에서 후보로 남길 최소 점수 (calibrate 로 정함)
+    - stats        : 단계별 template_stats (FFTBankMatcher 가 그대로 사용)
+    """
+
+    def __init__(self, name, image, threshold=0.70, mask=None, _derived=None):
+        self.name = name
+        self.image = image
+        self.mask = mask
+        self.h, self.w = image.shape[:2]
+        self.threshold = threshold
+        self.level = 0
+        self.coarse_threshold = threshold
+
+        if _derived is not None:
+            # TemplateBank 캐시에서 복원: 파생 배열을 다시 계산하지 않는다
+            self.gray, self.levels, self.mask_levels, self.stats = _derived
+            return
+
+        self.gray = (
+            image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        )
+        self.levels = pyramid_down(image, PYRAMID_MAX_LEVEL)
+        self.mask_levels = (
+            mask_down(mask, PYRAMID_MAX_LEVEL) if mask is not None else None
+        )
+        self.stats = [
+            template_stats(*self.template_at(lv)) for lv in range(len(self.levels))
+        ]
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def max_usable_level(self) -> int:
+        """템플릿 크기만 보고 쓸 수 있는 가장 깊은 축소 단계."""
+        level = 0
+        for lv in range(1, PYRAMID_MAX_LEVEL + 1):
+            if min(self.levels[lv].shape[:2]) < PYRAMID_MIN_SIZE:
+                break
+            level = lv
+        return level
+
+    def template_at(self, level):
+        mask = self.mask_levels[level] if self.mask_levels is not None else None
+        return self.levels[level], mask
+
+    # ───────── 캐시 저장 / 복원 (TemplateBank 가 npz 로 씀) ─────────
+    def to_arrays(self) -> dict:
+        """모든 파생 배열과 보정 결과를 np.savez 에 넘길 수 있는 dict 로."""
+        arrays = {
+            "image": self.image,
+            "gray": self.gray,
+            "threshold": np.float64(self.threshold),
+            "level": np.int64(self.level),
+            "coarse_threshold": np.float64(self.coarse_threshold),
+        }
+        if self.mask is not None:
+            arrays["mask"] = self.mask
+        for lv, (planes, mask_plane, m_sum, norm) in enumerate(self.stats):
+            arrays[f"level_{lv}"] = self.levels[lv]
+            if self.mask_levels is not None:
+                arrays[f"mask_level_{lv}"] = self.mask_levels[lv]
+                arrays[f"mask_plane_{lv}"] = mask_plane
+            arrays[f"planes_{lv}"] = np.stack(planes)
+            arrays[f"moments_{lv}"] = np.array([m_sum, norm], dtype=np.float64)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, name, arrays):
+        """to_arrays() 결과로부터 복원 (피라미드 / 통계 재계산 없음)."""
+        n_levels = sum(1 for k in arrays if k.startswith("level_"))
+        has_mask = "mask" in arrays
+        levels = [arrays[f"level_{lv}"] for lv in range(n_levels)]
+        mask_levels = (
+            [arrays[f"mask_level_{lv}"] for lv in range(n_levels)] if has_mask else None
+        )
+        stats = []
+        for lv in range(n_levels):
+            m_sum, norm = arrays[f"moments_{lv}"].tolist()
+            stats.append(
+                (
+                    list(arrays[f"planes_{lv}"]),
+                    arrays[f"mask_plane_{lv}"] if has_mask else None,
+                    m_sum,
+                    norm,
+                )
+            )
+        tmpl = cls(
+            name,
+            arrays["image"],
+            float(arrays["threshold"]),
+            arrays["mask"] if has_mask else None,
+            _derived=(arrays["gray"], levels, mask_levels, stats),
+        )
+        tmpl.level = int(arrays["level"])
+        tmpl.coarse_threshold = float(arrays["coarse_threshold"])
+        return tmpl
+
+
+class ImagePyramid:
+    """
+    프레임(검색 영역) 1장의 축소 단계 캐시.
+    같은 프레임에 여러 템플릿을 매칭할 때 축소는 한 번만 한다.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self._levels = [image]
+        self._lock = threading.Lock()  # 감지기 스레드들이 같은 피라미드를 같이 쓴다
+        # (id(템플릿), 단계) → 미리 계산한 점수 맵 (PyramidMatcher.prepare)
+        self.scores = {}
+
+    def level(self, n: int):
+        if len(self._levels) > n:
+            return self._levels[n]
+        with self._lock:
+            while len(self._levels) <= n:
+                self._levels.append(cv2.pyrDown(self._levels[-1]))
+        return self._levels[n]
+
+
+def as_pyramid(image):
+    return image if isinstance(image, ImagePyramid) else ImagePyramid(image)
+
+
+def match_scores(image, templ, mask=None):
+    """TM_CCOEFF_NORMED 점수 맵. 마스크 매칭에서 나오는 nan/inf 는 0 으로 정리."""
+    if mask is None:
+        return cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED)
+    res = cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED, mask=mask)
+    np.nan_to_num(res, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    return res
+
+
+def local_peaks(res, threshold, top_k, size=(3, 3)):
+    """
+    size=(w, h) 이웃 안에서 극대인 점 중 threshold 이상인 것을
+    점수 순으로 최대 top_k 개 (xs, ys, scores)
+    """
+    kernel = np.ones((size[1] | 1, size[0] | 1), dtype=np.uint8)
+    peaks = (res >= threshold) & (res == cv2.dilate(res, kernel))
+    ys, xs = np.nonzero(peaks)
+    scores = res[ys, xs]
+    if scores.size > top_k:
+        keep = np.argpartition(-scores, top_k - 1)[:top_k]
+        xs, ys, scores = xs[keep], ys[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return xs[order], ys[order], scores[order]
+
+
+# 같은 물체로 볼 겹침 비율 (IoU). 이보다 많이 겹치는 약한 위치는 버린다
+NMS_IOU_THRESHOLD = 0.3
+
+
+def nms_boxes(xs, ys, scores, w, h, iou_threshold=NMS_IOU_THRESHOLD):
+    """
+    매칭 위치(좌상단 xs, ys, 크기 w x h)들에 대한 non-maximum suppression.
+    w, h 는 모두 같은 크기면 정수, 템플릿이 섞여 있으면 위치별 배열로 준다.
+    점수가 높은 위치가 그것과 많이 겹치는 낮은 위치를 지운다 (greedy NMS 와 같은 결과).
+
+    겹칠 수 있는 쌍(가로 거리 < 최대 w)만 배열 연산으로 한 번에 골라 IoU 를 계산하고,
+    아무와도 겹치지 않는 위치는 바로 남긴다. 순서대로 따져야 하는 건
+    실제로 겹치는 위치들뿐이다.
+    반환: 남긴 인덱스 배열 (점수 내림차순)
+    """
+    n = len(scores)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # 점수 내림차순으로 번호를 다시 매긴다 (rank 가 작을수록 점수가 높음)
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    xs = np.asarray(xs, dtype=np.int64)[order]
+    ys = np.asarray(ys, dtype=np.int64)[order]
+    ws = np.broadcast_to(np.asarray(w, dtype=np.int64), (n,))[order]
+    hs = np.broadcast_to(np.asarray(h, dtype=np.int64), (n,))[order]
+    w_max = int(ws.max())
+
+    # x 로 정렬해서 각 위치와 가로로 겹칠 수 있는 구간 [lo, hi) 을 찾는다
+    by_x = np.argsort(xs, kind="stable")
+    sorted_x = xs[by_x]
+    lo = np.searchsorted(sorted_x, sorted_x - w_max, side="right")
+    hi = np.searchsorted(sorted_x, sorted_x + w_max, side="left")
+    counts = hi - lo
+    a = np.repeat(np.arange(n), counts)
+    b = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    b = b + np.repeat(lo, counts)
+    i, j = by_x[a], by_x[b]
+    pair = i < j  # (높은 점수 i, 낮은 점수 j) 쌍만
+    i, j = i[pair], j[pair]
+
+    overlap_w = np.minimum(xs[i] + ws[i], xs[j] + ws[j]) - np.maximum(xs[i], xs[j])
+    overlap_h = np.minimum(ys[i] + hs[i], ys[j] + hs[j]) - np.maximum(ys[i], ys[j])
+    inter = np.clip(overlap_w, 0, None) * np.clip(overlap_h, 0, None)
+    iou = inter / (ws[i] * hs[i] + ws[j] * hs[j] - inter).astype(np.float64)
+    conflict = iou > iou_threshold
+    i, j = i[conflict], j[conflict]
+
+    suppressed = np.zeros(n, dtype=bool)
+    if i.size:
+        # 겹치는 쌍만 점수 순으로 처리: 살아남은 i 만 j 를 지울 수 있다
+        pairs = np.lexsort((j, i))
+        i, j = i[pairs], j[pairs]
+        starts = np.searchsorted(i, np.arange(n), side="left")
+        ends = np.searchsorted(i, np.arange(n), side="right")
+        for k in np.unique(i).tolist():
+            if not suppressed[k]:
+                suppressed[j[starts[k] : ends[k]]] = True
+
+    return order[~suppressed]
+
+
+# ======================================================================
+# 2. 여러 템플릿 일괄 매칭 (검색 이미지 FFT / 적분 영상 공유)
+# ======================================================================
+def box_sums(integral, h, w):
+    """적분 영상에서 모든 (h x w) 창의 합 (matchTemplate 결과와 같은 크기)."""
+    return integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+
+
+class FFTBankMatcher:
+    """
+    같은 검색 이미지에 여러 템플릿을 TM_CCOEFF_NORMED 로 매칭한다.
+    검색 이미지(와 그 제곱)의 DFT, 적분 영상은 한 번만 만들고 모든 템플릿이 공유한다.
+    템플릿 쪽 평균/분산은 MatchTemplate.stats 에 미리 계산되어 있고,
+    그 스펙트럼은 (템플릿, DFT 크기) 별로 캐시해서 프레임마다 다시 만들지 않는다.
+
+    - 마스크 없음: 분자 = I 와 (T - 평균T) 의 상관, 창 분산은 적분 영상으로 계산
+    - 마스크 있음: 분자 = I 와 M·(T - 마스크 평균T) 의 상관,
+      창 분산 = corr(I², M) - corr(I, M)² / ΣM  (cv2 의 마스크 CCOEFF_NORMED 와 같은 식)
+    컬러는 채널별 합을 분자/분모 모두에 더한다 (cv2 와 동일).
+    """
+
+    def __init__(self):
+        self._spectra = {}
+        self._fft_shapes = set()
+
+    @staticmethod
+    def _channels(img):
+        return [img] if img.ndim == 2 else cv2.split(img)
+
+    @staticmethod
+    def _dft(plane, fft_shape):
+        """0 으로 채워 fft_shape 로 늘린 뒤 실수 DFT (CCS 압축 형식)"""
+        padded = np.zeros(fft_shape, dtype=np.float32)
+        padded[: plane.shape[0], : plane.shape[1]] = plane
+        return cv2.dft(padded)
+
+    def _template_spectra(self, key, stats, fft_shape):
+        cache_key = (key, fft_shape)
+        cached = self._spectra.get(cache_key)
+        if cached is not None:
+            return cached
+
+        planes, mask_plane, m_sum, norm = stats
+        m_spec = self._dft(mask_plane, fft_shape) if mask_plane is not None else None
+        t_specs = [self._dft(p, fft_shape) for p in planes]
+        cached = (t_specs, m_spec, m_sum, norm)
+        self._spectra[cache_key] = cached
+        return cached
+
+    def score_maps(self, image, entries):
+        """
+        entries: [(key, stats), ...] — key 는 템플릿 스펙트럼 캐시 키,
+                 stats 는 template_stats() 결과 (MatchTemplate.stats)
+        반환: entries 순서대로 점수 맵 (float32, cv2.matchTemplate 과 같은 크기)
+        """
+        chans = [c.astype(np.float32) for c in self._channels(image)]
+        img_h, img_w = chans[0].shape
+        fft_shape = (cv2.getOptimalDFTSize(img_h), cv2.getOptimalDFTSize(img_w))
+        if fft_shape not in self._fft_shapes:
+            # 피라미드 단계마다 DFT 크기가 다르므로 몇 개까지는 같이 들고 있고,
+            # 영역 재선택 등으로 크기 종류가 늘어나면 예전 스펙트럼은 버린다
+            if len(self._fft_shapes) >= FFT_CACHE_SHAPES:
+                self._spectra.clear()
+                self._fft_shapes.clear()
+            self._fft_shapes.add(fft_shape)
+
+        img_specs = [self._dft(c, fft_shape) for c in chans]
+        sq_total = None  # 채널 합 I² (마스크 없는 템플릿은 적분, 마스크 템플릿은 DFT)
+        sq_spec = None
+        integrals = None
+        window_stats = {}  # (h, w) → 창 분산 (마스크 없는 템플릿은 크기만 같으면 공유)
+
+        def correlate(specs_a, specs_b, h, w):
+            """채널별 상관의 합. 스펙트럼 곱을 먼저 더해서 역변환은 1회만."""
+            acc = None
+            for spec_a, spec_b in zip(specs_a, specs_b):
+                prod = cv2.mulSpectrums(spec_a, spec_b, 0, conjB=True)
+                acc = prod if acc is None else cv2.add(acc, prod)
+            out = cv2.idft(acc, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+            return out[: img_h - h + 1, : img_w - w + 1].astype(np.float64)
+
+        maps = []
+        for key, stats in entries:
+            h, w = stats[0][0].shape
+            t_specs, m_spec, m_sum, t_norm = self._template_spectra(
+                key, stats, fft_shape
+            )
+            num = correlate(img_specs, t_specs, h, w)
+
+            if sq_total is None:
+                sq_total = sum(c.astype(np.float64) ** 2 for c in chans)
+            if m_spec is None:
+                wnd = window_stats.get((h, w))
+                if wnd is None:
+                    if integrals is None:
+                        integrals = (
+                            [cv2.integral(c, sdepth=cv2.CV_64F) for c in chans],
+                            cv2.integral(sq_total, sdepth=cv2.CV_64F),
+                        )
+                    sums = [box_sums(i, h, w) for i in integrals[0]]
+                    wnd = (
+                        box_sums(integrals[1], h, w) - sum(x * x for x in sums) / m_sum
+                    )
+                    window_stats[(h, w)] = wnd
+            else:
+                if sq_spec is None:
+                    sq_spec = self._dft(sq_total, fft_shape)
+                sums = [correlate([spec], [m_spec], h, w) for spec in img_specs]
+                wnd = correlate([sq_spec], [m_spec], h, w)
+                wnd -= sum(x * x for x in sums) / m_sum
+
+            den = np.sqrt(np.clip(wnd, 0, None) * t_norm)
+            res = np.zeros_like(num)
+            ok = den > 1e-6 * max(t_norm, 1.0)
+            np.divide(num, den, out=res, where=ok)
+            maps.append(np.clip(res, -1.0, 1.0).astype(np.float32))
+        return maps
+
+
+# ======================================================================
+# 3. 매칭 엔진
+# ======================================================================
+class PyramidMatcher:
+    """
+    축소 단계에서 먼저 훑고, 상위 후보 주변만 원본 해상도로 다시 매칭한다.
+    템플릿 level 이 0 이거나 검색 영역이 너무 작으면 원본에서 바로 매칭한다.
+    반환 좌표는 모두 원본 해상도 기준 템플릿 좌상단 (x, y).
+    """
+
+    def __init__(self, top_k=REFINE_TOP_K, margin=REFINE_MARGIN):
+        self.top_k = top_k
+        self.margin = margin
+        self.bank = FFTBankMatcher()
+
+    def prepare(self, image, templates):
+        """
+        templates 전부의 (첫 단계) 점수 맵을 한 번에 계산해서 피라미드에 넣어 둔다.
+        이후 같은 피라미드로 best / find_all 을 부르면 이 점수 맵을 그대로 쓴다.
+        반환: {템플릿 이름: 점수 맵}
+        """
+        pyramid = as_pyramid(image)
+        by_level = {}
+        for tmpl in templates:
+            if tmpl is None:
+                continue
+            img = pyramid.image
+            if img.shape[0] < tmpl.h or img.shape[1] < tmpl.w:
+                continue
+            by_level.setdefault(self.level_for(pyramid, tmpl), []).append(tmpl)
+
+        out = {}
+        for level, group in by_level.items():
+            entries = [((id(tmpl), level), tmpl.stats[level]) for tmpl in group]
+            maps = self.bank.score_maps(pyramid.level(level), entries)
+            for tmpl, res in zip(group, maps):
+                pyramid.scores[(id(tmpl), level)] = res
+                out[tmpl.name] = res
+        return out
+
+    def _scores(self, pyramid, tmpl, level):
+        res = pyramid.scores.get((id(tmpl), level))
+        if res is None:
+            small, small_mask = tmpl.template_at(level)
+            res = match_scores(pyramid.level(level), small, small_mask)
+        return res
+
+    def level_for(self, pyramid, tmpl):
+        level = tmpl.level
+        while level > 0:
+            img = pyramid.level(level)
+            small, _ = tmpl.template_at(level)
+            if img.shape[0] >= small.shape[0] and img.shape[1] >= small.shape[1]:
+                break
+            level -= 1
+        return level
+
+    def _refine(self, pyramid, tmpl, level, top_k):
+        """축소 단계 후보들 → 원본 해상도 창 [(x0, y0, res), ...]"""
+        small, small_mask = tmpl.template_at(level)
+        coarse = self._scores(pyramid, tmpl, level)
+        xs, ys, _ = local_peaks(coarse, tmpl.coarse_threshold, top_k)
+
+        image = pyramid.image
+        img_h, img_w = image.shape[:2]
+        scale = 1 << level
+        pad = scale + self.margin
+        windows = []
+        for cx, cy in zip(xs.tolist(), ys.tolist()):
+            x0 = max(0, cx * scale - pad)
+            y0 = max(0, cy * scale - pad)
+            x1 = min(img_w, cx * scale + pad + tmpl.w)
+            y1 = min(img_h, cy * scale + pad + tmpl.h)
+            if x1 - x0 < tmpl.w or y1 - y0 < tmpl.h:
+                continue
+            res = match_scores(image[y0:y1, x0:x1], tmpl.image, tmpl.mask)
+            windows.append((x0, y0, res))
+        return windows
+
+    def best(self, image, tmpl):
+        """
+        가장 높은 점수와 그 좌표 (score, (x, y)). 후보가 없으면 (-1.0, None).
+        cv2.minMaxLoc(matchTemplate(...)) 의 max 쪽과 같은 의미.
+        """
+        pyramid = as_pyramid(image)
+        img = pyramid.image
+        if img.shape[0] < tmpl.h or img.shape[1] < tmpl.w:
+            return -1.0, None
+
+        level = self.level_for(pyramid, tmpl)
+        if level == 0:
+            res = self._scores(pyramid, tmpl, 0)
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            return max_val, max_loc
+
+        best_score, best_loc = -1.0, None
+        for x0, y0, res in self._refine(pyramid, tmpl, level, self.top_k):
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            if max_val > best_score:
+                best_score = max_val
+                best_loc = (x0 + max_loc[0], y0 + max_loc[1])
+        return best_score, best_loc
+
+    def find_all(self, image, tmpl, threshold=None, peaks_only=False):
+        """
+        threshold 이상인 모든 위치 (xs, ys, scores) — np.where(res >= threshold) 와 같은 의미.
+        축소 단계를 쓰는 템플릿은 후보 주변 창 안의 위치만 나온다.
+        peaks_only=True 면 템플릿 크기 이웃 안의 극대점만 남긴다
+        (한 물체 주변의 히트 덩어리를 점수 맵 단계에서 한 번에 줄임).
+        """
+        threshold = tmpl.threshold if threshold is None else threshold
+        pyramid = as_pyramid(image)
+        img = pyramid.image
+        if img.shape[0] < tmpl.h or img.shape[1] < tmpl.w:
+            return _no_hits()
+
+        def hits_in(res):
+            if peaks_only:
+                return local_peaks(res, threshold, res.size, (tmpl.w, tmpl.h))
+            ys, xs = np.nonzero(res >= threshold)
+            return xs, ys, res[ys, xs]
+
+        level = self.level_for(pyramid, tmpl)
+        if level == 0:
+            return hits_in(self._scores(pyramid, tmpl, 0))
+
+        parts = []
+        for x0, y0, res in self._refine(pyramid, tmpl, level, self.top_k):
+            xs, ys, scores = hits_in(res)
+            parts.append((xs + x0, ys + y0, scores))
+        if not parts:
+            return _no_hits()
+        xs = np.concatenate([p[0] for p in parts])
+        ys = np.concatenate([p[1] for p in parts])
+        scores = np.concatenate([p[2] for p in parts])
+
+        # 창이 겹치는 부분에서 같은 위치가 두 번 나오면 한 번만 센다
+        _, first = np.unique(ys * img.shape[1] + xs, return_index=True)
+        return xs[first], ys[first], scores[first]
+
+
+def _no_hits():
+    empty = np.empty(0, dtype=np.intp)
+    return empty, empty, np.empty(0, dtype=np.float32)
+
+
+# ======================================================================
+# 4. 템플릿별 보정 (축소 단계 / 축소 단계 임계값)
+# ======================================================================
+def _self_coarse_score(tmpl, level):
+    """
+    템플릿을 자기 자신이 들어 있는 화면에서 찾을 때 축소 단계 점수의 최솟값.
+    픽셀 위치가 축소 배율로 나누어떨어지지 않는 경우(어긋남)까지 모두 확인한다.
+    """
+    scale = 1 << level
+    pad = max(tmpl.h, tmpl.w) + 2 * scale
+    small, small_mask = tmpl.template_at(level)
+    worst = 1.0
+    for dy in range(scale):
+        for dx in range(scale):
+            canvas = cv2.copyMakeBorder(
+                tmpl.image,
+                pad + dy,
+                pad,
+                pad + dx,
+                pad,
+                cv2.BORDER_REFLECT_101,
+            )
+            coarse = match_scores(pyramid_down(canvas, level)[level], small, small_mask)
+            cx, cy = (pad + dx) // scale, (pad + dy) // scale
+            near = coarse[max(0, cy - 1) : cy + 2, max(0, cx - 1) : cx + 2]
+            worst = min(worst, float(near.max()) if near.size else 0.0)
+    return worst
+
+
+def _sample_coarse_scores(tmpl, level, samples):
+    """샘플 캡처에서 원본 해상도로 찾은 위치들의 축소 단계 점수."""
+    scale = 1 << level
+    small, small_mask = tmpl.template_at(level)
+    found = []
+    for sample in samples:
+        if sample.shape[0] < tmpl.h or sample.shape[1] < tmpl.w:
+            continue
+        res = match_scores(sample, tmpl.image, tmpl.mask)
+        xs, ys, _ = local_peaks(res, tmpl.threshold, REFINE_TOP_K)
+        if xs.size == 0:
+            continue
+        coarse = match_scores(pyramid_down(sample, level)[level], small, small_mask)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            cx, cy = x // scale, y // scale
+            near = coarse[max(0, cy - 1) : cy + 2, max(0, cx - 1) : cx + 2]
+            if near.size:
+                found.append(float(near.max()))
+    return found
+
+
+def calibrate(tmpl, samples=()):
+    """
+    tmpl 의 축소 단계(level)와 축소 단계 임계값(coarse_threshold)을 정한다.
+    - 템플릿 자신을 축소 단계에서도 충분히 잘 찾는 가장 깊은 단계를 고른다.
+    - 원본 해상도에서 threshold 를 넘는 위치가 축소 단계에서 후보로 남도록
+      임계값을 (자기 자신 / 샘플 캡처에서 실제로 나온 점수 - 여유)로 낮춘다.
+    그래서 결과는 원본 해상도 전체 매칭과 같은 판정을 목표로 한다.
+    """
+    tmpl.level = 0
+    tmpl.coarse_threshold = tmpl.threshold
+    for level in range(tmpl.max_usable_level(), 0, -1):
+        self_score = _self_coarse_score(tmpl, level)
+        if self_score < CALIBRATION_MIN_SELF_SCORE:
+            continue
+        # 자기 자신(점수 1.0)에서 떨어진 만큼, threshold 근처 매칭도 떨어진다고 가정
+        coarse_thr = self_score - (1.0 - tmpl.threshold)
+        found = _sample_coarse_scores(tmpl, level, samples)
+        if found:
+            coarse_thr = min(coarse_thr, min(found))
+        tmpl.level = level
+        tmpl.coarse_threshold = max(0.0, coarse_thr - CALIBRATION_SAFETY)
+        break
+    return tmpl
+
+
+def sample_files(sample_dir, limit=CALIBRATION_MAX_SAMPLES):
+    """보정에 쓸 샘플 캡처 파일 경로 (이름순, 최대 limit 개). 폴더가 없으면 빈 리스트."""
+    if not sample_dir or not os.path.isdir(sample_dir):
+        return []
+    files = [
+        os.path.join(sample_dir, f)
+        for f in sorted(os.listdir(sample_dir))
+        if f.lower().endswith((".png", ".jpg", ".jpeg"))
+    ]
+    return files[:limit]
+
+
+def load_samples(sample_dir, gray=False, limit=CALIBRATION_MAX_SAMPLES):
+    """보정용 샘플 캡처 로드 (폴더가 없으면 빈 리스트)."""
+    flag = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
+    samples = []
+    for path in sample_files(sample_dir, limit):
+        img = cv2.imread(path, flag)
+        if img is not None:
+            samples.append(img)
+    return samples
+
+
+# ======================================================================
+# 5. 시간 축 ROI 추적 (직전 위치 주변만 검색)
+# ======================================================================
+# 한 프레임 사이 캐릭터가 움직일 수 있는 최대 거리 (px, 원본 해상도)
+TRACK_SEARCH_RADIUS = 48
+
+# 이 프레임 수마다 한 번은 전체 영역을 다시 검색 (오인식 고착 방지)
+TRACK_REACQUIRE_FRAMES = 30
+
+
+class RoiTracker:
+    """
+    find_fn(image) -> (cx, cy) 또는 None 을 감싸서,
+    직전 위치(+ 직전 이동량으로 예측한 위치) 주변 창에서만 검색한다.
+    창에서 놓쳤거나 reacquire_every 프레임이 지나면 전체 영역을 검색한다.
+
+    검색(search)과 상태 반영(commit)이 나뉘어 있어서, 검색은 감지 스레드 풀에서 돌리고
+    상태는 결과를 모으는 쪽 한 스레드에서만 바꿀 수 있다. update() 는 둘을 이어 부른 것.
+    상태는 튜플 하나로 통째로 바꿔 끼우므로 search 는 항상 한 시점의 상태를 본다.
+    """
+
+    def __init__(
+        self,
+        find_fn,
+        template_size,
+        radius=TRACK_SEARCH_RADIUS,
+        reacquire_every=TRACK_REACQUIRE_FRAMES,
+    ):
+        self.find_fn = find_fn
+        self.template_h, self.template_w = template_size
+        self.radius = radius
+        self.reacquire_every = reacquire_every
+        self.reset()
+
+    def reset(self):
+        # (마지막으로 찾은 중심 (cx, cy), 직전 이동량, 전체 검색 후 지난 프레임 수)
+        self._state = (None, (0, 0), 0)
+        self.full_searches = 0
+        self.window_searches = 0
+
+    @property
+    def last(self):
+        return self._state[0]
+
+    def _window(self, image, last, velocity):
+        """예측 위치 주변 창에서 검색. 창 좌표를 전체 좌표로 돌려서 반환."""
+        img = image.image if isinstance(image, ImagePyramid) else image
+        img_h, img_w = img.shape[:2]
+        px = last[0] + velocity[0]
+        py = last[1] + velocity[1]
+        half_w = self.template_w // 2 + self.radius
+        half_h = self.template_h // 2 + self.radius
+        x0 = max(0, int(px) - half_w)
+        y0 = max(0, int(py) - half_h)
+        x1 = min(img_w, int(px) + half_w + 1)
+        y1 = min(img_h, int(py) + half_h + 1)
+        if x1 - x0 < self.template_w or y1 - y0 < self.template_h:
+            return None
+
+        found = self.find_fn(img[y0:y1, x0:x1])
+        if found is None:
+            return None
+        return (found[0] + x0, found[1] + y0)
+
+    def search(self, image):
+        """
+        이번 프레임의 (중심 좌표 또는 None, 전체 검색 여부). 상태는 바꾸지 않는다.
+        """
+        last, velocity, frames_since_full = self._state
+        if last is not None and frames_since_full < self.reacquire_every:
+            found = self._window(image, last, velocity)
+            if found is not None:
+                return found, False
+        return self.find_fn(image), True
+
+    def commit(self, found, full):
+        """search 결과를 상태에 반영 (못 찾았으면 다음 프레임은 전체 검색)."""
+        last, _, frames_since_full = self._state
+        if full:
+            self.full_searches += 1
+            frames_since_full = 0
+        else:
+            self.window_searches += 1
+            frames_since_full += 1
+
+        if found is None:
+            self._state = (None, (0, 0), frames_since_full)
+            return
+        velocity = (found[0] - last[0], found[1] - last[1]) if last else (0, 0)
+        self._state = (found, velocity, frames_since_full)
+
+    def update(self, image):
+        """이번 프레임의 중심 좌표 (못 찾으면 None, 다음 프레임은 전체 검색)."""
+        found, full = self.search(image)
+        self.commit(found, full)
+        return found
+
+
+# ======================================================================
+# 6. 변화 없는 영역의 매칭 결과 재사용 (dirty 타일만 다시 매칭)
+# ======================================================================
+class TileMatchCache:
+    """
+    템플릿별 직전 프레임 매칭 결과를 들고 있다가, 바뀐(dirty) 영역만 다시 매칭해 합친다.
+    changes 는 pipeline.TileChangeDetector.update() 결과 (TileChanges).
+
+    - find_all: 상자가 변화 없는 타일 안에만 있는 히트는 그대로 두고,
+                dirty 타일에 걸치는 위치만 dirty 영역을 다시 매칭해서 채운다.
+    - best    : 직전 최고 위치가 변화 없는 타일 안이면 dirty 영역의 최고점과만 비교한다.
+    changes.all 이면 (또는 직전 결과가 없으면) 전체를 매칭한다.
+
+    감지기들이 여러 스레드에서 동시에 불러도 된다. 각 호출은 시작할 때의
+    (프레임 번호, changes) 를 한 번만 읽어서 끝까지 그 프레임 기준으로 계산한다.
+    """
+
+    def __init__(self, matcher: PyramidMatcher):
+        self.matcher = matcher
+        self._state = (0, None)  # (프레임 번호, changes) — 한 번에 바꿔 끼운다
+        self._hits = {}  # 키 → (프레임 번호, 결과)
+        self._best = {}
+
+    @property
+    def changes(self):
+        return self._state[1]
+
+    def reset(self):
+        self._state = (self._state[0], None)
+        self._hits.clear()
+        self._best.clear()
+
+    def begin(self, changes):
+        """새 프레임 시작. 전체를 다시 봐야 하면 이전 결과를 버린다."""
+        self._state = (self._state[0] + 1, changes)
+        if changes is None or changes.all:
+            self._hits.clear()
+            self._best.clear()
+
+    @staticmethod
+    def _previous(store, key, frame_no):
+        """
+        바로 직전 프레임에서 계산한 결과만 재사용한다.
+        (한 프레임이라도 건너뛴 템플릿은 그 사이 바뀐 타일을 못 봤으므로 다시 계산)
+        """
+        entry = store.get(key)
+        if entry is None or entry[0] != frame_no - 1:
+            return None
+        return entry[1]
+
+    @property
+    def full(self):
+        changes = self._state[1]
+        return changes is None or changes.all
+
+    def prepare(self, image, templates):
+        """전체를 다시 매칭하는 프레임에서만 점수 맵을 일괄 계산 (부분 갱신이면 생략)."""
+        if self.full:
+            self.matcher.prepare(image, templates)
+
+    @staticmethod
+    def _dirty_parts(changes, pyramid, tmpl):
+        """dirty 영역마다 (x0, y0, 잘라낸 이미지). 시작 좌표는 피라미드 격자에 맞춘다."""
+        image = pyramid.image
+        for x0, y0, x1, y1 in changes.dirty_rects(
+            tmpl.w, tmpl.h, align=1 << PYRAMID_MAX_LEVEL
+        ):
+            if x1 - x0 >= tmpl.w and y1 - y0 >= tmpl.h:
+                yield x0, y0, image[y0:y1, x0:x1]
+
+    def find_all(self, image, tmpl, threshold=None, peaks_only=False):
+        """PyramidMatcher.find_all 과 같은 반환값 (xs, ys, scores)."""
+        frame_no, changes = self._state
+        pyramid = as_pyramid(image)
+        key = (id(tmpl), threshold, peaks_only)
+        prev = self._previous(self._hits, key, frame_no)
+        if changes is None or changes.all or prev is None:
+            hits = self.matcher.find_all(pyramid, tmpl, threshold, peaks_only)
+            self._hits[key] = (frame_no, hits)
+            return hits
+        if not changes.any:
+            self._hits[key] = (frame_no, prev)
+            return prev
+
+        xs, ys, scores = prev
+        keep = changes.boxes_clean(xs, ys, tmpl.w, tmpl.h)
+        parts = [(xs[keep], ys[keep], scores[keep])]
+        for x0, y0, sub in self._dirty_parts(changes, pyramid, tmpl):
+            sx, sy, ss = self.matcher.find_all(sub, tmpl, threshold, peaks_only)
+            sx, sy = sx + x0, sy + y0
+            # 변화 없는 타일 안의 위치는 위에서 이미 남겼으므로 dirty 에 걸친 것만
+            new = ~changes.boxes_clean(sx, sy, tmpl.w, tmpl.h)
+            parts.append((sx[new], sy[new], ss[new]))
+
+        xs = np.concatenate([p[0] for p in parts])
+        ys = np.concatenate([p[1] for p in parts])
+        scores = np.concatenate([p[2] for p in parts])
+        # dirty 영역이 넓혀지면서 겹친 곳에서 같은 위치가 두 번 나오면 한 번만 센다
+        _, first = np.unique(ys * pyramid.image.shape[1] + xs, return_index=True)
+        hits = (xs[first], ys[first], scores[first])
+        self._hits[key] = (frame_no, hits)
+        return hits
+
+    def best(self, image, tmpl):
+        """PyramidMatcher.best 와 같은 반환값 (score, (x, y))."""
+        frame_no, changes = self._state
+        pyramid = as_pyramid(image)
+        prev = self._previous(self._best, id(tmpl), frame_no)
+        if changes is not None and not changes.all and prev is not None:
+            if not changes.any:
+                self._best[id(tmpl)] = (frame_no, prev)
+                return prev
+            score, loc = prev
+            if (
+                loc is None
+                or changes.boxes_clean([loc[0]], [loc[1]], tmpl.w, tmpl.h)[0]
+            ):
+                # 직전 최고점이 그대로 남아 있으니 dirty 영역에서 더 높은 점수만 찾으면 된다
+                best = (score, loc) if loc is not None else (-1.0, None)
+                for x0, y0, sub in self._dirty_parts(changes, pyramid, tmpl):
+                    sub_score, sub_loc = self.matcher.best(sub, tmpl)
+                    if sub_loc is not None and sub_score > best[0]:
+                        best = (sub_score, (x0 + sub_loc[0], y0 + sub_loc[1]))
+                self._best[id(tmpl)] = (frame_no, best)
+                return best
+
+        best = self.matcher.best(pyramid, tmpl)
+        self._best[id(tmpl)] = (frame_no, best)
+        return best
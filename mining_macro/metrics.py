@@ -0,0 +1,170 @@
+# metrics.py (감지 파이프라인 단계별 소요 시간 통계)
+
+import csv
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import cv2
+
+# 단계마다 최근 이 개수의 샘플로 백분위를 낸다 (None 이면 전부 보관)
+LATENCY_WINDOW = 600
+
+# 종료 시 덤프할 개별 측정 기록의 최대 개수 (넘으면 오래된 것부터 버림)
+TRACE_MAX = 200_000
+
+# 오버레이 글자를 다시 계산하는 간격 (초)
+OVERLAY_INTERVAL = 0.5
+
+
+class LatencyStats:
+    """
+    단계 이름별 소요 시간(초) 샘플을 모아 백분위로 요약한다.
+    캡처 / 감지 / 제어 스레드가 동시에 add() 해도 된다.
+
+    - window    : 단계마다 최근 샘플만 유지 (롤링 히스토그램)
+    - trace_max : 0 보다 크면 (시각, 단계, 소요 시간) 기록을 따로 남겨 dump() 로 저장
+    """
+
+    def __init__(self, window=LATENCY_WINDOW, trace_max=0):
+        self.window = window
+        self.trace_max = trace_max
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}  # 단계 → deque[초, ...]
+            self.trace = deque(maxlen=self.trace_max) if self.trace_max else None
+            self._t0 = time.perf_counter()
+
+    def add(self, stage: str, seconds: float, start=None):
+        """start 는 측정을 시작한 perf_counter 시각 (trace 용, 없으면 지금 - seconds)."""
+        with self._lock:
+            values = self.samples.get(stage)
+            if values is None:
+                values = self.samples[stage] = deque(maxlen=self.window)
+            values.append(seconds)
+            if self.trace is not None:
+                t = time.perf_counter() - seconds if start is None else start
+                self.trace.append((t - self._t0, stage, seconds))
+
+    @contextmanager
+    def measure(self, stage: str):
+        """with stats.measure("decision"): ... 블록의 소요 시간을 기록."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t0, t0)
+
+    def stages(self):
+        with self._lock:
+            return list(self.samples)
+
+    def summary(self, stage: str) -> dict:
+        """단위: ms"""
+        with self._lock:
+            ordered = sorted(self.samples.get(stage, ()))
+        n = len(ordered)
+        if n == 0:
+            return {
+                "count": 0,
+                "mean": 0.0,
+                "p50": 0.0,
+                "p95": 0.0,
+                "p99": 0.0,
+                "max": 0.0,
+            }
+        return {
+            "count": n,
+            "mean": sum(ordered) / n * 1e3,
+            "p50": ordered[(n - 1) // 2] * 1e3,
+            "p95": ordered[min(n - 1, int(n * 0.95))] * 1e3,
+            "p99": ordered[min(n - 1, int(n * 0.99))] * 1e3,
+            "max": ordered[-1] * 1e3,
+        }
+
+    def format(self) -> str:
+        lines = []
+        for stage in self.stages():
+            st = self.summary(stage)
+            lines.append(
+                f"{stage:10s} 평균 {st['mean']:8.2f}ms  p50 {st['p50']:8.2f}ms  "
+                f"p95 {st['p95']:8.2f}ms  p99 {st['p99']:8.2f}ms  "
+                f"최대 {st['max']:8.2f}ms  ({st['count']}회)"
+            )
+        return "\n".join(lines)
+
+    def dump(self, path: str):
+        """
+        .json 이면 단계별 요약 + 기록, 그 외(.csv)는 기록을 한 줄씩 (t_s, stage, ms).
+        기록(trace_max)이 꺼져 있으면 CSV 에는 단계별 요약을 쓴다.
+        """
+        with self._lock:
+            trace = list(self.trace) if self.trace is not None else None
+        if path.lower().endswith(".json"):
+            data = {
+                "window": self.window,
+                "summary": {stage: self.summary(stage) for stage in self.stages()},
+                "trace": [
+                    {"t": round(t, 6), "stage": stage, "ms": round(s * 1e3, 4)}
+                    for t, stage, s in trace or ()
+                ],
+            }
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            return
+
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if trace is not None:
+                writer.writerow(["t_s", "stage", "ms"])
+                for t, stage, s in trace:
+                    writer.writerow([f"{t:.6f}", stage, f"{s * 1e3:.4f}"])
+                return
+            keys = ("mean", "p50", "p95", "p99", "max")
+            writer.writerow(["stage", "count", *keys])
+            for stage in self.stages():
+                st = self.summary(stage)
+                writer.writerow([stage, st["count"], *(f"{st[k]:.4f}" for k in keys)])
+
+
+class LatencyOverlay:
+    """LatencyStats 요약(p50/p95/p99)을 영상 왼쪽 위에 그린다. 글자는 interval 초마다 갱신."""
+
+    def __init__(self, stats: LatencyStats, interval=OVERLAY_INTERVAL):
+        self.stats = stats
+        self.interval = interval
+        self._lines = []
+        self._next = 0.0
+
+    def lines(self):
+        now = time.perf_counter()
+        if now >= self._next:
+            self._next = now + self.interval
+            self._lines = []
+            for stage in self.stats.stages():
+                st = self.stats.summary(stage)
+                self._lines.append(
+                    f"{stage} {st['p50']:.1f}/{st['p95']:.1f}/{st['p99']:.1f}ms"
+                )
+        return self._lines
+
+    def draw(self, image):
+        y = 14
+        for line in self.lines():
+            # 검은 테두리 + 흰 글씨 (배경 색과 상관없이 읽히도록)
+            for color, thickness in (((0, 0, 0), 3), ((255, 255, 255), 1)):
+                cv2.putText(
+                    image,
+                    line,
+                    (4, y),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.4,
+                    color,
+                    thickness,
+                )
+            y += 14
@@ -5,6 +5,9 @@ import mss
 import numpy as np
 import keyboard
 
+from matching import local_peaks, nms_boxes
+from template_bank import TemplateBank
+
 # ──────────────────────
 # 1. 캡처할 화면 영역 설정
 # ──────────────────────
@@ -20,21 +23,13 @@ MONITOR = {
 # ──────────────────────
 TEMPLATE_DIR = "./templates"
 
+# 회색조 / 피라미드 / 평균·분산은 bank 가 한 번만 만들고 ./template_cache 에 캐시
+template_bank = TemplateBank()
+
 
 def load_templates(dir_path):
-    """dir_path 아래 png 전부 grayscale 로딩"""
-    res = []
-    if not os.path.isdir(dir_path):
-        return res
-    for f in os.listdir(dir_path):
-        if not f.lower().endswith((".png", ".jpg", ".jpeg")):
-            continue
-        path = os.path.join(dir_path, f)
-        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
-            continue
-        res.append(img)
-    return res
+    """dir_path 아래 png 전부 grayscale 로딩 (MatchTemplate 리스트)"""
+    return template_bank.load_dir(dir_path, gray=True)
 
 
 TEMPLATES = {
@@ -54,17 +49,17 @@ TEMPLATES = {
 def best_match(gray_roi, tmpl_list, threshold=0.7):
     """
     gray_roi: 검색 영역 (gray)
-    tmpl_list: 여러 템플릿 이미지
+    tmpl_list: 여러 템플릿 (MatchTemplate)
     return: (cx, cy, w, h, score) 또는 None, score
     """
     best = None
     best_score = 0.0
 
     for tmpl in tmpl_list:
-        th, tw = tmpl.shape[:2]
+        th, tw = tmpl.h, tmpl.w
         if gray_roi.shape[0] < th or gray_roi.shape[1] < tw:
             continue
-        res = cv2.matchTemplate(gray_roi, tmpl, cv2.TM_CCOEFF_NORMED)
+        res = cv2.matchTemplate(gray_roi, tmpl.gray, cv2.TM_CCOEFF_NORMED)
         min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
         if max_val > best_score:
             best_score = max_val
@@ -83,7 +78,7 @@ def best_match(gray_roi, tmpl_list, threshold=0.7):
 def detect_world(frame_bgr):
     """
     frame_bgr: MONITOR 영역 캡처(BGR)
-    return: dict(player=(cx,cy), target=(cx,cy)), 화살표 시퀀스 list
+    return: dict(player=(cx,cy), target=(cx,cy)), 화살표 시퀀스 [(방향, cx, score), ...]
     """
     h, w, _ = frame_bgr.shape
     gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
@@ -132,66 +127,62 @@ def detect_world(frame_bgr):
     return result, arrows
 
 
-def detect_arrows_in_band(gray_roi):
+# 화살표 판정 임계값 / 한 번에 나오는 최대 화살표 수
+ARROW_THRESHOLD = 0.7
+ARROW_MAX_COUNT = 4
+
+ARROW_DIRS = {
+    "arrow_up": "up",
+    "arrow_down": "down",
+    "arrow_left": "left",
+    "arrow_right": "right",
+}
+
+
+def detect_arrows_in_band(
+    gray_roi, threshold=ARROW_THRESHOLD, max_count=ARROW_MAX_COUNT
+):
     """
     gray_roi: 화면 상단 띠 (gray)
-    return: ["left", "up", "right", "down"] 이런 리스트 (최대 4개)
+    return: [("left", cx, score), ("up", cx, score), ...] x 기준 정렬 (최대 max_count 개)
+
+    네 방향 템플릿을 한 번씩만 매칭하고, 점수 맵에서 극대점만 후보로 뽑은 뒤
+    방향에 상관없이 겹치는 후보는 NMS 로 하나만 남긴다 (화살표 1개 = 결과 1개).
     """
     h, w = gray_roi.shape[:2]
-    all_hits = []  # (x_center, dir, score)
+    xs, ys, ws, hs, scores, dirs = [], [], [], [], [], []
 
-    def collect_hits(dir_name, tmpl_list):
-        hits = []
-        for tmpl in tmpl_list:
-            th, tw = tmpl.shape[:2]
+    for key, dir_name in ARROW_DIRS.items():
+        for tmpl in TEMPLATES[key]:
+            th, tw = tmpl.h, tmpl.w
             if h < th or w < tw:
                 continue
-            res = cv2.matchTemplate(gray_roi, tmpl, cv2.TM_CCOEFF_NORMED)
-            loc = np.where(res >= 0.7)  # threshold는 나중에 튜닝
-            for pt in zip(*loc[::-1]):  # (x, y)
-                x, y = pt
-                score = res[y, x]
-                cx = x + tw / 2
-                hits.append((cx, dir_name, score))
-        return hits
-
-    for dir_name in ["arrow_up", "arrow_down", "arrow_left", "arrow_right"]:
-        hits = collect_hits(dir_name.replace("arrow_", ""), TEMPLATES[dir_name])
-        # collect_hits 안에서 dir_name을 "up"/"down" 등으로 넘기게 수정
-        # 위에서 replace("arrow_", "") 쓴 이유가 그거임
-        # 여기선 헷갈리니까 그냥 이름만 맞춰주자
-        # (아래에서 문자열로 쓰기만 할 거라 큰 상관은 없음)
-        # 하지만 위 collect_hits 호출을 다시 정리하자.
-
-    # 위 for문을 다시 정확히 작성:
-    all_hits = []
-    dir_map = {
-        "arrow_up": "up",
-        "arrow_down": "down",
-        "arrow_left": "left",
-        "arrow_right": "right",
-    }
-    for key, dir_name in dir_map.items():
-        tmpl_list = TEMPLATES[key]
-        for tmpl in tmpl_list:
-            th, tw = tmpl.shape[:2]
-            if h < th or w < tw:
-                continue
-            res = cv2.matchTemplate(gray_roi, tmpl, cv2.TM_CCOEFF_NORMED)
-            loc = np.where(res >= 0.7)
-            for pt in zip(*loc[::-1]):  # (x, y)
-                x, y = pt
-                score = res[y, x]
-                cx = x + tw / 2
-                all_hits.append((cx, dir_name, score))
-
-    if not all_hits:
+            res = cv2.matchTemplate(gray_roi, tmpl.gray, cv2.TM_CCOEFF_NORMED)
+            px, py, ps = local_peaks(res, threshold, res.size, (tw, th))
+            xs.append(px)
+            ys.append(py)
+            ws.append(np.full(px.size, tw))
+            hs.append(np.full(px.size, th))
+            scores.append(ps)
+            dirs.extend([dir_name] * px.size)
+
+    if not dirs:
         return []
 
-    # x 기준 정렬 후, 앞에서 최대 4개까지만 사용
-    all_hits.sort(key=lambda x: x[0])
-    seq = [d for (x, d, s) in all_hits[:4]]
-    return seq
+    xs = np.concatenate(xs)
+    ys = np.concatenate(ys)
+    ws = np.concatenate(ws)
+    hs = np.concatenate(hs)
+    scores = np.concatenate(scores)
+
+    # 방향이 달라도 같은 자리면 같은 화살표 → 점수 높은 방향만 남김
+    keep = nms_boxes(xs, ys, scores, ws, hs)[:max_count]
+    centers = xs[keep] + ws[keep] / 2
+    keep = keep[np.argsort(centers, kind="stable")]
+
+    return [
+        (dirs[i], float(xs[i] + ws[i] / 2), float(scores[i])) for i in keep.tolist()
+    ]
 
 
 # ──────────────────────
@@ -200,7 +191,7 @@ def detect_arrows_in_band(gray_roi):
 def control_player(world, arrows, state):
     """
     world: {"player": (x,y), "target": (x,y), "rope": (x,y) }
-    arrows: ["left","up",...]  (화살표 모드일 때만 유효)
+    arrows: [("left", cx, score), ...]  (화살표 모드일 때만 유효)
     state: dict 로 모드 관리 (normal/arrow)
     """
 
@@ -237,8 +228,8 @@ def control_player(world, arrows, state):
         if not arrows or state.get("arrow_handled", False):
             return
 
-        # 감지된 시퀀스대로 키 입력
-        for d in arrows:
+        # 감지된 시퀀스대로 키 입력 (왼쪽 화살표부터)
+        for d, _, _ in arrows:
             if d == "left":
                 keyboard.press_and_release("left")
             elif d == "right":
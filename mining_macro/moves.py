@@ -0,0 +1,179 @@
+# moves.py (복합 동작 JSON → 컴파일된 EventPlan 캐시)
+
+import os
+import sys
+import json
+import time
+import random
+from collections import namedtuple
+
+# control_macro 의 공용 재생 엔진(EventPlan)을 같이 사용
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "control_macro")
+)
+from playback import EventPlan
+
+# 녹화된 복합 동작(점프 / 더블 점프 / 하강) JSON 폴더
+MOVE_DIR = "./move"
+
+# 같은 파일의 mtime 을 다시 확인하는 최소 간격 (초). 그 사이에는 stat 도 하지 않는다
+MOVE_RELOAD_CHECK_INTERVAL = 1.0
+
+
+class MovePlans:
+    """
+    복합 동작 JSON 을 한 번만 읽어서 EventPlan 으로 컴파일해 두는 캐시.
+
+    - load_all() : root 아래 *.json 전부를 미리 컴파일 (시작할 때 1회)
+    - get(path)  : 캐시된 plan 을 반환. 파일 mtime 이 바뀌었을 때만 다시 읽는다.
+      (mtime 확인도 파일마다 check_interval 초에 한 번만)
+    - plan 객체를 계속 재사용하므로 프로토콜별 전송 바이트(wire_for)도 한 번만 인코딩된다.
+    파일이 없거나 읽지 못하면 None (다시 읽다가 실패하면 이전 plan 을 유지).
+    """
+
+    def __init__(
+        self, root=MOVE_DIR, key_map=None, check_interval=MOVE_RELOAD_CHECK_INTERVAL
+    ):
+        self.root = root
+        self.key_map = key_map
+        self.check_interval = check_interval
+        self.reloads = 0  # 시작 후 mtime 변경으로 다시 컴파일한 횟수
+        self._entries = {}  # 정규화된 경로 → [plan, mtime_ns, 다음 확인 시각]
+
+    def _compile(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # 첫 이벤트 시각을 0으로 맞춘다 (녹화 시작 후 첫 입력까지의 공백 제거)
+        return EventPlan.compile(
+            data.get("events", []), key_map=self.key_map, rebase=True
+        )
+
+    def _refresh(self, path, entry):
+        """path 의 mtime 이 entry 와 다르면 다시 컴파일. 반환: 최신 entry (없으면 None)."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        if entry is not None and entry[1] == mtime:
+            return entry
+        try:
+            plan = self._compile(path)
+        except Exception as e:
+            print(f"❌ 복합 동작 파일 로드 중 오류 발생: {path} ({e})")
+            # 이전 plan 을 유지하고, 파일이 다시 바뀔 때까지는 재시도하지 않는다
+            return [entry[0], mtime, 0.0] if entry is not None else None
+        if entry is not None:
+            self.reloads += 1
+            print(f"🔁 복합 동작 다시 로드: {path}")
+        return [plan, mtime, 0.0]
+
+    def get(self, path):
+        key = os.path.normpath(path)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or now >= entry[2]:
+            entry = self._refresh(key, entry)
+            if entry is None:
+                self._entries.pop(key, None)
+                return None
+            entry[2] = now + self.check_interval
+            self._entries[key] = entry
+        return entry[0]
+
+    def load_all(self):
+        """root 아래 복합 동작 JSON 을 전부 컴파일. 반환: 로드한 파일 수."""
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for f in sorted(filenames):
+                if f.lower().endswith(".json"):
+                    if self.get(os.path.join(dirpath, f)) is not None:
+                        count += 1
+        return count
+
+    def paths(self):
+        return list(self._entries)
+
+
+# 동작 1개의 요약. name 은 move/ 기준 상대 경로에서 확장자를 뺀 것 ("double/left/doubleLeft_1")
+# category / direction 은 폴더 이름 ("double" / "left"), 방향 폴더가 없으면 direction=None
+# duration 은 첫 입력부터 마지막 입력까지 (초), keys 는 누르는 키 이름 frozenset
+MoveAction = namedtuple("MoveAction", "name category direction path duration keys")
+
+
+class MoveLibrary:
+    """
+    move/ 아래 녹화된 복합 동작 전체의 색인.
+
+    - scan() : MovePlans 로 전부 컴파일하고 동작마다 길이 / 키 목록을 미리 계산
+    - actions(category, direction) : 해당 동작 튜플 (dict 조회 1회, direction=None 이면 전 방향)
+    - fastest(...) / choose(...) : 가장 짧은 동작 / 무작위 동작 (녹화본을 골고루 쓰기 위함)
+    - plan(action) : 재생용 EventPlan (파일이 바뀌었으면 MovePlans 가 다시 읽음)
+    파일이 다시 로드되면 다음 조회 때 색인도 다시 만든다.
+    """
+
+    def __init__(self, plans: MovePlans):
+        self.plans = plans
+        self._index = {}  # (category, direction) → (MoveAction, ...) 짧은 순
+        self._leaves = []
+        self._indexed_reloads = -1
+
+    def scan(self):
+        """root 아래 동작을 전부 읽어 색인. 반환: 동작 수."""
+        self.plans.load_all()
+        return self._build()
+
+    def _build(self):
+        groups = {}
+        leaves = set()
+        root = os.path.normpath(self.plans.root)
+        count = 0
+        for path in self.plans.paths():
+            plan = self.plans.get(path)
+            if plan is None or len(plan) == 0:
+                continue
+            rel = os.path.relpath(path, root)
+            if rel.startswith(".."):
+                continue  # root 밖의 파일 (직접 경로로 get 한 것)
+            name = os.path.splitext(rel)[0].replace(os.sep, "/")
+            parts = name.split("/")
+            category = parts[0]
+            direction = parts[1] if len(parts) > 2 else None
+            action = MoveAction(
+                name, category, direction, path, plan.duration, frozenset(plan.keys)
+            )
+            groups.setdefault((category, direction), []).append(action)
+            leaves.add((category, direction))
+            if direction is not None:
+                groups.setdefault((category, None), []).append(action)
+            count += 1
+
+        self._index = {
+            key: tuple(sorted(group, key=lambda a: (a.duration, a.name)))
+            for key, group in groups.items()
+        }
+        self._leaves = sorted(leaves, key=lambda k: (k[0], k[1] or ""))
+        self._indexed_reloads = self.plans.reloads
+        return count
+
+    def actions(self, category, direction=None):
+        if self._indexed_reloads != self.plans.reloads:
+            self._build()
+        return self._index.get((category, direction), ())
+
+    def categories(self):
+        """파일이 있는 [(category, direction), ...] (방향 폴더가 없으면 direction=None)"""
+        if self._indexed_reloads != self.plans.reloads:
+            self._build()
+        return list(self._leaves)
+
+    def fastest(self, category, direction=None):
+        found = self.actions(category, direction)
+        return found[0] if found else None
+
+    def choose(self, category, direction=None, rng=random):
+        found = self.actions(category, direction)
+        return rng.choice(found) if found else None
+
+    def plan(self, action: MoveAction):
+        return self.plans.get(action.path)
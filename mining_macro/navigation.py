@@ -0,0 +1,365 @@
+# navigation.py (층 / 밧줄 / 끝자락 이동 그래프 + 최단 시간 경로 계획)
+#
+# 좌표는 모두 선택 영역 px 기준, y 는 아래로 갈수록 커진다 (층의 y = 발판 윗면).
+
+import heapq
+from collections import namedtuple
+
+# 이동 속도 추정값 (선택 영역 px 기준). 실제 게임 속도에 맞게 조정
+WALK_SPEED = 220.0  # 걷기 (px/초)
+CLIMB_SPEED = 120.0  # 밧줄 오르내리기 (px/초)
+FALL_SPEED = 600.0  # 떨어지기 (px/초)
+
+# Alt 더블 탭 1회로 이동하는 수평 거리 (px). 남은 거리가 이보다 짧으면 걷는다
+DOUBLE_JUMP_DISTANCE = 200.0
+
+# 점프(move/jump)로 오를 수 있는 최대 높이 (px)
+JUMP_HEIGHT = 230.0
+
+# 발 y 가 층 y 에서 이만큼(px) 이내면 그 층 위에 있는 것으로 본다
+LAYER_SNAP = 40
+
+# 목표 x 에 이만큼(px) 이내면 도착한 것으로 본다
+ARRIVE_DISTANCE = 20
+
+# 발판 끝에서 이만큼(px) 더 걸어 나가면 떨어진다
+LEDGE_STEP = 10
+
+# 감지된 지형 / 밧줄 상자 좌표를 이 단위(px)로 반올림 (프레임마다 그래프를 다시 만들지 않도록)
+NAV_QUANTUM = 8
+
+# 새로 감지된 밧줄이 기억한 밧줄과 x 가 이만큼(px), 위쪽 끝이 LAYER_SNAP 이내면 같은 밧줄로 본다
+# (반올림 경계에 걸려 한 칸씩 흔들리는 감지가 밧줄을 하나 더 만들지 않도록)
+ROPE_MERGE_X = 2 * NAV_QUANTUM
+
+# 밧줄 감지를 이만큼 연달아 돌리는 동안 한 번도 안 보인 밧줄은 잊는다
+# (캐릭터에 잠깐 가려진 밧줄은 남기고, 오감지 / 사라진 밧줄은 정리)
+ROPE_FORGET = 30
+
+
+# 발판 1개: 윗면 y, 좌우 끝 x
+# ledges=False 면 끝 위치를 모르는 발판 (TERRAIN_LAYERS 로 만든 전체 폭 층) → 끝에서 떨어지기 없음
+Platform = namedtuple("Platform", "y x0 x1 ledges", defaults=(True,))
+
+# 밧줄 1개: x, 위쪽 끝 y, 아래쪽 끝 y
+Rope = namedtuple("Rope", "x top bottom")
+
+# 경로의 한 단계
+#   kind      : "walk" / "double" / "jump" / "down" / "climb" / "grab" / "drop"
+#               (grab = 점프로 공중에 매달린 밧줄 끝을 잡고 위로 오르기)
+#   direction : "left" / "right" (walk, double, drop), "up" / "down" (climb, grab), 그 외 None
+#   x, y      : 이 단계가 끝나는 위치
+#   cost      : 예상 소요 시간 (초)
+NavStep = namedtuple("NavStep", "kind direction x y cost")
+
+
+class NavGraph:
+    """
+    발판 / 밧줄로 만든 이동 그래프. plan() 은 다익스트라로 예상 시간이 가장 짧은 경로를 찾는다.
+
+    노드는 (발판, x). x 는 출발 / 목표 / 밧줄 / 발판 끝 / 끝에서 떨어지는 지점만 쓴다.
+    - 같은 발판 안: 걷기, 또는 Alt 더블 탭(move/double) + 나머지 걷기 중 빠른 쪽
+    - 위 발판: 점프(move/jump), 밧줄 오르기 (밧줄 끝이 발판에서 떠 있으면 점프로 잡고 오르기)
+    - 아래 발판: 아래 점프(move/down), 바닥까지 닿는 밧줄 내려가기, 발판 끝에서 걸어 나가 떨어지기
+      (끝에서 떨어지기는 끝 위치를 아는 발판(ledges=True)에서만)
+    동작 시간은 MoveLibrary 에서 가장 짧은 녹화본 길이를 쓰고, 녹화본이 없는 동작은 쓰지 않는다.
+    """
+
+    def __init__(self, platforms, ropes=(), move_library=None):
+        # 위(작은 y)에서 아래 순서
+        self.platforms = sorted(platforms, key=lambda p: (p.y, p.x0))
+        self.ropes = list(ropes)
+        self.cost = {}  # (category, direction) → 가장 짧은 녹화본 길이 (초)
+        if move_library is not None:
+            for key in (
+                ("jump", None),
+                ("down", None),
+                ("double", "left"),
+                ("double", "right"),
+            ):
+                action = move_library.fastest(*key)
+                if action is not None:
+                    self.cost[key] = action.duration
+
+    # ───────── 위치 ─────────
+    def locate(self, x, y):
+        """발 위치 (x, y) 가 서 있는 발판 번호. 공중 / 밧줄 위면 None."""
+        best, best_dy = None, LAYER_SNAP + 1
+        for i, p in enumerate(self.platforms):
+            dy = abs(y - p.y)
+            if dy < best_dy and p.x0 - ARRIVE_DISTANCE <= x <= p.x1 + ARRIVE_DISTANCE:
+                best, best_dy = i, dy
+        return best
+
+    def locate_target(self, x, y):
+        """타겟 중심 (x, y) 아래에 있는 가장 가까운 발판 번호 (타겟은 발판 위에 놓여 있다)."""
+        for i, p in enumerate(self.platforms):
+            if p.y >= y - LAYER_SNAP and p.x0 <= x <= p.x1:
+                return i
+        return None
+
+    def _above(self, i, x):
+        """발판 i 바로 위, x 를 포함하는 발판 번호."""
+        y = self.platforms[i].y
+        for j in range(i - 1, -1, -1):
+            p = self.platforms[j]
+            if p.y < y and p.x0 <= x <= p.x1:
+                return j
+        return None
+
+    def _below(self, i, x):
+        """발판 i 바로 아래, x 를 포함하는 발판 번호 (떨어지면 닿는 곳)."""
+        y = self.platforms[i].y
+        for j in range(i + 1, len(self.platforms)):
+            p = self.platforms[j]
+            if p.y > y and p.x0 <= x <= p.x1:
+                return j
+        return None
+
+    # ───────── 간선 ─────────
+    def _horizontal(self, x_from, x_to):
+        """같은 발판 위 수평 이동 (kind, 예상 시간)."""
+        distance = abs(x_to - x_from)
+        direction = "left" if x_to < x_from else "right"
+        walk = distance / WALK_SPEED
+        double = self.cost.get(("double", direction))
+        hops = int(distance // DOUBLE_JUMP_DISTANCE)
+        if double is not None and hops > 0:
+            fast = hops * double + (distance - hops * DOUBLE_JUMP_DISTANCE) / WALK_SPEED
+            if fast < walk:
+                return "double", direction, fast
+        return "walk", direction, walk
+
+    def _edges(self, node, nodes_on):
+        i, x = node
+        p = self.platforms[i]
+
+        # 같은 발판의 다른 노드 전부 (중간 노드에서 끊으면 더블 탭 거리가 안 나온다)
+        for nx in nodes_on[i]:
+            if nx != x:
+                kind, direction, cost = self._horizontal(x, nx)
+                yield (i, nx), NavStep(kind, direction, nx, p.y, cost)
+
+        # 점프로 위 발판
+        up = self._above(i, x)
+        jump = self.cost.get(("jump", None))
+        if (
+            up is not None
+            and jump is not None
+            and p.y - self.platforms[up].y <= JUMP_HEIGHT
+        ):
+            yield (up, x), NavStep("jump", None, x, self.platforms[up].y, jump)
+
+        # 아래 점프로 바로 아래 발판
+        down = self._below(i, x)
+        drop = self.cost.get(("down", None))
+        if down is not None and drop is not None:
+            fall = (self.platforms[down].y - p.y) / FALL_SPEED
+            yield (down, x), NavStep(
+                "down", None, x, self.platforms[down].y, drop + fall
+            )
+
+        # 밧줄: 위쪽 끝이 걸린 발판과 그 바로 아래 발판을 잇는다
+        for rope in self.ropes:
+            if rope.x != x:
+                continue
+            for j, direction in ((up, "up"), (down, "down")):
+                if j is None:
+                    continue
+                q = self.platforms[j]
+                upper, lower = (q, p) if direction == "up" else (p, q)
+                if not rope.top - LAYER_SNAP <= upper.y <= rope.bottom + LAYER_SNAP:
+                    continue
+                gap = lower.y - rope.bottom  # 밧줄 아래 끝 ~ 아래 발판 높이
+                climb = (min(lower.y, rope.bottom) - upper.y) / CLIMB_SPEED
+                if gap <= LAYER_SNAP:
+                    yield (j, x), NavStep("climb", direction, x, q.y, climb)
+                elif direction == "up" and jump is not None and gap <= JUMP_HEIGHT:
+                    # 공중에 매달린 밧줄: 점프로 아래 끝을 잡고 오른다 (내려갈 때는 아래 점프)
+                    yield (j, x), NavStep("grab", "up", x, q.y, jump + climb)
+
+        # 발판 끝에서 걸어 나가 떨어지기
+        if not p.ledges:
+            return
+        for edge, direction, out in (
+            (p.x0, "left", p.x0 - LEDGE_STEP),
+            (p.x1, "right", p.x1 + LEDGE_STEP),
+        ):
+            if x != edge:
+                continue
+            j = self._below(i, out)
+            if j is not None and out in nodes_on[j]:
+                fall = (self.platforms[j].y - p.y) / FALL_SPEED
+                cost = LEDGE_STEP / WALK_SPEED + fall
+                yield (j, out), NavStep(
+                    "drop", direction, out, self.platforms[j].y, cost
+                )
+
+    # ───────── 계획 ─────────
+    def plan(self, start, goal):
+        """
+        start=(발 x, 발 y) → goal=(타겟 x, 타겟 y) 의 최단 시간 경로 [NavStep, ...].
+        출발 / 목표 발판을 못 찾거나 갈 수 없으면 None. 이미 목표 x 에 있으면 [].
+        """
+        if not self.platforms:
+            return None
+        si = self.locate(*start)
+        gi = self.locate_target(*goal)
+        if si is None or gi is None:
+            return None
+
+        # 관심 x: 밧줄 / 발판 끝 / 끝에서 떨어지는 지점 / 목표 (출발 x 는 가까운 관심 x 로 맞춤)
+        marks = {round(goal[0])}
+        marks.update(r.x for r in self.ropes)
+        for p in self.platforms:
+            marks.update((p.x0, p.x1))
+            if p.ledges:
+                marks.update((p.x0 - LEDGE_STEP, p.x1 + LEDGE_STEP))
+        sx = round(start[0])
+        near = [m for m in marks if abs(m - sx) <= ARRIVE_DISTANCE]
+        sx = min(near, key=lambda m: abs(m - sx)) if near else sx
+        marks.add(sx)
+
+        nodes_on = [
+            sorted(m for m in marks if p.x0 <= m <= p.x1) for p in self.platforms
+        ]
+        start_node = (si, sx)
+        if sx not in nodes_on[si]:
+            return None
+        goal_x = round(goal[0])
+
+        # 다익스트라 (노드 수가 수십 개라 매번 새로 돌려도 충분히 빠르다)
+        best = {start_node: 0.0}
+        prev = {}
+        heap = [(0.0, start_node)]
+        while heap:
+            t, node = heapq.heappop(heap)
+            if t > best.get(node, float("inf")):
+                continue
+            if node == (gi, goal_x):
+                break
+            for nxt, step in self._edges(node, nodes_on):
+                nt = t + step.cost
+                if nt < best.get(nxt, float("inf")):
+                    best[nxt] = nt
+                    prev[nxt] = (node, step)
+                    heapq.heappush(heap, (nt, nxt))
+
+        node = (gi, goal_x)
+        if node not in best:
+            return None
+        steps = []
+        while node != start_node:
+            node, step = prev[node]
+            steps.append(step)
+        steps.reverse()
+        return _merge_walks(steps)
+
+
+def _merge_walks(steps):
+    """같은 방향으로 이어지는 걷기 단계를 하나로 합친다."""
+    merged = []
+    for step in steps:
+        last = merged[-1] if merged else None
+        if (
+            last is not None
+            and step.kind == last.kind == "walk"
+            and step.direction == last.direction
+        ):
+            merged[-1] = step._replace(cost=last.cost + step.cost)
+        else:
+            merged.append(step)
+    return merged
+
+
+class Navigator:
+    """
+    선택 영역마다 NavGraph 를 만들어 두고, 감지된 지형 / 밧줄이 바뀔 때만 다시 만든다.
+
+    - 지형(terrain) 상자가 감지되면 그 윗면을 발판으로, 없으면 layers(선택 영역 y px 목록)를
+      영역 전체 폭의 발판으로 쓴다 (끝 위치를 모르므로 끝에서 떨어지기는 쓰지 않는다).
+    - 밧줄은 감지되면 같은 영역에서 기억해 두고 (캐릭터에 가려져도 그대로 있다),
+      가까운 감지는 같은 밧줄로 합친다. 밧줄 감지를 ROPE_FORGET 번 하는 동안 안 보이면 잊는다.
+    - 밧줄 감지는 needs_ropes() 일 때만 돌리면 된다 (영역을 처음 보거나, 경로를 계획한 뒤).
+    """
+
+    def __init__(self, layers, move_library=None):
+        self.layers = list(layers)
+        self.move_library = move_library
+        self.graph = None
+        self._rect = None
+        self._ropes = ()
+        self._last_seen = {}  # Rope → 마지막으로 보인 밧줄 감지 회차
+        self._observations = 0  # 밧줄 감지 결과를 받은 횟수
+        self._wants_ropes = True  # 마지막 밧줄 감지 뒤에 경로를 계획했는지
+        self._key = None
+
+    def observe(self, rect, ropes=None, terrain=None):
+        """
+        rect: 선택 영역 (x_min, y_min, x_max, y_max)
+        ropes: [(x, top, bottom), ...], terrain: [(x0, y, x1), ...] (선택 영역 px, 없으면 None)
+        ropes 가 None 이면 이번에는 밧줄 감지를 안 돌린 것 (기억한 밧줄을 그대로 쓴다)
+        """
+        if rect != self._rect:
+            self._rect = rect
+            self._ropes = ()
+            self._last_seen = {}
+            self._observations = 0
+            self._wants_ropes = True
+        q = NAV_QUANTUM
+        if ropes is not None:
+            self._merge_ropes(
+                Rope(round(x / q) * q, round(t / q) * q, round(b / q) * q)
+                for x, t, b in ropes
+            )
+        width = rect[2] - rect[0]
+        if terrain:
+            platforms = tuple(
+                sorted(
+                    Platform(round(y / q) * q, round(x0 / q) * q, round(x1 / q) * q)
+                    for x0, y, x1 in terrain
+                )
+            )
+        else:
+            platforms = tuple(Platform(y, 0, width, False) for y in self.layers)
+
+        key = (platforms, self._ropes)
+        if key != self._key:
+            self._key = key
+            self.graph = NavGraph(platforms, self._ropes, self.move_library)
+        return self.graph
+
+    def _merge_ropes(self, detected):
+        """이번 밧줄 감지 결과를 기억한 밧줄에 합치고, 오래 안 보인 밧줄은 지운다."""
+        self._observations += 1
+        self._wants_ropes = False
+        now = self._observations
+        last_seen = self._last_seen
+        for rope in detected:
+            same = next(
+                (
+                    r
+                    for r in last_seen
+                    if abs(r.x - rope.x) <= ROPE_MERGE_X
+                    and abs(r.top - rope.top) <= LAYER_SNAP
+                ),
+                None,
+            )
+            # 같은 밧줄이면 처음 기억한 좌표를 유지 (흔들리는 감지로 그래프를 다시 만들지 않도록)
+            # 아래 끝만은 더 길게 보였을 때 늘린다 (처음 볼 때 캐릭터에 가려졌을 수 있다)
+            if same is not None and rope.bottom > same.bottom + ROPE_MERGE_X:
+                del last_seen[same]
+                same = same._replace(bottom=rope.bottom)
+            last_seen[same or rope] = now
+        for rope, seen in list(last_seen.items()):
+            if now - seen >= ROPE_FORGET:
+                del last_seen[rope]
+        self._ropes = tuple(sorted(last_seen))
+
+    def needs_ropes(self):
+        """밧줄 감지를 돌릴 차례인지 (감지 스레드에서 읽는다)."""
+        return self._wants_ropes
+
+    def plan(self, start, goal):
+        self._wants_ropes = True  # 다음 계획은 새로 감지한 밧줄로
+        return self.graph.plan(start, goal) if self.graph is not None else None
@@ -0,0 +1,499 @@
+# pipeline.py (캡처 → 감지 → 제어 스트리밍 파이프라인)
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+import mss
+import numpy as np
+
+# 캡처 링 버퍼 크기 (감지가 늦으면 오래된 프레임부터 버려짐)
+FRAME_RING_SIZE = 4
+
+# 감지기들을 병렬로 돌릴 때 한 프레임에서 결과를 기다리는 최대 시간 (초)
+DETECT_DEADLINE = 0.1
+
+
+# ======================================================================
+# 1. 프레임 버퍼 (미리 할당해 두고 돌려 쓰기)
+# ======================================================================
+class FrameBufferPool:
+    """
+    프레임용 BGR / 회색조 배열을 재사용하는 풀.
+    다 쓴 프레임의 배열은 풀로 돌아가고, 다음 캡처가 cv2 dst= 로 그대로 덮어쓴다.
+    캡처 크기가 바뀌면 이전 크기의 배열은 버린다 (영역 재선택 시 1회 할당).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._key = None
+        self._free = []
+        self.allocated = 0  # 지금까지 새로 할당한 프레임 수 (정상 상태에서는 늘지 않음)
+
+    def frame(self, seq, t, height, width, rect=None, with_gray=False):
+        """참조 1개를 가진 Frame 을 반환 (배열 내용은 호출한 쪽이 채운다)."""
+        key = (height, width, with_gray)
+        with self.lock:
+            if key != self._key:
+                self._key = key
+                self._free = []
+            buffers = self._free.pop() if self._free else None
+        if buffers is None:
+            image = np.empty((height, width, 3), dtype=np.uint8)
+            gray = np.empty((height, width), dtype=np.uint8) if with_gray else None
+            buffers = (image, gray)
+            self.allocated += 1
+        return Frame(self, key, seq, t, buffers, rect)
+
+    def give_back(self, key, buffers):
+        with self.lock:
+            if key == self._key:
+                self._free.append(buffers)
+
+
+class Frame:
+    """
+    캡처된 프레임 하나. seq 는 1부터 증가, t 는 perf_counter 기준 캡처 시각.
+    rect 는 영역 캡처일 때 모니터 이미지 기준 (x_min, y_min, x_max, y_max),
+    전체 화면 캡처면 None. gray 는 영역 캡처일 때만 채워진다.
+
+    배열은 풀에서 빌려 온 것이라, 받아 간 쪽은 다 쓴 뒤 release() 해야 한다.
+    참조가 0 이 되면 배열이 풀로 돌아가 다음 캡처에 다시 쓰인다.
+    """
+
+    __slots__ = ("seq", "t", "image", "gray", "rect", "_pool", "_key", "_refs")
+
+    def __init__(self, pool, key, seq, t, buffers, rect=None):
+        self._pool = pool
+        self._key = key
+        self._refs = 1
+        self.seq = seq
+        self.t = t
+        self.image, self.gray = buffers
+        self.rect = rect
+
+    def retain(self):
+        with self._pool.lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._pool.lock:
+            self._refs -= 1
+            done = self._refs == 0
+        if done:
+            self._pool.give_back(self._key, (self.image, self.gray))
+
+
+class FrameRing:
+    """
+    크기가 정해진 프레임 링 버퍼. 캡처 스레드가 넣고 다른 스레드가 최신 것을 꺼내 본다.
+    latest() / wait_newer() 가 돌려준 프레임은 다 쓴 뒤 release() 해야 한다.
+    """
+
+    def __init__(self, size=FRAME_RING_SIZE):
+        self._frames = deque()
+        self._size = size
+        self._cond = threading.Condition()
+
+    def put(self, frame: Frame):
+        """frame 의 참조 1개를 링이 넘겨받는다. 밀려난 프레임은 release."""
+        with self._cond:
+            self._frames.append(frame)
+            evicted = self._frames.popleft() if len(self._frames) > self._size else None
+            self._cond.notify_all()
+        if evicted is not None:
+            evicted.release()
+
+    def latest(self):
+        with self._cond:
+            return self._frames[-1].retain() if self._frames else None
+
+    def wait_newer(self, seq: int, timeout=None):
+        """seq 보다 새 프레임이 들어올 때까지 기다렸다가 가장 최신 프레임을 반환."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._frames and self._frames[-1].seq > seq, timeout
+            )
+            if self._frames and self._frames[-1].seq > seq:
+                return self._frames[-1].retain()
+            return None
+
+
+class LatestValue:
+    """
+    최신 값 1개만 보관하는 우편함.
+    생산자는 덮어쓰기만 하고, 소비자는 take() 로 새 값을 가져간다 (가져가면 비워짐).
+    """
+
+    def __init__(self):
+        self._value = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        """새 값을 넣고, 아무도 가져가지 않은 이전 값을 반환 (없으면 None)."""
+        with self._lock:
+            stale, self._value = self._value, value
+        return stale
+
+    def take(self):
+        with self._lock:
+            value, self._value = self._value, None
+        return value
+
+
+# ======================================================================
+# 2. 캡처 / 감지 스레드
+# ======================================================================
+class FrameGrabber(threading.Thread):
+    """
+    전용 캡처 스레드. mss 인스턴스는 만든 스레드에서만 써야 하므로 run() 안에서 만든다.
+
+    - 영역이 없으면 모니터 전체를 캡처 (영역 선택 미리보기용)
+    - set_region(rect) 이후에는 그 사각형만 캡처 (전체 화면을 잘라내지 않음)
+    - mss 원본 버퍼는 np.frombuffer 로 복사 없이 감싸고, 풀에서 빌린 배열에
+      dst= 로 바로 변환한다 (BGR: 타겟/캐릭터 매칭, 회색조: 방향키 매칭)
+    - timings(metrics.LatencyStats) 를 주면 "capture" / "convert" 소요 시간을 기록
+    """
+
+    def __init__(self, ring: FrameRing, monitor_index=0, pool=None, timings=None):
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.pool = pool or FrameBufferPool()
+        self.timings = timings
+        self.monitor_index = monitor_index
+        self.monitor = None  # 캡처 중인 모니터 정보 (run 에서 채움)
+        self.region = None  # 캡처 중인 영역 (모니터 이미지 기준 사각형, None=전체)
+        self._running = True
+        self._seq = 0
+
+    def stop(self):
+        self._running = False
+
+    def set_region(self, rect):
+        """rect=(x_min, y_min, x_max, y_max) 만 캡처. None 이면 전체 화면으로 복귀."""
+        self.region = tuple(rect) if rect is not None else None
+
+    def clip_rect(self, rect):
+        """모니터 이미지 밖으로 나간 부분을 잘라낸 사각형."""
+        width, height = self.monitor["width"], self.monitor["height"]
+        x_min, y_min, x_max, y_max = rect
+        x_min = max(0, min(x_min, width))
+        x_max = max(x_min, min(x_max, width))
+        y_min = max(0, min(y_min, height))
+        y_max = max(y_min, min(y_max, height))
+        return (x_min, y_min, x_max, y_max)
+
+    def grab_once(self, sct):
+        mon = self.monitor
+        rect = self.region
+        if rect is None:
+            box = mon
+        else:
+            rect = self.clip_rect(rect)
+            x_min, y_min, x_max, y_max = rect
+            if x_max <= x_min or y_max <= y_min:
+                time.sleep(0.01)
+                return
+            box = {
+                "left": mon["left"] + x_min,
+                "top": mon["top"] + y_min,
+                "width": x_max - x_min,
+                "height": y_max - y_min,
+            }
+        t0 = time.perf_counter()
+        sct_img = sct.grab(box)
+        t1 = time.perf_counter()
+        height, width = sct_img.height, sct_img.width
+        bgra = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(height, width, 4)
+
+        self._seq += 1
+        frame = self.pool.frame(
+            self._seq,
+            t1,
+            height,
+            width,
+            rect,
+            with_gray=rect is not None,
+        )
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=frame.image)
+        if frame.gray is not None:
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=frame.gray)
+        if self.timings is not None:
+            self.timings.add("capture", t1 - t0, t0)
+            self.timings.add("convert", time.perf_counter() - t1, t1)
+        self.ring.put(frame)
+
+    def run(self):
+        with mss.mss() as sct:
+            self.monitor = sct.monitors[self.monitor_index]
+            while self._running:
+                try:
+                    self.grab_once(sct)
+                except Exception as e:
+                    print(f"❌ 화면 캡처 오류: {e}")
+                    time.sleep(0.1)
+
+
+class DetectionWorker(threading.Thread):
+    """
+    감지 스레드. 링에서 최신 프레임만 골라 detect_fn(frame) 을 돌리고,
+    결과 dict 를 results 우편함에 올린다. 밀린 프레임은 건너뛴다.
+
+    결과에는 "frame" 키로 원본 프레임이 붙어 나가므로, results.take() 로
+    가져간 쪽이 다 쓴 뒤 result["frame"].release() 해야 한다.
+    timings 를 주면 detect_fn 1회 소요 시간을 "detect" 로 기록한다.
+    """
+
+    def __init__(self, ring: FrameRing, detect_fn, timings=None):
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.detect_fn = detect_fn
+        self.timings = timings
+        self.results = LatestValue()
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        last_seq = 0
+        while self._running:
+            frame = self.ring.wait_newer(last_seq, timeout=0.1)
+            if frame is None:
+                continue
+            last_seq = frame.seq
+            t0 = time.perf_counter()
+            try:
+                result = self.detect_fn(frame)
+            except Exception as e:
+                print(f"❌ 감지 단계 오류: {e}")
+                result = None
+            if self.timings is not None and result is not None:
+                self.timings.add("detect", time.perf_counter() - t0, t0)
+            if result is None:
+                frame.release()
+                continue
+            result["frame"] = frame
+            stale = self.results.set(result)
+            if stale is not None:
+                stale["frame"].release()
+
+
+class DetectionExecutor:
+    """
+    서로 독립인 감지기들(캐릭터 / 타겟 / 방향키)을 스레드 풀에서 동시에 돌리고
+    프레임마다 deadline 안에 끝난 결과만 모은다. (cv2 매칭은 GIL 을 놓고 돈다)
+
+    - detectors: {이름: fn(frame, *args)}
+    - deadline 을 넘긴 감지기는 그 프레임에서 마지막으로 성공한 값을 대신 쓰고,
+      계속 돌게 둔다. 끝나기 전까지는 그 감지기를 새로 제출하지 않는다 (밀림 방지).
+      늦게 끝난 결과는 다음 프레임에서 가져가 마지막 값으로 삼는다.
+    - 실행 중인 감지기가 있는 동안 frame 은 retain 해 두므로 버퍼가 재사용되지 않는다.
+    - timings 를 주면 감지기마다 (deadline 과 상관없이 끝날 때까지) 소요 시간을 이름으로 기록
+    """
+
+    def __init__(self, detectors, deadline=DETECT_DEADLINE, timings=None):
+        self.detectors = dict(detectors)
+        self.deadline = deadline
+        self.timings = timings
+        self.pool = ThreadPoolExecutor(
+            max_workers=len(self.detectors), thread_name_prefix="detect"
+        )
+        self.last_good = {name: None for name in self.detectors}
+        self.missed = {name: 0 for name in self.detectors}  # deadline 초과 횟수
+        self._pending = {}  # 이름 → (아직 안 끝난 future, 제출할 때의 generation)
+        self._generation = 0  # reset() 마다 1 증가 (이전 영역의 늦은 결과는 버림)
+
+    def _harvest(self, name, future):
+        """끝난 future 의 값을 마지막 값으로. 예외면 이전 값을 그대로 둔다."""
+        try:
+            self.last_good[name] = future.result()
+            return True
+        except Exception as e:
+            print(f"❌ 감지기 '{name}' 오류: {e}")
+            return False
+
+    def _call(self, name, fn, frame, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(frame, *args)
+        finally:
+            if self.timings is not None:
+                self.timings.add(name, time.perf_counter() - t0, t0)
+
+    def run(self, frame, *args):
+        """
+        반환: ({이름: 값}, 이번 프레임 값이 아닌 감지기 이름 set)
+        (deadline 초과 / 오류 / 이전 실행이 아직 안 끝난 감지기가 stale)
+        """
+        futures = {}
+        for name, fn in self.detectors.items():
+            pending, generation = self._pending.pop(name, (None, None))
+            if pending is not None:
+                if not pending.done():
+                    self._pending[name] = (pending, generation)
+                    continue
+                if generation == self._generation:
+                    self._harvest(name, pending)
+            frame.retain()
+            future = self.pool.submit(self._call, name, fn, frame, *args)
+            future.add_done_callback(lambda _: frame.release())
+            futures[name] = future
+
+        if futures:
+            wait(futures.values(), timeout=self.deadline)
+
+        results, stale = {}, set()
+        for name in self.detectors:
+            future = futures.get(name)
+            if future is None:
+                stale.add(name)
+            elif not future.done():
+                self._pending[name] = (future, self._generation)
+                self.missed[name] += 1
+                stale.add(name)
+            elif not self._harvest(name, future):
+                stale.add(name)
+            results[name] = self.last_good[name]
+        return results, stale
+
+    def reset(self):
+        """영역이 바뀌었을 때: 이전 영역 기준의 마지막 값 / 늦은 결과는 버린다."""
+        self._generation += 1
+        self.last_good = {name: None for name in self.detectors}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ======================================================================
+# 3. 프레임 변화 감지 (변화 없는 타일은 직전 감지 결과 재사용)
+# ======================================================================
+# 비교 전에 회색조 프레임을 이 배율로 줄인다 (노이즈 평균 + 비교 비용 절감)
+CHANGE_DOWNSCALE = 4
+
+# 변화 여부를 판정하는 타일 크기 (px, 원본 해상도)
+CHANGE_TILE_SIZE = 64
+
+# 축소 영상에서 한 픽셀이라도 기준보다 이만큼 밝기가 달라지면 그 타일은 dirty
+CHANGE_THRESHOLD = 12
+
+# dirty 타일이 이 비율 이상이면 부분 갱신 대신 전체를 다시 감지
+CHANGE_FULL_FRACTION = 0.5
+
+# 이 프레임 수마다 한 번은 변화가 없어도 전체를 다시 감지 (누적 오차 방지)
+CHANGE_REFRESH_FRAMES = 60
+
+
+class TileChanges:
+    """
+    프레임 1장의 타일별 변화 결과.
+    - dirty : (타일 행, 타일 열) bool 배열
+    - any   : 바뀐 타일이 하나라도 있음
+    - all   : 전체를 다시 감지해야 함 (첫 프레임 / 영역 변경 / 변화가 많음 / 주기 갱신)
+    좌표는 모두 원본 해상도 픽셀 기준.
+    """
+
+    def __init__(self, dirty, tile, height, width, full=False):
+        self.dirty = dirty
+        self.tile = tile
+        self.height = height
+        self.width = width
+        self.any = full or bool(dirty.any())
+        self.all = full or bool(dirty.mean() >= CHANGE_FULL_FRACTION)
+
+    def boxes_clean(self, xs, ys, w, h):
+        """좌상단 (xs, ys), 크기 w x h 상자들이 모두 변화 없는 타일 안에 있는지 (bool 배열)."""
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        if self.all:
+            return np.zeros(xs.shape, dtype=bool)
+        if not self.any:
+            return np.ones(xs.shape, dtype=bool)
+        # 타일 격자의 2차원 누적합으로 상자가 덮는 타일 중 dirty 개수를 한 번에 센다
+        counts = np.zeros((self.dirty.shape[0] + 1, self.dirty.shape[1] + 1), np.int32)
+        counts[1:, 1:] = self.dirty.cumsum(0).cumsum(1)
+        tx0 = np.clip(xs // self.tile, 0, self.dirty.shape[1] - 1)
+        ty0 = np.clip(ys // self.tile, 0, self.dirty.shape[0] - 1)
+        tx1 = np.clip((xs + w - 1) // self.tile, 0, self.dirty.shape[1] - 1) + 1
+        ty1 = np.clip((ys + h - 1) // self.tile, 0, self.dirty.shape[0] - 1) + 1
+        n_dirty = (
+            counts[ty1, tx1] - counts[ty0, tx1] - counts[ty1, tx0] + counts[ty0, tx0]
+        )
+        return n_dirty == 0
+
+    def dirty_rects(self, pad_w=0, pad_h=0, align=1):
+        """
+        이어진 dirty 타일 덩어리마다 사각형 (x0, y0, x1, y1).
+        템플릿이 dirty 타일에 조금이라도 걸치는 위치를 모두 다시 매칭할 수 있도록
+        pad_w / pad_h 만큼 넓히고, 시작 좌표는 align 배수로 내린다 (피라미드 격자 맞춤).
+        """
+        n, _, stats, _ = cv2.connectedComponentsWithStats(
+            self.dirty.astype(np.uint8), connectivity=8
+        )
+        rects = []
+        for tx, ty, tw, th, _ in stats[1:n].tolist():
+            x0 = max(0, tx * self.tile - pad_w) // align * align
+            y0 = max(0, ty * self.tile - pad_h) // align * align
+            x1 = min(self.width, (tx + tw) * self.tile + pad_w)
+            y1 = min(self.height, (ty + th) * self.tile + pad_h)
+            rects.append((x0, y0, x1, y1))
+        return rects
+
+
+class TileChangeDetector:
+    """
+    축소한 회색조 프레임을 타일 단위로 기준 영상과 비교하는 값싼 변화 감지기.
+    기준 영상은 dirty 로 판정된 타일만 새 프레임으로 갱신한다.
+    (아주 느린 변화도 누적되면 결국 dirty 가 된다)
+    """
+
+    def __init__(
+        self,
+        tile=CHANGE_TILE_SIZE,
+        downscale=CHANGE_DOWNSCALE,
+        threshold=CHANGE_THRESHOLD,
+        refresh_every=CHANGE_REFRESH_FRAMES,
+    ):
+        self.tile = tile
+        self.downscale = downscale
+        self.threshold = threshold
+        self.refresh_every = refresh_every
+        self.reset()
+
+    def reset(self):
+        self._ref = None
+        self._since_full = 0
+
+    def update(self, gray) -> TileChanges:
+        height, width = gray.shape[:2]
+        cell = self.tile // self.downscale
+        ny = -(-height // self.tile)
+        nx = -(-width // self.tile)
+        # 축소 영상을 타일 격자에 딱 맞는 크기로 만든다 (가장자리 타일도 같은 크기)
+        small = cv2.resize(gray, (nx * cell, ny * cell), interpolation=cv2.INTER_AREA)
+
+        self._since_full += 1
+        if (
+            self._ref is None
+            or self._ref.shape != small.shape
+            or self._since_full >= self.refresh_every
+        ):
+            self._ref = small
+            self._since_full = 0
+            return TileChanges(
+                np.ones((ny, nx), dtype=bool), self.tile, height, width, full=True
+            )
+
+        diff = cv2.absdiff(small, self._ref)
+        dirty = diff.reshape(ny, cell, nx, cell).max(axis=(1, 3)) > self.threshold
+        if dirty.any():
+            mask = np.repeat(np.repeat(dirty, cell, axis=0), cell, axis=1)
+            np.copyto(self._ref, small, where=mask)
+        changes = TileChanges(dirty, self.tile, height, width)
+        if changes.all:
+            self._since_full = 0
+        return changes
@@ -0,0 +1,297 @@
+# replay.py (저장된 캡처 / 녹화 영상으로 감지 파이프라인을 오프라인 재생)
+#
+# 게임 없이 main.py 와 같은 감지 코드(detect_frame)와 제어 코드(control_step)를 돌려서
+# 단계별 지연 백분위, FPS, 라벨(YOLO txt)과의 일치율을 잰다. 피코 대신 가짜 포트로 보낸다.
+#
+# 사용법 (mining_macro 폴더에서):
+#   python replay.py [PNG 폴더 또는 영상 파일] [R=반복] [RECT=x0,y0,x1,y1]
+#                    [BACKEND=template|yolo] [CONTROL=0|1] [TRACE=기록.csv|.json]
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import main as bot
+from protocol import PROTOCOL_TEXT, PicoLink
+from pipeline import FrameBufferPool
+from metrics import TRACE_MAX, LatencyStats
+from detectors import DATASET_YAML, load_class_names
+
+REPLAY_SOURCE = bot.CALIBRATION_SAMPLE_DIR
+
+# 감지 좌표가 라벨 상자 밖으로 이만큼(px)까지 벗어나도 일치로 본다
+GT_TOLERANCE = 15
+
+
+class StubSerial:
+    """PicoLink 가 쓰는 serial.Serial 자리에 끼우는 가짜 포트. 쓴 바이트를 시각과 함께 기록."""
+
+    def __init__(self):
+        self.is_open = True
+        self.timeout = 0.1
+        self.writes = []  # (perf_counter, bytes)
+
+    def write(self, data):
+        self.writes.append((time.perf_counter(), bytes(data)))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        return b""
+
+    def reset_input_buffer(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    def events(self):
+        """텍스트 프로토콜로 보낸 줄들 ["EV down RIGHT", ...]"""
+        data = b"".join(chunk for _, chunk in self.writes)
+        return [line for line in data.decode(errors="replace").splitlines() if line]
+
+
+# ───────── 입력 / 라벨 ─────────
+def iter_source(source):
+    """(이미지 경로 또는 None, BGR 프레임). 폴더면 이미지 파일 이름순, 아니면 영상 프레임."""
+    if os.path.isdir(source):
+        for f in sorted(os.listdir(source)):
+            if not f.lower().endswith((".png", ".jpg", ".jpeg")):
+                continue
+            path = os.path.join(source, f)
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is not None:
+                yield path, img
+        return
+
+    cap = cv2.VideoCapture(source)
+    try:
+        while True:
+            ok, img = cap.read()
+            if not ok:
+                break
+            yield None, img
+    finally:
+        cap.release()
+
+
+def label_path(image_path):
+    """YOLO 데이터셋 규칙: .../images/<하위>/frame.png → .../labels/<하위>/frame.txt"""
+    parts = os.path.normpath(image_path).split(os.sep)
+    if "images" not in parts:
+        return None
+    idx = len(parts) - 1 - parts[::-1].index("images")
+    parts[idx] = "labels"
+    return os.path.splitext(os.sep.join(parts))[0] + ".txt"
+
+
+def load_labels(path, width, height, class_names):
+    """YOLO txt (cls cx cy w h, 0~1) → {클래스 이름: [(x0, y0, x1, y1), ...]} (px)"""
+    if not path or not os.path.exists(path):
+        return None
+    boxes = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cls = int(parts[0])
+            cx, cy, w, h = (float(v) for v in parts[1:5])
+            name = class_names[cls] if cls < len(class_names) else str(cls)
+            boxes.setdefault(name, []).append(
+                (
+                    (cx - w / 2) * width,
+                    (cy - h / 2) * height,
+                    (cx + w / 2) * width,
+                    (cy + h / 2) * height,
+                )
+            )
+    return boxes
+
+
+def inside_any(point, boxes, offset=(0, 0), tol=GT_TOLERANCE):
+    """point(선택 영역 기준)가 라벨 상자(전체 화면 기준) 중 하나 안에 있는지."""
+    x, y = point[0] + offset[0], point[1] + offset[1]
+    return any(
+        x0 - tol <= x <= x1 + tol and y0 - tol <= y <= y1 + tol
+        for x0, y0, x1, y1 in boxes
+    )
+
+
+class Agreement:
+    """라벨과의 일치 횟수 집계."""
+
+    def __init__(self):
+        self.labelled = 0
+        self.player_gt = self.player_hit = 0
+        self.target_pred = self.target_correct = 0
+        self.target_gt = self.target_found = 0
+
+    def add(self, det, labels, offset):
+        if labels is None:
+            return
+        self.labelled += 1
+        players = labels.get("player", [])
+        if players:
+            self.player_gt += 1
+            # det["player"] 는 발밑 보정(PLAYER_Y_OFFSET)이 들어간 값 → 중심으로 되돌린다
+            px, py = det["player"]
+            center = (px, py - bot.PLAYER_Y_OFFSET)
+            if det["player_found"] and inside_any(center, players, offset):
+                self.player_hit += 1
+
+        targets = labels.get("target", [])
+        if det["target_coords"] is not None:
+            self.target_pred += 1
+            if inside_any(det["target_coords"], targets, offset):
+                self.target_correct += 1
+        if targets:
+            self.target_gt += 1
+            if det["target_coords"] is not None:
+                self.target_found += 1
+
+    def format(self) -> str:
+        if not self.labelled:
+            return "라벨 파일 없음 (images/... 옆 labels/... 의 YOLO txt) → 일치율 생략"
+
+        def ratio(a, b):
+            return f"{a}/{b} ({a / b:.0%})" if b else "-"
+
+        return (
+            f"라벨 프레임 {self.labelled}장 | "
+            f"캐릭터 검출 {ratio(self.player_hit, self.player_gt)} | "
+            f"타겟 정확도 {ratio(self.target_correct, self.target_pred)} | "
+            f"타겟 검출 {ratio(self.target_found, self.target_gt)}"
+        )
+
+
+# ───────── 재생 ─────────
+def replay(source=REPLAY_SOURCE, repeat=1, rect=None, run_control=True, trace=False):
+    """
+    source 의 프레임을 repeat 번씩 차례로 감지 → (제어) 단계에 넣는다.
+    rect=(x0, y0, x1, y1) 이면 그 영역만 잘라서 선택 영역처럼 쓴다 (None 이면 전체).
+    trace=True 면 개별 측정 기록도 남긴다 (LatencyStats.dump 용).
+    반환: (LatencyStats, Agreement, StubSerial, 전체 소요 시간(초))
+    """
+    # main.py 의 측정 지점(변화 감지 / 감지기별 / 시리얼)을 그대로 쓰되, 재생 동안은 전부 보관
+    stats = LatencyStats(window=None, trace_max=TRACE_MAX if trace else 0)
+    bot.timings = stats
+    agreement = Agreement()
+    port = StubSerial()
+    bot.pico = PicoLink(port, PROTOCOL_TEXT)
+    bot.selection_done = True
+
+    # 재생에서는 deadline 없이 모든 감지기가 끝날 때까지 기다린다
+    executor = bot.detection_executor
+    executor.deadline = None
+    executor.timings = stats
+    bot.actions.timings = stats
+    if run_control:
+        bot.actions.start()
+
+    try:
+        class_names = load_class_names(DATASET_YAML)
+    except OSError:
+        class_names = []
+
+    pool = FrameBufferPool()
+    seq = 0
+    wall_start = time.perf_counter()
+    for path, img in iter_source(source):
+        height, width = img.shape[:2]
+        x0, y0, x1, y1 = rect or (0, 0, width, height)
+        area = img[y0:y1, x0:x1]
+        labels = load_labels(
+            label_path(path) if path else None, width, height, class_names
+        )
+
+        for _ in range(repeat):
+            seq += 1
+            frame = pool.frame(
+                seq,
+                time.perf_counter(),
+                area.shape[0],
+                area.shape[1],
+                (x0, y0, x1, y1),
+                with_gray=True,
+            )
+            np.copyto(frame.image, area)
+            cv2.cvtColor(area, cv2.COLOR_BGR2GRAY, dst=frame.gray)
+
+            with stats.measure("detect"):
+                det = bot.detect_frame(frame)
+            if det is None:
+                frame.release()
+                continue
+            if run_control:
+                with stats.measure("decision"):
+                    bot.control_step(det)
+            agreement.add(det, labels, (x0, y0))
+            frame.release()
+
+    wall = time.perf_counter() - wall_start
+    bot.stop_actions()
+    executor.shutdown()
+    return stats, agreement, port, wall
+
+
+def main(argv):
+    source = REPLAY_SOURCE
+    repeat = 1
+    rect = None
+    run_control = True
+    trace_path = None
+    for token in argv:
+        up = token.upper()
+        if up.startswith("R="):
+            repeat = max(1, int(up[2:]))
+        elif up.startswith("RECT="):
+            rect = tuple(int(v) for v in up[5:].split(","))
+        elif up.startswith("BACKEND="):
+            bot.DETECTOR_BACKEND = token[8:].lower()
+        elif up.startswith("CONTROL="):
+            run_control = up[8:] not in ("0", "OFF", "NO")
+        elif up.startswith("TRACE="):
+            trace_path = token[6:]
+        else:
+            source = token
+
+    print(
+        f"▶ 재생: {source} (반복 {repeat}회, 영역 {rect or '전체'}, 제어 {run_control})"
+    )
+    bot.load_images()
+    stats, agreement, port, wall = replay(
+        source, repeat, rect, run_control, trace=trace_path is not None
+    )
+
+    detect = stats.summary("detect")
+    print("-" * 45)
+    print(stats.format())
+    n = detect["count"]
+    if n:
+        detect_fps = 1e3 / detect["mean"] if detect["mean"] > 0 else 0.0
+        print(
+            f"FPS: 감지만 {detect_fps:.1f}, 전체(제어 포함) {n / wall:.1f}  ({n} 프레임)"
+        )
+    print(agreement.format())
+    events = port.events()
+    downs = {}
+    for line in events:
+        parts = line.split()
+        if len(parts) == 3 and parts[1] == "down":
+            downs[parts[2]] = downs.get(parts[2], 0) + 1
+    print(
+        f"가짜 포트 전송: write {len(port.writes)}회, 이벤트 {len(events)}개, 누름 {downs}"
+    )
+    if trace_path:
+        stats.dump(trace_path)
+        print(f"✅ 소요 시간 기록 저장: {trace_path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
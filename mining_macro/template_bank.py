@@ -0,0 +1,157 @@
+# template_bank.py (템플릿 사전 계산 + 디스크 캐시)
+
+import os
+import hashlib
+
+import cv2
+import numpy as np
+
+import matching
+from matching import MatchTemplate, calibrate, load_samples, sample_files
+
+# 컴파일된 템플릿(npz)을 저장하는 폴더
+TEMPLATE_CACHE_DIR = "./template_cache"
+
+# 캐시 형식이 바뀌면 올린다 (이전 캐시는 자동으로 무시됨)
+TEMPLATE_CACHE_VERSION = 1
+
+
+def _file_digest(h, path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+
+class TemplateBank:
+    """
+    템플릿 PNG 를 한 번만 읽어서 매칭에 필요한 모든 형태를 미리 만들어 두는 저장소.
+    (컬러 / 회색조 / 마스크 / 피라미드 단계 / 단계별 평균·분산 / 피라미드 보정 결과)
+
+    결과는 cache_dir 에 템플릿마다 npz 1개로 저장된다. 파일 이름의 해시는
+    템플릿 파일 내용 + 로드 옵션 + 매칭/보정 상수 + 보정 샘플 내용으로 만들기 때문에,
+    그중 하나라도 바뀌면 자동으로 다시 계산한다. (안 쓰는 캐시 파일은 지워도 된다)
+    다음 실행부터는 PNG 디코딩과 보정 없이 npz 만 읽는다.
+    """
+
+    def __init__(self, cache_dir=TEMPLATE_CACHE_DIR, sample_dir=None):
+        self.cache_dir = cache_dir
+        self.sample_dir = sample_dir
+        self.templates = {}  # 이름 → MatchTemplate
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._samples = {}  # gray 여부 → 보정 샘플 (캐시가 없을 때만 로드)
+        self._samples_digest = None
+
+    def __getitem__(self, name):
+        return self.templates[name]
+
+    def __contains__(self, name):
+        return name in self.templates
+
+    def values(self):
+        return self.templates.values()
+
+    # ───────── 캐시 키 ─────────
+    def _sample_digest(self):
+        """보정 샘플 파일 내용의 해시 (샘플을 바꾸면 보정 결과도 다시 계산)."""
+        if self._samples_digest is None:
+            h = hashlib.sha1()
+            for path in sample_files(self.sample_dir):
+                h.update(os.path.basename(path).encode())
+                _file_digest(h, path)
+            self._samples_digest = h.hexdigest()
+        return self._samples_digest
+
+    def cache_key(self, path, threshold, gray, mask_threshold):
+        h = hashlib.sha1()
+        _file_digest(h, path)
+        params = (
+            TEMPLATE_CACHE_VERSION,
+            float(threshold),
+            bool(gray),
+            mask_threshold,
+            matching.PYRAMID_MAX_LEVEL,
+            matching.PYRAMID_MIN_SIZE,
+            matching.REFINE_TOP_K,
+            matching.CALIBRATION_MIN_SELF_SCORE,
+            matching.CALIBRATION_SAFETY,
+            matching.CALIBRATION_MAX_SAMPLES,
+            self._sample_digest(),
+        )
+        h.update(repr(params).encode())
+        return h.hexdigest()[:20]
+
+    def _cache_path(self, path, key):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{stem}-{key}.npz")
+
+    # ───────── 로드 ─────────
+    def _read_cache(self, name, cache_path):
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path) as data:
+                return MatchTemplate.from_arrays(name, {k: data[k] for k in data.files})
+        except Exception as e:
+            print(f"⚠ 템플릿 캐시 손상, 다시 계산합니다: {cache_path} ({e})")
+            return None
+
+    def _write_cache(self, tmpl, cache_path):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **tmpl.to_arrays())
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠ 템플릿 캐시 저장 실패: {cache_path} ({e})")
+
+    def _calibration_samples(self, gray):
+        if gray not in self._samples:
+            self._samples[gray] = load_samples(self.sample_dir, gray=gray)
+        return self._samples[gray]
+
+    def load(self, name, path, threshold=0.70, gray=False, mask_threshold=None):
+        """
+        템플릿 1개를 로드해서 bank 에 등록하고 반환한다 (파일이 없거나 못 읽으면 None).
+        - gray=True      : 회색조로 로드 (방향키)
+        - mask_threshold : 이 밝기 초과인 픽셀만 매칭에 쓰는 마스크를 만든다
+        """
+        if not os.path.exists(path):
+            return None
+
+        key = self.cache_key(path, threshold, gray, mask_threshold)
+        cache_path = self._cache_path(path, key)
+        tmpl = self._read_cache(name, cache_path)
+        if tmpl is not None:
+            self.cache_hits += 1
+            self.templates[name] = tmpl
+            return tmpl
+
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        mask = None
+        if mask_threshold is not None:
+            _, mask = cv2.threshold(img, mask_threshold, 255, cv2.THRESH_BINARY)
+
+        tmpl = MatchTemplate(name, img, threshold, mask=mask)
+        calibrate(tmpl, self._calibration_samples(gray))
+        self._write_cache(tmpl, cache_path)
+        self.cache_misses += 1
+        self.templates[name] = tmpl
+        return tmpl
+
+    def load_dir(self, dir_path, **options):
+        """dir_path 아래 이미지 전부를 로드 (이름은 '폴더/파일'). 폴더가 없으면 빈 리스트."""
+        res = []
+        if not os.path.isdir(dir_path):
+            return res
+        for f in sorted(os.listdir(dir_path)):
+            if not f.lower().endswith((".png", ".jpg", ".jpeg")):
+                continue
+            name = f"{os.path.basename(os.path.normpath(dir_path))}/{f}"
+            tmpl = self.load(name, os.path.join(dir_path, f), **options)
+            if tmpl is not None:
+                res.append(tmpl)
+        return res
@@ -0,0 +1,9 @@
+# conftest.py (control_macro / mining_macro 의 모듈을 이름만으로 import 할 수 있게)
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sub in ("control_macro", "mining_macro"):
+    path = os.path.join(ROOT, sub)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,96 @@
+# test_matching.py (FFTBankMatcher 점수 맵 vs cv2.matchTemplate TM_CCOEFF_NORMED)
+import cv2
+import numpy as np
+import pytest
+
+from matching import FFTBankMatcher, MatchTemplate, RoiTracker
+
+SCORE_TOL = 1e-3
+
+
+def synthetic_image(shape, seed=0):
+    """부드러운 무늬 + 잡음 (평탄한 영역이 없어야 창 분산이 0 근처로 가지 않는다)."""
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, shape, dtype=np.uint8)
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+    noise = rng.integers(0, 40, shape, dtype=np.uint8)
+    return cv2.add(img, noise)
+
+
+def fft_map(image, tmpl):
+    return FFTBankMatcher().score_maps(image, [(tmpl.name, tmpl.stats[0])])[0]
+
+
+@pytest.mark.parametrize("color", [True, False])
+def test_parity_without_mask(color):
+    shape = (120, 160, 3) if color else (120, 160)
+    image = synthetic_image(shape)
+    y, x = 37, 81
+    tmpl = MatchTemplate("t", image[y : y + 24, x : x + 18].copy())
+
+    ours = fft_map(image, tmpl)
+    ref = cv2.matchTemplate(image, tmpl.image, cv2.TM_CCOEFF_NORMED)
+
+    assert ours.shape == ref.shape
+    assert np.abs(ours - ref).max() < SCORE_TOL
+    peak = np.unravel_index(np.argmax(ours), ours.shape)
+    assert peak == (y, x)
+    assert ours[y, x] == pytest.approx(1.0, abs=SCORE_TOL)
+
+
+def test_parity_with_mask():
+    image = synthetic_image((100, 140), seed=1)
+    y, x = 22, 57
+    patch = image[y : y + 21, x : x + 21].copy()
+    mask = np.zeros_like(patch)
+    cv2.circle(mask, (10, 10), 8, 255, -1)
+    tmpl = MatchTemplate("m", patch, mask=mask)
+
+    ours = fft_map(image, tmpl)
+    ref = cv2.matchTemplate(image, patch, cv2.TM_CCOEFF_NORMED, mask=mask)
+
+    assert ours.shape == ref.shape
+    finite = np.isfinite(ref)
+    assert np.abs(ours[finite] - ref[finite]).max() < SCORE_TOL
+    peak = np.unravel_index(np.argmax(ours), ours.shape)
+    assert peak == (y, x)
+
+
+def test_bank_shares_image_spectrum_across_templates():
+    image = synthetic_image((90, 120, 3), seed=2)
+    spots = [(10, 15), (50, 70), (30, 90)]
+    templates = [
+        MatchTemplate(f"t{i}", image[y : y + 16, x : x + 20].copy())
+        for i, (y, x) in enumerate(spots)
+    ]
+    maps = FFTBankMatcher().score_maps(image, [(t.name, t.stats[0]) for t in templates])
+    for (y, x), tmpl, ours in zip(spots, templates, maps):
+        ref = cv2.matchTemplate(image, tmpl.image, cv2.TM_CCOEFF_NORMED)
+        assert np.abs(ours - ref).max() < SCORE_TOL
+        assert np.unravel_index(np.argmax(ours), ours.shape) == (y, x)
+
+
+def test_tracker_search_leaves_state_until_commit():
+    calls = []
+
+    def find(img):
+        calls.append(img.shape)
+        return (10, 10)
+
+    tracker = RoiTracker(find, (8, 8), radius=4)
+    image = np.zeros((100, 100), np.uint8)
+
+    # search 만으로는 상태가 안 바뀐다 (몇 번을 불러도 전체 검색)
+    assert tracker.search(image) == ((10, 10), True)
+    assert tracker.search(image) == ((10, 10), True)
+    assert tracker.last is None and tracker.full_searches == 0
+
+    tracker.commit((50, 50), True)
+    assert tracker.last == (50, 50) and tracker.full_searches == 1
+
+    # 반영 뒤에는 직전 위치 주변 창만 검색하고 창 좌표를 전체 좌표로 돌려준다
+    found, full = tracker.search(image)
+    assert not full and calls[-1] == (17, 17)
+    assert found == (10 + 42, 10 + 42)
+    tracker.commit(found, full)
+    assert tracker.window_searches == 1 and tracker.last == (52, 52)
@@ -0,0 +1,119 @@
+# test_navigation.py (NavGraph 경로 계획 / Navigator 밧줄 기억)
+from collections import namedtuple
+
+from navigation import (
+    LEDGE_STEP,
+    ROPE_FORGET,
+    NavGraph,
+    Navigator,
+    Platform,
+    Rope,
+)
+
+Action = namedtuple("Action", "duration")
+
+
+class FakeMoves:
+    """MoveLibrary 대신: (category, direction) → 녹화본 길이 (초). 없는 동작은 None."""
+
+    def __init__(self, **durations):
+        self.durations = durations
+
+    def fastest(self, category, direction=None):
+        key = category if direction is None else f"{category}_{direction}"
+        duration = self.durations.get(key)
+        return Action(duration) if duration is not None else None
+
+
+def kinds(path):
+    return [step.kind for step in path]
+
+
+def test_same_platform_walks_or_double_taps():
+    platforms = [Platform(500, 0, 1000)]
+    path = NavGraph(platforms).plan((100, 500), (700, 480))
+    assert kinds(path) == ["walk"]
+    assert path[0].direction == "right" and path[0].x == 700
+
+    # 더블 탭이 걷기보다 빠르면 더블 탭 + 남은 거리 걷기 한 단계
+    fast = NavGraph(platforms, move_library=FakeMoves(double_right=0.3))
+    path = fast.plan((100, 500), (700, 480))
+    assert kinds(path) == ["double"]
+    assert path[0].cost < 600 / 220.0
+
+
+def test_rope_climb_to_upper_platform():
+    platforms = [Platform(200, 0, 400), Platform(500, 0, 800)]
+    ropes = [Rope(200, 200, 500)]
+    path = NavGraph(platforms, ropes).plan((600, 500), (100, 180))
+    assert kinds(path) == ["walk", "climb", "walk"]
+    assert path[1].direction == "up" and path[1].x == 200 and path[1].y == 200
+    assert path[-1].x == 100
+
+
+def test_hanging_rope_needs_jump_to_grab():
+    platforms = [Platform(200, 0, 400), Platform(500, 0, 800)]
+    ropes = [Rope(200, 200, 400)]  # 아래 끝이 발판에서 100px 떠 있다
+    assert NavGraph(platforms, ropes).plan((200, 500), (100, 180)) is None
+
+    graph = NavGraph(platforms, ropes, FakeMoves(jump=0.5))
+    path = graph.plan((200, 500), (100, 180))
+    assert kinds(path) == ["grab", "walk"]
+
+
+def test_drop_off_ledge_to_lower_platform():
+    platforms = [Platform(200, 300, 500), Platform(500, 0, 800)]
+    path = NavGraph(platforms).plan((400, 200), (100, 480))
+    assert kinds(path) == ["walk", "drop", "walk"]
+    assert path[1].direction == "left" and path[1].x == 300 - LEDGE_STEP
+    assert path[1].y == 500
+
+
+def test_unreachable_target():
+    # 끝 위치를 모르는 발판 + 녹화본 없음 → 아래로 갈 방법이 없다
+    platforms = [Platform(200, 300, 500, False), Platform(500, 0, 800)]
+    assert NavGraph(platforms).plan((400, 200), (100, 480)) is None
+    # 출발 위치가 어느 발판에도 없을 때
+    assert NavGraph(platforms).plan((400, 350), (100, 480)) is None
+
+
+def test_terrain_layers_never_drop_off_ledges():
+    rect = (0, 0, 800, 600)
+    navigator = Navigator([200, 500])
+    graph = navigator.observe(rect)
+    assert all(not p.ledges and p.x1 == 800 for p in graph.platforms)
+
+    # 전체 폭 층의 끝은 실제 발판 끝이 아니므로 걸어 나가 떨어지지 않는다
+    assert navigator.plan((400, 200), (100, 480)) is None
+
+    navigator = Navigator([200, 500], FakeMoves(down=0.4))
+    navigator.observe(rect)
+    path = navigator.plan((400, 200), (100, 480))
+    assert kinds(path) == ["down", "walk"]
+
+
+def test_navigator_merges_and_forgets_ropes():
+    rect = (0, 0, 800, 600)
+    navigator = Navigator([200, 500])
+    assert navigator.needs_ropes()
+
+    # 반올림 경계에서 흔들리는 감지는 같은 밧줄 하나로
+    navigator.observe(rect, [(100, 200, 490), (107, 210, 492)])
+    navigator.observe(rect, [(94, 196, 488)])
+    assert navigator.graph.ropes == [Rope(96, 200, 488)]
+    assert not navigator.needs_ropes()
+
+    # 밧줄 감지를 안 돌린 프레임(None)은 안 보인 것으로 세지 않는다
+    for _ in range(ROPE_FORGET * 2):
+        navigator.observe(rect, None)
+    assert navigator.graph.ropes == [Rope(96, 200, 488)]
+
+    for _ in range(ROPE_FORGET - 1):
+        navigator.observe(rect, [])
+    assert navigator.graph.ropes == [Rope(96, 200, 488)]
+    navigator.observe(rect, [])
+    assert navigator.graph.ropes == []
+
+    # 경로를 계획하면 다음 프레임에 밧줄을 다시 감지한다
+    navigator.plan((100, 500), (300, 480))
+    assert navigator.needs_ropes()
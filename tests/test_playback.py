@@ -0,0 +1,61 @@
+# test_playback.py (미리 인코딩된 재생 계획의 SEQ 이어 붙이기)
+from playback import EventPlan, SerialSink
+from protocol import OP_DOWN, OP_UP, PROTOCOL_BINARY, FrameDecoder, PicoLink
+
+from test_protocol import FakeSerial
+
+EVENTS = [
+    {"type": "down", "key": "ALT", "time": 0.0},
+    {"type": "down", "key": "NOT_A_KEY", "time": 0.0},
+    {"type": "up", "key": "ALT", "time": 0.05},
+]
+
+
+def play_all(sink, plan):
+    sink.prepare(plan)
+    for i in range(plan.batch_count):
+        sink.send(i)
+
+
+def test_plan_frames_continue_link_seq():
+    ser = FakeSerial()
+    link = PicoLink(ser, PROTOCOL_BINARY)
+    plan = EventPlan.compile(EVENTS)
+    sink = SerialSink(link)
+
+    link.send("down", "RIGHT")
+    play_all(sink, plan)
+    link.send("up", "RIGHT")
+    play_all(sink, plan)
+
+    decoder = FrameDecoder()
+    frames = [o for o in decoder.feed(bytes(ser.data)) if o[0] == "frame"]
+    assert [f[2] for f in frames] == [0, 1, 2, 3, 4, 5]
+    assert [f[1] for f in frames] == [OP_DOWN, OP_DOWN, OP_UP, OP_UP, OP_DOWN, OP_UP]
+    assert decoder.gaps == 0 and decoder.bad == 0
+    assert link.seq == 6
+
+
+def test_stamp_leaves_cached_wire_untouched():
+    link = PicoLink(FakeSerial(), PROTOCOL_BINARY)
+    link.seq = 200
+    plan = EventPlan.compile(EVENTS)
+    before = list(plan.wire_for(link))
+    stamped, next_seqs = plan.stamp(link)
+    assert plan.wire_for(link) == before
+    assert list(next_seqs) == [201, 202]
+    assert stamped[0][2] == 200
+
+
+def test_stop_mid_plan_continues_from_sent_frames():
+    ser = FakeSerial()
+    link = PicoLink(ser, PROTOCOL_BINARY)
+    plan = EventPlan.compile(EVENTS)
+    sink = SerialSink(link)
+    sink.prepare(plan)
+    sink.send(0)  # 첫 묶음만 보내고 중단
+    link.send_stop()
+    decoder = FrameDecoder()
+    frames = [o for o in decoder.feed(bytes(ser.data)) if o[0] == "frame"]
+    assert [f[2] for f in frames] == [0, 1]
+    assert decoder.gaps == 0
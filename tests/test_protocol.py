@@ -0,0 +1,125 @@
+# test_protocol.py (바이너리 프레임 / SEQ / 수신 규칙)
+from protocol import (
+    FRAME_SIZE,
+    FRAME_SYNC,
+    KEY_CODES,
+    OP_DOWN,
+    OP_STOP,
+    OP_UP,
+    PROTOCOL_BINARY,
+    FrameDecoder,
+    PicoLink,
+    checksum,
+    decode_frame,
+    encode_frame,
+)
+
+
+class FakeSerial:
+    def __init__(self):
+        self.timeout = 1
+        self.is_open = True
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def binary_link():
+    ser = FakeSerial()
+    return PicoLink(ser, PROTOCOL_BINARY), ser
+
+
+def test_frame_round_trip():
+    for opcode in (OP_DOWN, OP_UP, OP_STOP):
+        for seq in (0, 1, 127, 255):
+            frame = encode_frame(opcode, seq, KEY_CODES["RIGHT"])
+            assert len(frame) == FRAME_SIZE
+            assert frame[0] == FRAME_SYNC
+            assert decode_frame(frame) == (opcode, seq, KEY_CODES["RIGHT"])
+
+
+def test_encode_frame_wraps_seq():
+    assert decode_frame(encode_frame(OP_DOWN, 256 + 3, 0x04))[1] == 3
+
+
+def test_decode_rejects_bad_checksum_and_sync():
+    frame = bytearray(encode_frame(OP_DOWN, 7, KEY_CODES["A"]))
+    frame[4] ^= 0xFF
+    assert decode_frame(bytes(frame)) is None
+    frame = bytearray(encode_frame(OP_DOWN, 7, KEY_CODES["A"]))
+    frame[0] = 0x00
+    assert decode_frame(bytes(frame)) is None
+    assert decode_frame(encode_frame(OP_DOWN, 7)[:4]) is None
+
+
+def test_link_seq_is_continuous_across_events_and_stop():
+    link, ser = binary_link()
+    link.send("down", "RIGHT")
+    link.send("down", "NOT_A_KEY")  # 테이블에 없는 키는 텍스트 라인 (SEQ 안 씀)
+    link.send("up", "RIGHT")
+    link.send_stop()
+
+    decoder = FrameDecoder()
+    out = decoder.feed(bytes(ser.data))
+    assert out == [
+        ("frame", OP_DOWN, 0, KEY_CODES["RIGHT"]),
+        ("text", "EV down NOT_A_KEY"),
+        ("frame", OP_UP, 1, KEY_CODES["RIGHT"]),
+        ("frame", OP_STOP, 2, 0),
+    ]
+    assert decoder.gaps == 0 and decoder.bad == 0
+
+
+def test_link_seq_wraps_without_gap():
+    link, ser = binary_link()
+    link.seq = 254
+    decoder = FrameDecoder()
+    decoder.expected = 254
+    for _ in range(4):
+        link.send("down", "A")
+    seqs = [f[2] for f in decoder.feed(bytes(ser.data))]
+    assert seqs == [254, 255, 0, 1]
+    assert decoder.gaps == 0
+
+
+def test_decoder_counts_seq_gap_and_realigns():
+    data = encode_frame(OP_DOWN, 0, 4) + encode_frame(OP_DOWN, 3, 5)
+    data += encode_frame(OP_UP, 4, 5)
+    decoder = FrameDecoder()
+    out = decoder.feed(data)
+    assert [f[2] for f in out] == [0, 3, 4]  # 불연속이어도 실행한다
+    assert decoder.gaps == 1
+    assert decoder.expected == 5
+
+
+def test_decoder_handles_frame_split_across_reads():
+    data = encode_frame(OP_DOWN, 0, 4) + b"EV up A\n" + encode_frame(OP_UP, 1, 4)
+    decoder = FrameDecoder()
+    out = []
+    for i in range(len(data)):
+        out += decoder.feed(data[i : i + 1])
+    assert out == [
+        ("frame", OP_DOWN, 0, 4),
+        ("text", "EV up A"),
+        ("frame", OP_UP, 1, 4),
+    ]
+    assert decoder.gaps == 0 and decoder.bad == 0
+
+
+def test_decoder_resyncs_after_garbage():
+    bad = bytearray(encode_frame(OP_DOWN, 0, 4))
+    bad[4] = (bad[4] + 1) & 0xFF  # 체크섬 오류
+    data = bytes(bad) + encode_frame(OP_DOWN, 0, 4)
+    decoder = FrameDecoder()
+    out = [o for o in decoder.feed(data) if o[0] == "frame"]
+    assert out == [("frame", OP_DOWN, 0, 4)]
+    assert decoder.bad == 1
+
+
+def test_checksum_is_low_byte_of_sum():
+    assert checksum(0xFF, 0xFF, 0xFF) == (0xFF * 3) & 0xFF
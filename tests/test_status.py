@@ -0,0 +1,99 @@
+# test_status.py (세트 매크로 상태 공유 메모리 seqlock)
+import status
+from status import SEQ_STRUCT, StatusBlock, reset_status
+
+STATE = {
+    "running": True,
+    "selected_sets": [1, 3],
+    "loop_index": 2,
+    "loop_total": 5,
+    "set_no": 3,
+    "set_duration": 1.5,
+    "last_loop_elapsed": 1.25,
+    "total_elapsed": 4.0,
+    "progress": 40.0,
+}
+
+
+class ScriptedSeq:
+    """unpack_from 이 정해진 seq 값을 차례로 돌려주는 SEQ_STRUCT 대역 (쓰기는 그대로)."""
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.reads = 0
+
+    def unpack_from(self, buf, offset=0):
+        self.reads += 1
+        return (
+            (self.values.pop(0),)
+            if self.values
+            else SEQ_STRUCT.unpack_from(buf, offset)
+        )
+
+    def pack_into(self, buf, offset, value):
+        SEQ_STRUCT.pack_into(buf, offset, value)
+
+
+def test_write_then_read_round_trip(tmp_path):
+    path = str(tmp_path / "status.shm")
+    writer = StatusBlock.create(path)
+    writer.write(STATE)
+    reader = StatusBlock.open(path)
+    try:
+        assert reader.read() == STATE
+        assert SEQ_STRUCT.unpack_from(reader._mm, 0)[0] % 2 == 0
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_read_retries_while_write_in_progress(tmp_path, monkeypatch):
+    path = str(tmp_path / "status.shm")
+    block = StatusBlock.create(path)
+    block.write(STATE)
+    # 홀수(쓰는 중) → 재시도, 복사 전후 seq 불일치(그 사이 쓰기) → 재시도, 그다음 일관된 읽기
+    scripted = ScriptedSeq([3, 4, 6, 6, 6])
+    monkeypatch.setattr(status, "SEQ_STRUCT", scripted)
+    try:
+        assert block.read() == STATE
+        assert scripted.reads == 5
+    finally:
+        block.close()
+
+
+def test_read_gives_up_on_stuck_odd_seq(tmp_path, monkeypatch):
+    path = str(tmp_path / "status.shm")
+    block = StatusBlock.create(path)
+    block.write(STATE)
+    SEQ_STRUCT.pack_into(block._mm, 0, 7)  # writer 가 쓰는 도중 멈춘 상태
+    try:
+        assert block.read() is None
+        # 다음 writer 는 홀수 seq 를 넘겨받아 다시 짝수로 끝낸다
+        block.write(STATE)
+        assert SEQ_STRUCT.unpack_from(block._mm, 0)[0] == 10
+        assert block.read() == STATE
+    finally:
+        block.close()
+
+
+def test_reset_status_reads_back_stopped(tmp_path):
+    path = str(tmp_path / "status.shm")
+    writer = StatusBlock.create(path)
+    writer.write(STATE)
+    reader = StatusBlock.open(path)
+    try:
+        reset_status(path)
+        state = reader.read()
+        assert state["running"] is False
+        assert state["selected_sets"] == []
+        assert state["set_no"] is None
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_reset_status_ignores_missing_file(tmp_path):
+    path = str(tmp_path / "missing.shm")
+    reset_status(path)
+    assert not (tmp_path / "missing.shm").exists()
+    assert StatusBlock.open(path) is None